@@ -1,9 +1,11 @@
 import logging
+import uuid
 
 import streamlit as st
 from dotenv import find_dotenv, load_dotenv
 
-from src.inference import InferenceEngine
+from src.inference import InferenceEngine, ServiceUnavailable, EngineBusyError
+from src.utils import load_config
 
 load_dotenv(find_dotenv())
 logging.basicConfig(level=logging.INFO)
@@ -16,10 +18,44 @@ def get_inference_engine():
     return InferenceEngine.from_config()
 
 
-inference_engine = get_inference_engine()
+def engine_history(messages):
+    """The conversation for the engine, without the questions that could not be answered."""
+    history = []
+    for m in messages:
+        if m.get("failed"):
+            history.pop()
+        else:
+            history.append({"role": m["role"], "content": m["content"]})
+    return history
+
 
 st.title("🧭 Cook Compass")
 
+# returns quickly: the recipe index is opened and synced in the background (see InferenceEngine.status)
+inference_engine = get_inference_engine()
+show_timings = load_config().get("telemetry", {}).get("sidebar_panel", False)
+
+
+@st.fragment(run_every=2)
+def index_status():
+    status = inference_engine.status()
+    if status["ready"]:
+        st.rerun()
+    elif status["state"] == "failed":
+        st.error(f"Loading the recipe index failed: {status['error']}")
+    elif "ingestion" in status:
+        ingestion = status["ingestion"]
+        st.progress(ingestion["fraction"], text=f"Indexing recipes: {ingestion['rows_seen']} of about "
+                                                f"{ingestion['rows_total']} checked, "
+                                                f"{ingestion['documents_embedded']} embedded. "
+                                                f"You can already chat; answers improve as the index grows.")
+    else:
+        st.info("Opening the recipe index...")
+
+
+if not inference_engine.ready:
+    index_status()
+
 with st.sidebar:
     st.header("Settings")
     if st.button("Reset Chat"):
@@ -27,6 +63,10 @@ with st.sidebar:
         st.rerun()
 
 # 1. Automatic Greeting
+if "session_id" not in st.session_state:
+    # lets the engine continue this conversation's summary instead of rebuilding it every turn
+    st.session_state.session_id = uuid.uuid4().hex
+
 if "messages" not in st.session_state or len(st.session_state.messages) == 0:
     st.session_state.messages = [
         {"role": "assistant",
@@ -62,12 +102,29 @@ if prompt := st.chat_input("What's cooking?"):
     st.rerun()
 
 if st.session_state.messages and st.session_state.messages[-1]["role"] == "user":
+    trace = inference_engine.telemetry.trace("request")
     with st.chat_message("assistant"):
         stream = inference_engine.stream_response(
-            [
-                {"role": m["role"], "content": m["content"]}
-                for m in st.session_state.messages
-            ],
+            engine_history(st.session_state.messages),
+            trace=trace,
+            session_id=st.session_state.session_id,
+        )
+        try:
+            response = st.write_stream(stream)
+            st.session_state.messages.append({"role": "assistant", "content": response})
+        except (ServiceUnavailable, EngineBusyError) as e:
+            st.error(str(e))
+            # shown in the chat, but neither the partial answer nor the question go back to the engine
+            st.session_state.messages.append({"role": "assistant", "content": str(e), "failed": True})
+    st.session_state.last_trace = trace.to_dict()
+
+if show_timings and "last_trace" in st.session_state:
+    with st.sidebar:
+        st.header("Last Request")
+        last_trace = st.session_state.last_trace
+        st.dataframe(
+            [{"stage": span["name"], "start (ms)": span["offset_ms"], "duration (ms)": span["duration_ms"]}
+             for span in last_trace["spans"]],
+            hide_index=True,
         )
-        response = st.write_stream(stream)
-    st.session_state.messages.append({"role": "assistant", "content": response})
+        st.json(last_trace["attributes"], expanded=False)
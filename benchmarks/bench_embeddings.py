@@ -0,0 +1,89 @@
+"""
+Compares the embedding backends on the evaluation queries and a sample of recipes:
+single-query latency (one at a time and from concurrent sessions), document throughput,
+and, when both backends run, the cosine similarity between their vectors (should be ~1.0 for the same model).
+The api backend needs API_TOKEN, the local backend needs sentence-transformers and `local_embeddings.model_path`.
+
+Usage: python -m benchmarks.bench_embeddings [--backends api local] [--queries 50] [--documents 512]
+"""
+import argparse
+import csv
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from src.embedders import create_text_embedder, create_document_embedder
+from src.ingest import _transform_data_to_documents
+from src.utils import PROJECT_ROOT, load_config
+
+QUERIES = PROJECT_ROOT / "notebooks" / "results" / "test_query_results.csv"
+DATASET = PROJECT_ROOT / "data" / "small_recipes.csv"
+
+
+def _ms(samples) -> str:
+    ordered = sorted(samples)
+    p50 = ordered[len(ordered) // 2] * 1000
+    p95 = ordered[min(len(ordered) - 1, int(0.95 * len(ordered)))] * 1000
+    return f"p50 {p50:8.2f} ms  p95 {p95:8.2f} ms"
+
+
+def _bench_backend(config: dict, backend: str, queries: list, documents: list, sessions: int):
+    config = {**config, "embeddings_backend": backend}
+    api_token = os.getenv("API_TOKEN", "")
+    text_embedder = create_text_embedder(config, api_token)
+    document_embedder = create_document_embedder(config, api_token, batch_size=64)
+
+    text_embedder.run(text=queries[0])  # warm-up: model load or connection setup
+
+    latencies, vectors = [], []
+    for query in queries:
+        start = time.perf_counter()
+        vectors.append(text_embedder.run(text=query)["embedding"])
+        latencies.append(time.perf_counter() - start)
+    print(f"[{backend}] single query, sequential:      {_ms(latencies)}")
+
+    def timed(query):
+        start = time.perf_counter()
+        text_embedder.run(text=query)
+        return time.perf_counter() - start
+
+    with ThreadPoolExecutor(max_workers=sessions) as pool:
+        concurrent = list(pool.map(timed, queries))
+    print(f"[{backend}] single query, {sessions:>2} sessions:     {_ms(concurrent)}")
+
+    start = time.perf_counter()
+    for i in range(0, len(documents), 64):
+        document_embedder.run(documents=documents[i:i + 64])
+    elapsed = time.perf_counter() - start
+    print(f"[{backend}] documents: {len(documents) / elapsed:8.1f} docs/s")
+
+    return np.asarray(vectors, dtype=np.float32)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--backends", nargs="+", default=["local"], choices=["api", "local"])
+    parser.add_argument("--queries", type=int, default=50)
+    parser.add_argument("--documents", type=int, default=512)
+    parser.add_argument("--sessions", type=int, default=8, help="Concurrent query callers.")
+    args = parser.parse_args()
+
+    with open(QUERIES, newline="", encoding="utf-8") as file:
+        queries = [row["query"] for row in csv.DictReader(file)][:args.queries]
+    documents = _transform_data_to_documents(pd.read_csv(DATASET, nrows=args.documents))
+
+    config = load_config()
+    vectors = {backend: _bench_backend(config, backend, queries, documents, args.sessions)
+               for backend in args.backends}
+
+    if len(vectors) == 2:
+        a, b = vectors.values()
+        similarity = np.sum(a * b, axis=1) / (np.linalg.norm(a, axis=1) * np.linalg.norm(b, axis=1))
+        print(f"Cosine similarity api vs local: min {similarity.min():.4f}, mean {similarity.mean():.4f}")
+
+
+if __name__ == "__main__":
+    main()
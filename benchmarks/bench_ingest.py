@@ -0,0 +1,99 @@
+"""
+Benchmarks the CSV -> Document transformation of the ingestion pipeline.
+Compares the eager path (whole DataFrame in memory) with the streaming path and reports
+rows/sec and peak RSS on small_recipes.csv and on a synthetic file (200k rows by default).
+Embedding is not included because it happens remotely.
+
+Usage: python -m benchmarks.bench_ingest [--rows 200000] [--chunk-size 2000] [--workers 1]
+"""
+import argparse
+import json
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import pandas as pd
+
+from src.utils import PROJECT_ROOT
+
+SMALL_DATASET = PROJECT_ROOT / "data" / "small_recipes.csv"
+
+
+def _write_synthetic_csv(path: Path, rows: int, chunk_size: int = 10_000):
+    """Writes `rows` recipes by cycling through small_recipes.csv with fresh ids and names."""
+    base = pd.read_csv(SMALL_DATASET)
+    written = 0
+    while written < rows:
+        n = min(chunk_size, rows - written)
+        chunk = base.sample(n=n, replace=True, random_state=written).reset_index(drop=True)
+        chunk["id"] = range(written, written + n)
+        chunk["name"] = chunk["name"] + " #" + chunk["id"].astype(str)
+        chunk.to_csv(path, mode="a", header=written == 0, index=False)
+        written += n
+
+
+def _measure(mode: str, file_path: Path, chunk_size: int, workers: int) -> dict:
+    from src.ingest import _iter_documents, _iter_recipe_chunks, _transform_data_to_documents
+
+    start = time.perf_counter()
+    if mode == "eager":
+        documents = _transform_data_to_documents(pd.read_csv(file_path))
+        rows = len(documents)
+    else:
+        rows = 0
+        chunks = _iter_recipe_chunks(file_path.parent, file_path.name, chunk_size)
+        for _ in _iter_documents(chunks, workers):
+            rows += 1
+    seconds = time.perf_counter() - start
+
+    return {
+        "mode": mode,
+        "file": file_path.name,
+        "rows": rows,
+        "seconds": round(seconds, 3),
+        "rows_per_sec": round(rows / seconds, 1),
+        "peak_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+    }
+
+
+def _run_isolated(mode: str, file_path: Path, chunk_size: int, workers: int) -> dict:
+    """Runs one measurement in a fresh interpreter so peak RSS is not shared between runs."""
+    output = subprocess.run(
+        [sys.executable, "-m", "benchmarks.bench_ingest", "--measure", mode, str(file_path),
+         "--chunk-size", str(chunk_size), "--workers", str(workers)],
+        cwd=PROJECT_ROOT, capture_output=True, text=True, check=True
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=200_000, help="Rows in the synthetic dataset.")
+    parser.add_argument("--chunk-size", type=int, default=2000)
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--measure", nargs=2, metavar=("MODE", "FILE"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.measure:
+        mode, file_path = args.measure
+        print(json.dumps(_measure(mode, Path(file_path), args.chunk_size, args.workers)))
+        return
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        synthetic = Path(tmp_dir) / f"synthetic_{args.rows}.csv"
+        print(f"Generating {args.rows} synthetic rows...")
+        _write_synthetic_csv(synthetic, args.rows)
+
+        print(f"{'file':<28}{'mode':<12}{'rows':>10}{'rows/sec':>12}{'peak RSS MB':>14}")
+        for file_path in (SMALL_DATASET, synthetic):
+            for mode in ("eager", "streaming"):
+                result = _run_isolated(mode, file_path, args.chunk_size, args.workers)
+                print(f"{result['file']:<28}{result['mode']:<12}{result['rows']:>10}"
+                      f"{result['rows_per_sec']:>12}{result['peak_rss_mb']:>14}")
+
+
+if __name__ == "__main__":
+    main()
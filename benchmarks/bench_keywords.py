@@ -0,0 +1,84 @@
+"""
+Compares the local lexicon keyword extractor with the LLM extractor on the evaluation queries
+in notebooks/results/test_query_results.csv.
+Without --llm, the local extractor is checked against the keyword each query was generated for.
+With --llm (needs API_TOKEN), both extractors run on every query and their agreement is reported.
+
+Usage: python -m benchmarks.bench_keywords [--llm] [--csv PATH]
+"""
+import argparse
+import csv
+import time
+from pathlib import Path
+
+from src.keyword_extractor import LexiconKeywordExtractor
+from src.utils import PROJECT_ROOT
+
+DEFAULT_QUERIES = PROJECT_ROOT / "notebooks" / "results" / "test_query_results.csv"
+
+
+def _load_queries(path: Path) -> list:
+    with open(path, newline="", encoding="utf-8") as file:
+        return [(row["query"], row.get("keyword", "")) for row in csv.DictReader(file)]
+
+
+def _llm_extractor():
+    from haystack.components.generators.chat import HuggingFaceAPIChatGenerator
+    from haystack.utils import Secret
+
+    from src.inference import InferenceEngine, _load_and_validate_config
+
+    config, api_token = _load_and_validate_config()
+    llm = HuggingFaceAPIChatGenerator(
+        api_type="serverless_inference_api",
+        api_params={"model": config["llm"]},
+        token=Secret.from_token(api_token)
+    )
+    return InferenceEngine(retriever=None, llm=llm)._extract_keywords_llm
+
+
+def _jaccard(a: set, b: set) -> float:
+    return len(a & b) / len(a | b) if a | b else 1.0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--csv", type=Path, default=DEFAULT_QUERIES)
+    parser.add_argument("--llm", action="store_true", help="Also run the LLM extractor and report agreement.")
+    args = parser.parse_args()
+
+    queries = _load_queries(args.csv)
+    extractor = LexiconKeywordExtractor()
+
+    start = time.perf_counter()
+    local_results = [extractor.extract(query) for query, _ in queries]
+    local_us = (time.perf_counter() - start) / len(queries) * 1e6
+
+    label_hits = sum(label in keywords for (_, label), (keywords, _) in zip(queries, local_results))
+    low_confidence = sum(confidence < 0.5 for _, confidence in local_results)
+    print(f"Queries: {len(queries)}")
+    print(f"Local extractor: {local_us:.1f} us/query, "
+          f"label recall {label_hits}/{len(queries)}, low confidence {low_confidence}")
+
+    if not args.llm:
+        return
+
+    extract_llm = _llm_extractor()
+    exact, jaccard_sum, llm_seconds = 0, 0.0, 0.0
+    for (query, _), (local_keywords, _) in zip(queries, local_results):
+        start = time.perf_counter()
+        llm_keywords = set(extract_llm(query))
+        llm_seconds += time.perf_counter() - start
+
+        local_set = set(local_keywords)
+        exact += local_set == llm_keywords
+        jaccard_sum += _jaccard(local_set, llm_keywords)
+        if local_set != llm_keywords:
+            print(f"  differs: {query!r} local={sorted(local_set)} llm={sorted(llm_keywords)}")
+
+    print(f"LLM extractor: {llm_seconds / len(queries) * 1e3:.0f} ms/query")
+    print(f"Agreement: exact {exact}/{len(queries)}, mean Jaccard {jaccard_sum / len(queries):.3f}")
+
+
+if __name__ == "__main__":
+    main()
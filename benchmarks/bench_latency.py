@@ -0,0 +1,188 @@
+"""
+Offline latency benchmark for InferenceEngine.stream_response.
+Drives the real orchestration code (in-memory Chroma, keyword extraction, context packing, streaming)
+with local fake LLM and embedding backends of configurable latency and token rate.
+Reports p50/p95/p99 per stage, tokens/sec and throughput at several concurrency levels and writes
+them to a JSON file that can be diffed between runs.
+
+Usage: python -m benchmarks.bench_latency [--concurrency 1 4 16] [--llm-latency 0.3] [--embed-latency 0.1]
+                                          [--tokens-per-second 40] [--output latency.json]
+"""
+import argparse
+import csv
+import functools
+import json
+import random
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import List, Dict, Callable
+
+import pandas as pd
+from haystack_integrations.document_stores.chroma import ChromaDocumentStore
+
+from benchmarks.fakes import FakeChatGenerator, FakeTextEmbedder, FakeDocumentEmbedder
+from src.cache import EmbeddingCache
+from src.inference import InferenceEngine
+from src.ingest import _transform_data_to_documents
+from src.keyword_extractor import LexiconKeywordExtractor
+from src.retrievers import VectorRetrieverPipeline
+from src.utils import PROJECT_ROOT
+
+DATASET = PROJECT_ROOT / "data" / "small_recipes.csv"
+QUERIES = PROJECT_ROOT / "notebooks" / "results" / "test_query_results.csv"
+FOLLOW_UPS = ["make it quicker", "can you make it vegetarian?", "something with less sugar", "what else?"]
+
+
+class StageRecorder:
+    """Collects durations per stage from concurrently running requests."""
+
+    def __init__(self):
+        self.samples: Dict[str, List[float]] = defaultdict(list)
+        self._lock = threading.Lock()
+
+    def record(self, stage: str, seconds: float):
+        with self._lock:
+            self.samples[stage].append(seconds)
+
+    def timed(self, stage: str, fn: Callable) -> Callable:
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                self.record(stage, time.perf_counter() - start)
+        return wrapper
+
+
+def percentiles(samples: List[float]) -> Dict[str, float]:
+    if not samples:
+        return {}
+    ordered = sorted(samples)
+
+    def pick(q: float) -> float:
+        return round(ordered[min(len(ordered) - 1, int(q * len(ordered)))] * 1000, 2)
+
+    return {"count": len(ordered), "p50_ms": pick(0.50), "p95_ms": pick(0.95), "p99_ms": pick(0.99)}
+
+
+def _build_store() -> ChromaDocumentStore:
+    """In-memory Chroma store holding small_recipes.csv with fake embeddings."""
+    store = ChromaDocumentStore(collection_name="latency_benchmark")
+    documents = _transform_data_to_documents(pd.read_csv(DATASET))
+    store.write_documents(FakeDocumentEmbedder(latency=0).run(documents=documents)["documents"])
+    return store
+
+
+def _build_engine(args, recorder: StageRecorder, store: ChromaDocumentStore) -> InferenceEngine:
+    text_embedder = FakeTextEmbedder(latency=args.embed_latency)
+    text_embedder.run = recorder.timed("embed", text_embedder.run)
+
+    retriever = VectorRetrieverPipeline(
+        document_store=store,
+        embeddings_model="fake",
+        api_token="",
+        top_k=20,
+        embedding_cache=EmbeddingCache() if args.embedding_cache else None,
+        text_embedder=text_embedder,
+    )
+    retriever.retrieve_documents = recorder.timed("retrieve", retriever.retrieve_documents)
+
+    engine = InferenceEngine(
+        retriever=retriever,
+        llm=FakeChatGenerator(latency=args.llm_latency, tokens_per_second=args.tokens_per_second,
+                              reply_tokens=args.reply_tokens),
+        keyword_extractor=LexiconKeywordExtractor(),
+        max_concurrent_generations=max(args.concurrency),
+    )
+
+    rewrite = engine._generate_search_query
+
+    def timed_rewrite(message_history):
+        if len(message_history) < 2:
+            return rewrite(message_history)
+        return recorder.timed("rewrite", rewrite)(message_history)
+
+    engine._generate_search_query = timed_rewrite
+    engine._extract_keywords = recorder.timed("keywords", engine._extract_keywords)
+    return engine
+
+
+def _load_histories(follow_up_ratio: float, repeat: int) -> List[List[dict]]:
+    with open(QUERIES, newline="", encoding="utf-8") as file:
+        queries = [row["query"] for row in csv.DictReader(file)]
+
+    rng = random.Random(0)
+    histories = []
+    for query in queries * repeat:
+        history = [{"role": "user", "content": query}]
+        if rng.random() < follow_up_ratio:
+            history += [{"role": "assistant", "content": "Here is a recipe: ..."},
+                        {"role": "user", "content": rng.choice(FOLLOW_UPS)}]
+        histories.append(history)
+    return histories
+
+
+def _run_request(engine: InferenceEngine, recorder: StageRecorder, history: List[dict]) -> int:
+    start = time.perf_counter()
+    tokens = 0
+    for _ in engine.stream_response(history):
+        if tokens == 0:
+            recorder.record("ttft", time.perf_counter() - start)
+        tokens += 1
+    total = time.perf_counter() - start
+    recorder.record("total", total)
+    return tokens
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 16])
+    parser.add_argument("--llm-latency", type=float, default=0.3, help="Fake LLM latency per call (seconds).")
+    parser.add_argument("--embed-latency", type=float, default=0.1, help="Fake embedder latency per call (seconds).")
+    parser.add_argument("--tokens-per-second", type=float, default=40.0)
+    parser.add_argument("--reply-tokens", type=int, default=60)
+    parser.add_argument("--follow-up-ratio", type=float, default=0.3,
+                        help="Share of requests sent as a follow-up turn, which exercises query rewriting.")
+    parser.add_argument("--repeat", type=int, default=1, help="How often the query corpus is replayed per level.")
+    parser.add_argument("--embedding-cache", action="store_true", help="Enable the in-memory embedding cache.")
+    parser.add_argument("--output", type=Path, default=Path("latency_benchmark.json"))
+    args = parser.parse_args()
+
+    histories = _load_histories(args.follow_up_ratio, args.repeat)
+    store = _build_store()
+    report = {"settings": {k: str(v) if isinstance(v, Path) else v for k, v in vars(args).items()}, "levels": []}
+
+    for concurrency in args.concurrency:
+        recorder = StageRecorder()
+        engine = _build_engine(args, recorder, store)
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            token_counts = list(pool.map(lambda h: _run_request(engine, recorder, h), histories))
+        wall = time.perf_counter() - start
+
+        level = {
+            "concurrency": concurrency,
+            "requests": len(histories),
+            "wall_seconds": round(wall, 3),
+            "throughput_rps": round(len(histories) / wall, 2),
+            "tokens_per_second": round(sum(token_counts) / wall, 1),
+            "stages": {stage: percentiles(samples) for stage, samples in sorted(recorder.samples.items())},
+        }
+        report["levels"].append(level)
+
+        print(f"\nconcurrency={concurrency}: {level['throughput_rps']} req/s, {level['tokens_per_second']} tokens/s")
+        for stage, stats in level["stages"].items():
+            print(f"  {stage:<10} p50 {stats['p50_ms']:>9} ms  p95 {stats['p95_ms']:>9} ms  "
+                  f"p99 {stats['p99_ms']:>9} ms  (n={stats['count']})")
+
+    args.output.write_text(json.dumps(report, indent=2))
+    print(f"\nResults written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
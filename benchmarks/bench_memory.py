@@ -0,0 +1,63 @@
+"""
+Prompt growth over a long chat session with and without ConversationMemory.
+Every synthetic turn is a short user request answered with a full recipe (about 400 tokens) that names one
+of the context recipes. Reports, per turn, the tokens of the earlier conversation sent with the request and
+the time the memory spends building it.
+
+Usage: python -m benchmarks.bench_memory [--turns 40] [--max-tokens 1500] [--recent-messages 4]
+"""
+import argparse
+import time
+
+from haystack import Document
+
+from src.context import approximate_token_count
+from src.memory import ConversationMemory
+
+STEPS = ("preheat the oven to 350 degrees, grease a baking dish, whisk the eggs with the milk and the spices, "
+         "fold in the vegetables and the cheese, pour everything into the dish and bake until golden, ") * 8
+
+
+def _recipe(turn: int) -> Document:
+    return Document(content=f"Recipe: dish number {turn}\nIngredients: eggs, milk, cheese, spinach, onion\n",
+                    meta={"name": f"baked dish number {turn}", "original_id": 1000 + turn})
+
+
+def _answer(doc: Document) -> str:
+    return (f"Here is a recipe you could try: **{doc.meta['name'].title()}**\n\n"
+            f"Ingredients: eggs, milk, cheese, spinach, onion\n\nInstructions: {STEPS}\nEnjoy your meal!")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--turns", type=int, default=40)
+    parser.add_argument("--max-tokens", type=int, default=1500)
+    parser.add_argument("--recent-messages", type=int, default=4)
+    args = parser.parse_args()
+
+    memory = ConversationMemory(max_tokens=args.max_tokens, recent_messages=args.recent_messages)
+    history = []
+    print(f"{'turn':>5}{'full history tokens':>21}{'memory tokens':>15}{'memory ms':>11}")
+    for turn in range(args.turns):
+        history.append({"role": "user", "content": f"Something different with eggs please, idea {turn}?"})
+
+        start = time.perf_counter()
+        earlier = memory.messages(history[:-1], session_id="bench")
+        elapsed = time.perf_counter() - start
+
+        full_tokens = sum(approximate_token_count(message["content"]) for message in history[:-1])
+        memory_tokens = sum(approximate_token_count(message["content"]) for message in earlier)
+        if turn % 5 == 0 or turn == args.turns - 1:
+            print(f"{turn:>5}{full_tokens:>21}{memory_tokens:>15}{elapsed * 1000:>11.3f}")
+
+        doc = _recipe(turn)
+        answer = _answer(doc)
+        memory.remember_answer(answer, [_recipe(turn + 1000), doc])
+        history.append({"role": "assistant", "content": answer})
+
+    recalled = memory.recall("how long do I bake the baked dish number 3?", history, session_id="bench")
+    print(f"Recalled for a question about turn 3: {[doc.meta['name'] for doc in recalled]}")
+
+
+if __name__ == "__main__":
+    main()
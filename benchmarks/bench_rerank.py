@@ -0,0 +1,73 @@
+"""
+Micro-benchmark of the MMR re-ranking stage on synthetic candidate pools shaped like real retrieval results:
+groups of near-identical variants of a few dishes. Reports the added latency per query with a cold vector cache
+(every embedding list converted, as for never seen recipes) and a warm one (recipes seen by earlier queries),
+and how many distinct dishes end up in the top k compared with plain similarity order.
+
+Usage: python -m benchmarks.bench_rerank [--fetch-k 20 40 100] [--top-k 10 20] [--dim 768] [--lambda-mult 0.7]
+"""
+import argparse
+import time
+
+import numpy as np
+from haystack import Document
+
+from src.rerank import MMRReranker
+
+REPEATS = 500
+VARIANTS_PER_DISH = 4
+
+
+def _candidates(fetch_k: int, dim: int, seed: int):
+    """`fetch_k` candidates sorted by similarity to the query; every dish comes with a few close variants."""
+    rng = np.random.default_rng(seed)
+    query = rng.standard_normal(dim).astype(np.float32)
+    dishes = rng.standard_normal((fetch_k // VARIANTS_PER_DISH + 1, dim)).astype(np.float32) + 0.5 * query
+    dish_ids = np.arange(fetch_k) // VARIANTS_PER_DISH
+    vectors = dishes[dish_ids] + 0.1 * rng.standard_normal((fetch_k, dim)).astype(np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+
+    order = np.argsort(-(vectors @ query))
+    documents = [Document(id=str(i), content=f"dish {dish_ids[i]}", meta={"dish": int(dish_ids[i])},
+                          embedding=vectors[i].tolist()) for i in order]
+    return documents, query.tolist()
+
+
+def _latency(reranker: MMRReranker, documents, query, cold: bool):
+    samples = []
+    for _ in range(REPEATS):
+        if cold:
+            reranker._vectors.clear()
+        start = time.perf_counter()
+        reranker.rerank(documents, query)
+        samples.append(time.perf_counter() - start)
+    samples.sort()
+    return samples[len(samples) // 2] * 1000, samples[int(0.95 * len(samples))] * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--fetch-k", type=int, nargs="+", default=[20, 40, 100])
+    parser.add_argument("--top-k", type=int, nargs="+", default=[10, 20])
+    parser.add_argument("--dim", type=int, default=768)
+    parser.add_argument("--lambda-mult", type=float, default=0.7)
+    args = parser.parse_args()
+
+    print(f"{'fetch_k':>8}{'top_k':>7}{'cold p50 ms':>13}{'cold p95 ms':>13}{'warm p50 ms':>13}{'warm p95 ms':>13}"
+          f"{'dishes (similarity)':>21}{'dishes (MMR)':>14}")
+    for fetch_k in args.fetch_k:
+        documents, query = _candidates(fetch_k, args.dim, seed=fetch_k)
+        for top_k in args.top_k:
+            if top_k > fetch_k:
+                continue
+            reranker = MMRReranker(lambda_mult=args.lambda_mult, top_k=top_k, fetch_k=fetch_k)
+            cold_p50, cold_p95 = _latency(reranker, documents, query, cold=True)
+            warm_p50, warm_p95 = _latency(reranker, documents, query, cold=False)
+            plain_dishes = len({doc.meta["dish"] for doc in documents[:top_k]})
+            mmr_dishes = len({doc.meta["dish"] for doc in reranker.rerank(documents, query)})
+            print(f"{fetch_k:>8}{top_k:>7}{cold_p50:>13.3f}{cold_p95:>13.3f}{warm_p50:>13.3f}{warm_p95:>13.3f}"
+                  f"{plain_dishes:>21}{mmr_dishes:>14}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,164 @@
+"""
+Deadlines, hedged requests and circuit breaking against a local fake HF endpoint (benchmarks.fake_hf_server)
+that injects slow requests, hangs and outages, using the real HF API clients.
+
+1. Query embedding tail latency with a few slow requests, without and with hedging.
+2. A hanging endpoint: how long a guarded call waits.
+3. An outage: how many calls still reach the endpoint once the circuit is open, how fast the others fail,
+   and the circuit closing again after the endpoint recovers.
+4. Full answers from InferenceEngine while the LLM is down: the rewrite is skipped and the answer fails fast.
+
+Usage: python -m benchmarks.bench_resilience [--calls 300] [--latency 0.02] [--slow-fraction 0.03]
+                                             [--slow-latency 1.0] [--hedge-percentile 0.9]
+"""
+import argparse
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Callable
+
+import numpy as np
+from haystack.components.embedders import HuggingFaceAPITextEmbedder
+from haystack.components.generators.chat import HuggingFaceAPIChatGenerator
+
+from benchmarks.fake_hf_server import FakeHFServer, Faults
+from benchmarks.fakes import StaticRetriever
+from src.inference import InferenceEngine, ServiceUnavailable
+from src.keyword_extractor import LexiconKeywordExtractor
+from src.resilience import ResilientCaller, CircuitBreaker, CircuitOpenError, DeadlineExceeded
+
+QUERY = "quick chicken and rice dinner"
+
+
+def _timed(fn: Callable[[], object]) -> float:
+    start = time.perf_counter()
+    try:
+        fn()
+    except Exception:
+        pass
+    return time.perf_counter() - start
+
+
+def _report(label: str, latencies: List[float]):
+    ms = np.array(latencies) * 1000
+    print(f"{label:<28}{np.percentile(ms, 50):>9.1f}{np.percentile(ms, 95):>9.1f}"
+          f"{np.percentile(ms, 99):>9.1f}{ms.max():>9.1f}")
+
+
+def _caller(name: str, executor: ThreadPoolExecutor, **kwargs) -> ResilientCaller:
+    events = {}
+
+    def count(event: str):
+        events[event] = events.get(event, 0) + 1
+
+    caller = ResilientCaller(name, executor, on_event=count, **kwargs)
+    caller.events = events
+    return caller
+
+
+def tail_latency(server: FakeHFServer, embedder: HuggingFaceAPITextEmbedder, executor: ThreadPoolExecutor,
+                 args: argparse.Namespace):
+    print(f"\n1. Query embeddings, {args.slow_fraction:.0%} of requests take {args.slow_latency}s")
+    print(f"{'':<28}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'max ms':>9}")
+    server.faults = Faults(args.latency, args.slow_fraction, args.slow_latency)
+    _report("direct", [_timed(lambda: embedder.run(text=QUERY)) for _ in range(args.calls)])
+
+    caller = _caller("embedder", executor, timeout=5.0, hedge_percentile=args.hedge_percentile,
+                     hedge_min_delay=0.01)
+    before = sum(server.requests.values())
+    _report(f"hedged at p{args.hedge_percentile * 100:g}",
+            [_timed(lambda: caller.call(lambda: embedder.run(text=QUERY))) for _ in range(args.calls)])
+    extra = sum(server.requests.values()) - before - args.calls
+    print(f"hedges sent: {caller.events.get('hedge', 0)} ({extra / args.calls:.1%} extra requests), "
+          f"won: {caller.events.get('hedge_won', 0)}")
+
+
+def hanging(server: FakeHFServer, embedder: HuggingFaceAPITextEmbedder, executor: ThreadPoolExecutor):
+    print("\n2. Endpoint hangs for 5s, deadline 0.5s")
+    server.faults = Faults(latency=5.0)
+    caller = _caller("embedder", executor, timeout=0.5, hedge_percentile=None)
+    start = time.perf_counter()
+    try:
+        caller.call(lambda: embedder.run(text=QUERY))
+    except DeadlineExceeded as e:
+        print(f"gave up after {(time.perf_counter() - start) * 1000:.0f} ms: {e}")
+
+
+def outage(server: FakeHFServer, embedder: HuggingFaceAPITextEmbedder, executor: ThreadPoolExecutor):
+    print("\n3. Outage: every request fails with 503 (breaker threshold 5, reset after 1s)")
+    server.faults = Faults(latency=0.05, error_rate=1.0)
+    caller = _caller("embedder", executor, timeout=2.0, hedge_percentile=None,
+                     breaker=CircuitBreaker("embedder", failure_threshold=5, reset_timeout=1.0))
+    before = sum(server.requests.values())
+    failed, rejected = [], []
+    for _ in range(50):
+        start = time.perf_counter()
+        try:
+            caller.call(lambda: embedder.run(text=QUERY))
+        except CircuitOpenError:
+            rejected.append(time.perf_counter() - start)
+        except Exception:
+            failed.append(time.perf_counter() - start)
+    print(f"50 calls: {len(failed)} reached the endpoint ({np.median(failed) * 1000:.1f} ms each), "
+          f"{len(rejected)} failed fast ({np.median(rejected) * 1e6:.0f} us each); "
+          f"endpoint saw {sum(server.requests.values()) - before} requests")
+
+    server.faults = Faults(latency=0.02)
+    time.sleep(1.0)
+    caller.call(lambda: embedder.run(text=QUERY))
+    print(f"after recovery and the reset timeout the circuit is {caller.breaker.state}")
+
+
+def degraded_answers(server: FakeHFServer, executor: ThreadPoolExecutor):
+    print("\n4. Answers while the LLM is down (breaker threshold 2)")
+    llm = HuggingFaceAPIChatGenerator(api_type="text_generation_inference", api_params={"url": server.url})
+    caller = _caller("llm", executor, timeout=2.0, hedge_percentile=None,
+                     breaker=CircuitBreaker("llm", failure_threshold=2, reset_timeout=60.0))
+    generation_breaker = CircuitBreaker("llm_generation", failure_threshold=2, reset_timeout=60.0)
+    engine = InferenceEngine(retriever=StaticRetriever(), llm=llm, keyword_extractor=LexiconKeywordExtractor(),
+                             llm_caller=caller, first_token_timeout=2.0, token_timeout=2.0,
+                             generation_breaker=generation_breaker)
+    history = [{"role": "user", "content": "I have chicken and rice"},
+               {"role": "assistant", "content": "Try a chicken and rice casserole."},
+               {"role": "user", "content": "make it quicker"}]
+
+    server.faults = Faults(latency=0.02, token_interval=0.001)
+    start = time.perf_counter()
+    answer = "".join(engine.stream_response(history))
+    print(f"healthy: {(time.perf_counter() - start) * 1000:.0f} ms, '{answer[:60]}...'")
+
+    server.faults = Faults(latency=0.2, error_rate=1.0)
+    for turn in range(4):
+        start = time.perf_counter()
+        try:
+            answer = "".join(engine.stream_response(history))
+        except ServiceUnavailable as e:
+            answer = f"ServiceUnavailable: {e}"
+        print(f"down, turn {turn}: {(time.perf_counter() - start) * 1000:.0f} ms, "
+              f"circuits {caller.breaker.state}/{generation_breaker.state}, '{answer[:50]}...'")
+    print(f"events: {caller.events}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--calls", type=int, default=300)
+    parser.add_argument("--latency", type=float, default=0.02)
+    parser.add_argument("--slow-fraction", type=float, default=0.03)
+    parser.add_argument("--slow-latency", type=float, default=1.0)
+    parser.add_argument("--hedge-percentile", type=float, default=0.9)
+    args = parser.parse_args()
+
+    server = FakeHFServer().start()
+    embedder = HuggingFaceAPITextEmbedder(api_type="text_embeddings_inference", api_params={"url": server.url})
+    executor = ThreadPoolExecutor(max_workers=16)
+    try:
+        tail_latency(server, embedder, executor, args)
+        hanging(server, embedder, executor)
+        outage(server, embedder, executor)
+        degraded_answers(server, executor)
+    finally:
+        server.stop()
+        executor.shutdown(wait=False)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,161 @@
+"""
+Measures cold start of the Streamlit app: from process launch to the first fully rendered page,
+to the first retrieval-backed answer being possible ("serving"), and to a fully built index ("ready").
+The app script is executed headlessly with Streamlit's AppTest in a fresh interpreter per measurement,
+once with an empty document store and once with an existing one, for blocking and background startup.
+The HF backends are replaced by the fakes in benchmarks/fakes.py unless --online is given.
+
+Usage: python -m benchmarks.bench_startup [--online] [--embed-latency 0.05] [--rows 2000]
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import yaml
+
+from src.utils import PROJECT_ROOT, DEFAULT_CONFIG_PATH
+
+
+def _write_config(root: Path, background: bool, rows: int) -> Path:
+    config = yaml.safe_load(DEFAULT_CONFIG_PATH.read_text())
+    config["paths"].update(
+        data=str(root),
+        chroma=str(root / "chroma"),
+        lexical_index=str(root / "bm25_index.json"),
+        numpy_index=str(root / "numpy_index"),
+        index_version=str(root / "index_version"),
+        recipe_store=str(root / "recipes.sqlite3"),
+    )
+    config["embedding_cache"]["path"] = str(root / "embedding_cache.sqlite3")
+    config["ingestion"]["background"] = background
+    config["telemetry"] = {"sinks": ["memory"]}
+
+    source = PROJECT_ROOT / "data" / config["paths"]["dataset_file"]
+    with open(source, encoding="utf-8") as src, open(root / config["paths"]["dataset_file"], "w",
+                                                      encoding="utf-8") as dst:
+        for i, line in enumerate(src):
+            if i > rows:
+                break
+            dst.write(line)
+
+    path = root / f"config_{'background' if background else 'blocking'}.yaml"
+    path.write_text(yaml.safe_dump(config))
+    return path
+
+
+class _LazyFakeChatGenerator:
+    """Creates the fake LLM on first use, so benchmarks.fakes (which imports Chroma) is not a startup cost."""
+
+    def __init__(self, **kwargs):
+        self._llm = None
+
+    def run(self, *args, **kwargs):
+        if self._llm is None:
+            from benchmarks.fakes import FakeChatGenerator
+
+            self._llm = FakeChatGenerator(latency=0.05)
+        return self._llm.run(*args, **kwargs)
+
+
+def _install_fakes(embed_latency: float):
+    """Swaps the HF clients for local fakes. The fakes themselves are imported where the real clients would be."""
+    import haystack.components.generators.chat as chat_generators
+
+    import src.embedders as embedders
+
+    def text_embedder(config, api_token):
+        from benchmarks.fakes import FakeTextEmbedder
+        return FakeTextEmbedder(latency=embed_latency)
+
+    def document_embedder(config, api_token, batch_size=32):
+        from benchmarks.fakes import FakeDocumentEmbedder
+        return FakeDocumentEmbedder(latency=embed_latency)
+
+    chat_generators.HuggingFaceAPIChatGenerator = _LazyFakeChatGenerator
+    embedders.create_text_embedder = text_embedder
+    embedders.create_document_embedder = document_embedder
+
+
+def _measure(offline: bool, embed_latency: float):
+    """Runs the app once; prints wall-clock timestamps for the parent to compare with the launch time."""
+    from streamlit.testing.v1 import AppTest
+
+    if offline:
+        _install_fakes(embed_latency)
+
+    from src.inference import InferenceEngine
+
+    engines = []
+    from_config = InferenceEngine.from_config.__func__
+
+    def tracking_from_config(cls):
+        engines.append(from_config(cls))
+        return engines[-1]
+
+    InferenceEngine.from_config = classmethod(tracking_from_config)
+
+    app = AppTest.from_file(str(PROJECT_ROOT / "app.py"), default_timeout=3600)
+    app.run()
+    rendered = time.time()
+
+    engine = engines[0]
+    serving = None
+    while not engine.ready and engine.status()["state"] != "failed":
+        if serving is None and engine.status()["serving"]:
+            serving = time.time()
+        time.sleep(0.01)
+    ready = time.time()
+
+    print(json.dumps({"rendered": rendered, "serving": serving or ready, "ready": ready,
+                      "state": engine.status()["state"], "exception": [str(e.value) for e in app.exception]}))
+
+
+def _run_isolated(config_path: Path, offline: bool, embed_latency: float) -> dict:
+    launched = time.time()
+    command = [sys.executable, "-m", "benchmarks.bench_startup", "--measure", "--embed-latency", str(embed_latency)]
+    if not offline:
+        command.append("--online")
+    env = {**os.environ, "CONFIG_PATH": str(config_path)}
+    if offline:
+        env.setdefault("API_TOKEN", "offline")
+    output = subprocess.run(command, cwd=PROJECT_ROOT, env=env, capture_output=True, text=True, check=True).stdout
+    result = json.loads(output.strip().splitlines()[-1])
+    return {
+        "render_s": round(result["rendered"] - launched, 2),
+        "serving_s": round(result["serving"] - launched, 2),
+        "ready_s": round(result["ready"] - launched, 2),
+        "state": result["state"],
+        "exception": result["exception"],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--online", action="store_true", help="Use the real HF backends (needs API_TOKEN).")
+    parser.add_argument("--embed-latency", type=float, default=0.05, help="Fake embedding latency per batch.")
+    parser.add_argument("--rows", type=int, default=2000, help="Recipes in the dataset copy that is ingested.")
+    parser.add_argument("--measure", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.measure:
+        _measure(not args.online, args.embed_latency)
+        return
+
+    print(f"{'startup':<12}{'store':<10}{'page rendered s':>17}{'serving s':>11}{'ready s':>9}  state")
+    for background in (False, True):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            config_path = _write_config(Path(tmp_dir), background, args.rows)
+            for store in ("empty", "existing"):
+                result = _run_isolated(config_path, not args.online, args.embed_latency)
+                mode = "background" if background else "blocking"
+                print(f"{mode:<12}{store:<10}{result['render_s']:>17}{result['serving_s']:>11}{result['ready_s']:>9}"
+                      f"  {result['state']} {' '.join(result['exception'])}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,175 @@
+"""
+Compares the memory-mapped NumPy vector index with Chroma on synthetic recipe embeddings.
+For every corpus size the indexes are built once in a temporary directory (one NumPy index per dtype);
+each measurement then runs in a fresh interpreter and reports cold start (imports + open + first query),
+peak RSS and query latency without a filter, with a keyword filter and with numeric range filters
+("under 30 minutes and 400 calories").
+Building the Chroma collection dominates the run time; --no-chroma measures the NumPy indexes only.
+
+Usage: python -m benchmarks.bench_vector_index [--sizes 10000 100000 230000] [--dim 768]
+                                               [--dtypes float32 float16 int8] [--no-chroma]
+"""
+import argparse
+import json
+import random
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import List
+
+import numpy as np
+
+from src.utils import PROJECT_ROOT
+
+WRITE_BATCH = 5000
+QUERIES = 200
+
+
+def _synthetic_documents(size: int, dim: int, start: int, stop: int):
+    from haystack import Document
+
+    from src.keywords import KEYWORDS, keyword_flags
+
+    rng = np.random.default_rng(start)
+    vectors = rng.standard_normal((stop - start, dim), dtype=np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    tags_rng = random.Random(start)
+    return [
+        Document(
+            id=f"recipe-{i}",
+            content=f"Recipe {i}\nIngredients: ingredient {i % 97}, ingredient {i % 89}",
+            meta={"name": f"Recipe {i}", "steps": "mix, cook, serve", "minutes": i % 120,
+                  "calories": float(i * 7919 % 1200), "protein_g": float(i * 104729 % 60),
+                  **keyword_flags({k for k in KEYWORDS if tags_rng.random() < 0.2})},
+            embedding=vector.tolist(),
+        )
+        for i, vector in zip(range(start, stop), vectors)
+    ]
+
+
+def _build(size: int, dim: int, dtypes: List[str], root: Path, chroma: bool):
+    from src.vector_index import NumpyDocumentStore
+
+    documents = []
+    for offset in range(0, size, WRITE_BATCH):
+        documents.extend(_synthetic_documents(size, dim, offset, min(size, offset + WRITE_BATCH)))
+
+    if chroma:
+        from haystack_integrations.document_stores.chroma import ChromaDocumentStore
+
+        store = ChromaDocumentStore(persist_path=str(root / "chroma"))
+        start = time.perf_counter()
+        for offset in range(0, size, WRITE_BATCH):
+            store.write_documents(documents[offset:offset + WRITE_BATCH])
+        print(f"  Chroma build: {time.perf_counter() - start:.1f}s")
+
+    for dtype in dtypes:
+        start = time.perf_counter()
+        NumpyDocumentStore.build(documents, root / f"numpy-{dtype}", dtype)
+        print(f"  NumPy {dtype} build: {time.perf_counter() - start:.1f}s")
+
+
+def _peak_rss_mb() -> float:
+    """Peak RSS of this process. VmHWM starts fresh at exec, unlike ru_maxrss, which inherits the parent's peak."""
+    try:
+        with open("/proc/self/status") as status:
+            for line in status:
+                if line.startswith("VmHWM:"):
+                    return round(int(line.split()[1]) / 1024, 1)
+    except OSError:
+        pass
+    return round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+
+
+def _measure(backend: str, root: Path, dim: int) -> dict:
+    start = time.perf_counter()
+    if backend == "chroma":
+        from haystack_integrations.components.retrievers.chroma import ChromaEmbeddingRetriever
+        from haystack_integrations.document_stores.chroma import ChromaDocumentStore
+
+        retriever = ChromaEmbeddingRetriever(ChromaDocumentStore(persist_path=str(root / "chroma")), top_k=20)
+    else:
+        from src.vector_index import NumpyDocumentStore, NumpyEmbeddingRetriever
+
+        retriever = NumpyEmbeddingRetriever(NumpyDocumentStore(root / backend), top_k=20)
+
+    from src.constraints import constraint_filters
+    from src.keywords import keyword_filters
+
+    queries = np.random.default_rng(1).standard_normal((QUERIES, dim), dtype=np.float32).tolist()
+    retriever.run(query_embedding=queries[0])
+    cold_start = time.perf_counter() - start
+
+    def latencies(filters):
+        samples = []
+        for query in queries:
+            query_start = time.perf_counter()
+            retriever.run(query_embedding=query, filters=filters)
+            samples.append(time.perf_counter() - query_start)
+        samples.sort()
+        return round(samples[len(samples) // 2] * 1000, 2), round(samples[int(0.95 * len(samples))] * 1000, 2)
+
+    plain_p50, plain_p95 = latencies(None)
+    filtered_p50, filtered_p95 = latencies(keyword_filters(["vegan", "15-minutes-or-less"]))
+    range_p50, range_p95 = latencies(constraint_filters([], {"minutes": (None, 30.0), "calories": (None, 400.0)}))
+    return {
+        "backend": backend,
+        "cold_start_s": round(cold_start, 2),
+        "peak_rss_mb": _peak_rss_mb(),
+        "p50_ms": plain_p50,
+        "p95_ms": plain_p95,
+        "filtered_p50_ms": filtered_p50,
+        "filtered_p95_ms": filtered_p95,
+        "range_p50_ms": range_p50,
+        "range_p95_ms": range_p95,
+    }
+
+
+def _run_isolated(backend: str, root: Path, dim: int) -> dict:
+    """Runs one measurement in a fresh interpreter so imports, caches and RSS are not shared."""
+    output = subprocess.run(
+        [sys.executable, "-m", "benchmarks.bench_vector_index", "--measure", backend, str(root), "--dim", str(dim)],
+        cwd=PROJECT_ROOT, capture_output=True, text=True, check=True
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000, 230_000])
+    parser.add_argument("--dim", type=int, default=768)
+    parser.add_argument("--dtypes", nargs="+", default=["float32", "float16", "int8"],
+                        choices=["float32", "float16", "int8"])
+    parser.add_argument("--no-chroma", action="store_true", help="Skip building and measuring Chroma.")
+    parser.add_argument("--measure", nargs=2, metavar=("BACKEND", "DIR"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.measure:
+        backend, root = args.measure
+        print(json.dumps(_measure(backend, Path(root), args.dim)))
+        return
+
+    header = (f"{'size':>8}  {'backend':<15}{'cold start s':>14}{'peak RSS MB':>13}"
+              f"{'p50 ms':>9}{'p95 ms':>9}{'filtered p50':>14}{'filtered p95':>14}{'range p50':>11}{'range p95':>11}")
+    rows = []
+    for size in args.sizes:
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            print(f"Building indexes with {size} documents...")
+            _build(size, args.dim, args.dtypes, Path(tmp_dir), chroma=not args.no_chroma)
+            backends = ([] if args.no_chroma else ["chroma"]) + [f"numpy-{dtype}" for dtype in args.dtypes]
+            for backend in backends:
+                result = _run_isolated(backend, Path(tmp_dir), args.dim)
+                rows.append(f"{size:>8}  {backend:<15}{result['cold_start_s']:>14}{result['peak_rss_mb']:>13}"
+                            f"{result['p50_ms']:>9}{result['p95_ms']:>9}"
+                            f"{result['filtered_p50_ms']:>14}{result['filtered_p95_ms']:>14}"
+                            f"{result['range_p50_ms']:>11}{result['range_p95_ms']:>11}")
+
+    print(header)
+    print("\n".join(rows))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,158 @@
+"""
+Local stand-in for a Text Embeddings Inference / Text Generation Inference endpoint that injects delays and errors,
+so timeouts, hedging and circuit breaking can be exercised with the real HF clients.
+Point `embeddings_api_url` and `llm_api_url` in config.yaml at it, or use FakeHFServer from a benchmark.
+
+Endpoints: POST / (embeddings, TEI style) and POST /v1/chat/completions (OpenAI style, optionally streamed as SSE).
+
+Usage: python -m benchmarks.fake_hf_server [--port 8089] [--latency 0.05] [--slow-fraction 0.05]
+                                           [--slow-latency 2.0] [--error-rate 0.0]
+"""
+import argparse
+import json
+import random
+import threading
+import time
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from typing import Dict, Any
+
+from benchmarks.fakes import hashed_embedding
+
+REPLY = ("Here is a recipe you could try: creamy souper rice. Whisk the soup, broth and dill weed in a saucepan, "
+         "bring to a boil, stir in the rice, cover and let it stand for five minutes.")
+
+
+class Faults:
+    """
+    What the server does to every request: a base latency, occasional slow requests and errors.
+    `fail_first` and `slow_first` make the first requests fail or slow whatever the rates, for tests that need
+    a fixed sequence.
+    """
+
+    def __init__(self, latency: float = 0.02, slow_fraction: float = 0.0, slow_latency: float = 1.0,
+                 error_rate: float = 0.0, error_status: int = 503, token_interval: float = 0.002, seed: int = 1,
+                 fail_first: int = 0, slow_first: int = 0):
+        self.latency = latency
+        self.slow_fraction = slow_fraction
+        self.slow_latency = slow_latency
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.token_interval = token_interval
+        self.fail_first = fail_first
+        self.slow_first = slow_first
+        self._random = random.Random(seed)
+        self._drawn = 0
+        self._lock = threading.Lock()
+
+    def draw(self):
+        """The delay of the next request and the error status to answer with (None for success)."""
+        with self._lock:
+            self._drawn += 1
+            slow = self._random.random() < self.slow_fraction or self._drawn <= self.slow_first
+            failed = self._random.random() < self.error_rate or self._drawn <= self.fail_first
+        return (self.slow_latency if slow else self.latency), (self.error_status if failed else None)
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    server: "FakeHFServer"
+
+    def log_message(self, format, *args):
+        pass
+
+    def _json(self, status: int, payload: Any):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self):
+        payload = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+        delay, error_status = self.server.faults.draw()
+        self.server.count(self.path)
+        time.sleep(delay)
+        if error_status is not None:
+            self._json(error_status, {"error": "injected failure"})
+            return
+
+        if self.path.endswith("/chat/completions"):
+            self._chat(payload)
+            return
+        inputs = payload.get("inputs", "")
+        texts = inputs if isinstance(inputs, list) else [inputs]
+        self._json(200, [hashed_embedding(text, self.server.dim) for text in texts])
+
+    def _chat(self, payload: Dict[str, Any]):
+        chunk = {"id": "fake", "created": 0, "model": "fake", "object": "chat.completion.chunk"}
+        if not payload.get("stream"):
+            self._json(200, {**chunk, "object": "chat.completion", "choices": [
+                {"index": 0, "message": {"role": "assistant", "content": REPLY}, "finish_reason": "stop"}
+            ], "usage": {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0}})
+            return
+
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Connection", "close")
+        self.end_headers()
+        words = REPLY.split(" ")
+        for i, word in enumerate(words):
+            delta = {"role": "assistant", "content": word if i == 0 else " " + word}
+            event = {**chunk, "choices": [{"index": 0, "delta": delta, "finish_reason": None}]}
+            self.wfile.write(f"data: {json.dumps(event)}\n\n".encode("utf-8"))
+            self.wfile.flush()
+            time.sleep(self.server.faults.token_interval)
+        event = {**chunk, "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}]}
+        self.wfile.write(f"data: {json.dumps(event)}\n\ndata: [DONE]\n\n".encode("utf-8"))
+        self.close_connection = True
+
+
+class FakeHFServer(ThreadingHTTPServer):
+    """The fake endpoint on a background thread. `faults` can be swapped at any time, e.g. to simulate an outage."""
+
+    daemon_threads = True
+
+    def __init__(self, faults: Faults = None, port: int = 0, dim: int = 384):
+        super().__init__(("127.0.0.1", port), _Handler)
+        self.faults = faults or Faults()
+        self.dim = dim
+        self.requests: Dict[str, int] = {}
+        self._count_lock = threading.Lock()
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.server_port}"
+
+    def count(self, path: str):
+        with self._count_lock:
+            self.requests[path] = self.requests.get(path, 0) + 1
+
+    def start(self) -> "FakeHFServer":
+        threading.Thread(target=self.serve_forever, name="fake-hf-server", daemon=True).start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--port", type=int, default=8089)
+    parser.add_argument("--latency", type=float, default=0.05)
+    parser.add_argument("--slow-fraction", type=float, default=0.05)
+    parser.add_argument("--slow-latency", type=float, default=2.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    args = parser.parse_args()
+
+    server = FakeHFServer(Faults(args.latency, args.slow_fraction, args.slow_latency, args.error_rate), args.port)
+    print(f"Fake HF endpoint on {server.url}. Ctrl+C to stop.")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
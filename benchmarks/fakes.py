@@ -0,0 +1,106 @@
+"""Local stand-ins for the Hugging Face backends, so the engine can be exercised without network access."""
+import hashlib
+import math
+import re
+import time
+from dataclasses import replace
+from typing import List, Optional, Dict, Any, Callable
+
+from haystack import Document, component
+from haystack.dataclasses import ChatMessage, StreamingChunk
+
+from src.retrievers import BaseRetrieverPipeline
+
+REQUEST_PATTERNS = [
+    re.compile(r"USER REQUEST: (.*)", re.DOTALL),
+    re.compile(r"CURRENT USER QUERY: '(.*?)'"),
+    re.compile(r"relevant to the user query: '(.*?)'"),
+]
+
+
+def _request_text(messages: List[ChatMessage]) -> str:
+    for message in messages:
+        for pattern in REQUEST_PATTERNS:
+            match = pattern.search(message.text or "")
+            if match:
+                return match.group(1).strip()
+    return (messages[-1].text or "").strip()
+
+
+def hashed_embedding(text: str, dim: int = 384) -> List[float]:
+    """Deterministic bag-of-words embedding: similar word sets give similar vectors."""
+    vector = [0.0] * dim
+    for token in re.findall(r"[a-z0-9]+", text.lower()):
+        vector[int(hashlib.md5(token.encode()).hexdigest(), 16) % dim] += 1.0
+    norm = math.sqrt(sum(value * value for value in vector)) or 1.0
+    return [value / norm for value in vector]
+
+
+@component
+class FakeTextEmbedder:
+    """Drop-in for HuggingFaceAPITextEmbedder with a fixed latency per call."""
+
+    def __init__(self, latency: float = 0.1, dim: int = 384):
+        self.latency = latency
+        self.dim = dim
+
+    @component.output_types(embedding=List[float])
+    def run(self, text: str):
+        time.sleep(self.latency)
+        return {"embedding": hashed_embedding(text, self.dim)}
+
+
+@component
+class FakeDocumentEmbedder:
+    """Drop-in for HuggingFaceAPIDocumentEmbedder with a fixed latency per batch."""
+
+    def __init__(self, latency: float = 0.2, dim: int = 384):
+        self.latency = latency
+        self.dim = dim
+
+    @component.output_types(documents=List[Document])
+    def run(self, documents: List[Document]):
+        time.sleep(self.latency)
+        return {"documents": [replace(doc, embedding=hashed_embedding(doc.content or "", self.dim))
+                              for doc in documents]}
+
+
+class FakeChatGenerator:
+    """
+    Drop-in for HuggingFaceAPIChatGenerator.
+    Replies echo the user request: non-streaming calls return it unchanged, streaming calls repeat its words
+    up to `reply_tokens` tokens at `tokens_per_second`, after `latency` seconds of "prompt processing".
+    """
+
+    def __init__(self, latency: float = 0.2, tokens_per_second: float = 50.0, reply_tokens: int = 40):
+        self.latency = latency
+        self.tokens_per_second = tokens_per_second
+        self.reply_tokens = reply_tokens
+        self.streaming_callback = None
+
+    def run(self, messages: List[ChatMessage], generation_kwargs: Optional[Dict[str, Any]] = None,
+            streaming_callback: Optional[Callable[[StreamingChunk], None]] = None, **kwargs):
+        time.sleep(self.latency)
+        request = _request_text(messages)
+
+        if streaming_callback is None:
+            return {"replies": [ChatMessage.from_assistant(request)]}
+
+        words = request.split() or ["ok"]
+        tokens = [f"{words[i % len(words)]} " for i in range(self.reply_tokens)]
+        for token in tokens:
+            time.sleep(1.0 / self.tokens_per_second)
+            streaming_callback(StreamingChunk(content=token))
+        return {"replies": [ChatMessage.from_assistant("".join(tokens))]}
+
+
+class StaticRetriever(BaseRetrieverPipeline):
+    """Retriever returning a fixed list of documents after an optional delay."""
+
+    def __init__(self, documents: Optional[List[Document]] = None, latency: float = 0.0):
+        self.documents = documents or []
+        self.latency = latency
+
+    def retrieve_documents(self, query: str, filters: Optional[Dict[str, Any]] = None) -> List[Document]:
+        time.sleep(self.latency)
+        return list(self.documents)
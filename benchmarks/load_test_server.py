@@ -0,0 +1,143 @@
+"""
+Load generator for the streaming HTTP API (src/server.py).
+Virtual users chat over SSE for a fixed time, each in its own server-side session, sending only their new
+message every turn. Reports sustained requests/sec, time to first token and total latency percentiles,
+refused requests (503/409) and cross-talk between sessions.
+By default the server runs in-process on a random port with fake LLM and retriever backends;
+--url targets a running server instead.
+
+Usage: python -m benchmarks.load_test_server [--users 64] [--duration 10] [--slots 8] [--max-concurrent 64]
+                                             [--latency 0.05] [--tokens-per-second 200] [--url http://host:8000]
+"""
+import argparse
+import asyncio
+import json
+import threading
+import time
+from collections import Counter
+from typing import List, Dict, Any
+
+import httpx
+import numpy as np
+import uvicorn
+
+from benchmarks.fakes import FakeChatGenerator, StaticRetriever
+from src.inference import InferenceEngine
+from src.keyword_extractor import LexiconKeywordExtractor
+from src.server import ChatServer, SessionStore
+
+
+def _marker(user: int) -> str:
+    return f"user-{user}"
+
+
+def _start_server(args: argparse.Namespace) -> uvicorn.Server:
+    engine = InferenceEngine(
+        retriever=StaticRetriever(),
+        llm=FakeChatGenerator(latency=args.latency, tokens_per_second=args.tokens_per_second),
+        keyword_extractor=LexiconKeywordExtractor(),
+        max_concurrent_generations=args.slots,
+    )
+    app = ChatServer(engine, SessionStore(), max_concurrent_requests=args.max_concurrent).app()
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=0, log_level="warning",
+                                           backlog=4096, timeout_keep_alive=30))
+    threading.Thread(target=server.run, name="chat-server", daemon=True).start()
+    while not server.started:
+        time.sleep(0.05)
+    port = server.servers[0].sockets[0].getsockname()[1]
+    args.url = f"http://127.0.0.1:{port}"
+    return server
+
+
+async def _chat(client: httpx.AsyncClient, url: str, message: str, session_id: str, results: Dict[str, Any]):
+    """One request. Returns the session id the server assigned and the answer (None if refused)."""
+    start = time.perf_counter()
+    first_token, answer = None, []
+    async with client.stream("POST", f"{url}/chat", json={"message": message, "session_id": session_id}) as response:
+        if response.status_code != 200:
+            await response.aread()
+            results["statuses"][response.status_code] += 1
+            results["retry_after"] = float(response.headers.get("Retry-After", 1))
+            return session_id, None
+        event = None
+        async for line in response.aiter_lines():
+            if line.startswith("event: "):
+                event = line[len("event: "):]
+            elif line.startswith("data: "):
+                data = json.loads(line[len("data: "):])
+                if event == "session":
+                    session_id = data["session_id"]
+                elif event == "error":
+                    results["statuses"]["stream_error"] += 1
+                    return session_id, None
+                elif event is None:
+                    first_token = first_token or time.perf_counter()
+                    answer.append(data["token"])
+            elif not line:
+                event = None
+
+    results["statuses"][200] += 1
+    results["ttft"].append((first_token or time.perf_counter()) - start)
+    results["total"].append(time.perf_counter() - start)
+    return session_id, "".join(answer)
+
+
+async def _user(client: httpx.AsyncClient, url: str, user: int, until: float, results: Dict[str, Any]):
+    session_id, turn = None, 0
+    while time.perf_counter() < until:
+        session_id, answer = await _chat(client, url, f"{_marker(user)} turn-{turn}", session_id, results)
+        if answer is None:
+            await asyncio.sleep(min(results["retry_after"], max(0.0, until - time.perf_counter())))
+            continue
+        results["cross_talk"] += sum(1 for token in answer.split()
+                                     if token.startswith("user-") and token != _marker(user))
+        turn += 1
+
+
+async def _run(args: argparse.Namespace) -> Dict[str, Any]:
+    results = {"statuses": Counter(), "ttft": [], "total": [], "cross_talk": 0, "retry_after": 1.0}
+    limits = httpx.Limits(max_connections=args.users, max_keepalive_connections=args.users)
+    async with httpx.AsyncClient(timeout=120.0, limits=limits) as client:
+        start = time.perf_counter()
+        until = start + args.duration
+        await asyncio.gather(*[_user(client, args.url, user, until, results) for user in range(args.users)])
+        results["elapsed"] = time.perf_counter() - start
+        metrics = (await client.get(f"{args.url}/metrics")).text
+    results["metrics_lines"] = len(metrics.splitlines())
+    return results
+
+
+def _percentiles(label: str, seconds: List[float]):
+    ms = np.array(seconds) * 1000
+    print(f"{label:<21}p50 {np.percentile(ms, 50):8.1f} ms   p95 {np.percentile(ms, 95):8.1f} ms   "
+          f"p99 {np.percentile(ms, 99):8.1f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=64, help="Concurrent virtual users, one session each.")
+    parser.add_argument("--duration", type=float, default=10.0, help="Seconds to send requests for.")
+    parser.add_argument("--slots", type=int, default=8, help="max_concurrent_generations of the engine")
+    parser.add_argument("--max-concurrent", type=int, default=64, help="max_concurrent_requests of the server")
+    parser.add_argument("--latency", type=float, default=0.05, help="Fake LLM latency per call (seconds).")
+    parser.add_argument("--tokens-per-second", type=float, default=200.0)
+    parser.add_argument("--url", help="Run against this server instead of an in-process one with fake backends.")
+    args = parser.parse_args()
+
+    server = _start_server(args) if args.url is None else None
+    results = asyncio.run(_run(args))
+    elapsed = results["elapsed"]
+    if server is not None:
+        server.should_exit = True
+
+    completed = results["statuses"][200]
+    print(f"{completed} answers to {args.users} users in {elapsed:.1f}s: {completed / elapsed:.1f} req/s sustained")
+    print(f"responses: {dict(results['statuses'])}, cross-talk tokens: {results['cross_talk']}, "
+          f"/metrics lines: {results['metrics_lines']}")
+    if completed:
+        _percentiles("time to first token", results["ttft"])
+        _percentiles("total", results["total"])
+
+
+if __name__ == "__main__":
+    main()
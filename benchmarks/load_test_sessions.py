@@ -0,0 +1,91 @@
+"""
+Simulates N parallel chat sessions against one shared InferenceEngine with fake backends
+and checks that no session receives tokens from another one.
+
+Usage: python -m benchmarks.load_test_sessions [--sessions 32] [--turns 3] [--mode async|sync] [--slots 8]
+"""
+import argparse
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmarks.fakes import FakeChatGenerator, StaticRetriever
+from src.inference import InferenceEngine
+from src.keyword_extractor import LexiconKeywordExtractor
+
+
+def _marker(session: int) -> str:
+    return f"session-{session}"
+
+
+def _cross_talk(session: int, answer: str) -> int:
+    """Counts tokens in the answer that belong to a different session."""
+    return sum(1 for token in answer.split() if token.startswith("session-") and token != _marker(session))
+
+
+def _history(session: int, turn: int, answers: list) -> list:
+    history = []
+    for previous, answer in enumerate(answers):
+        history.append({"role": "user", "content": f"{_marker(session)} turn-{previous}"})
+        history.append({"role": "assistant", "content": answer})
+    history.append({"role": "user", "content": f"{_marker(session)} turn-{turn}"})
+    return history
+
+
+def _run_sync_session(engine: InferenceEngine, session: int, turns: int) -> int:
+    answers, violations = [], 0
+    for turn in range(turns):
+        answer = "".join(engine.stream_response(_history(session, turn, answers)))
+        violations += _cross_talk(session, answer)
+        answers.append(answer)
+    return violations
+
+
+async def _run_async_session(engine: InferenceEngine, session: int, turns: int) -> int:
+    answers, violations = [], 0
+    for turn in range(turns):
+        answer = "".join([token async for token in engine.astream_response(_history(session, turn, answers))])
+        violations += _cross_talk(session, answer)
+        answers.append(answer)
+    return violations
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sessions", type=int, default=32)
+    parser.add_argument("--turns", type=int, default=3)
+    parser.add_argument("--mode", choices=["async", "sync"], default="async")
+    parser.add_argument("--slots", type=int, default=8, help="max_concurrent_generations of the engine")
+    parser.add_argument("--latency", type=float, default=0.05, help="Fake LLM latency per call (seconds).")
+    parser.add_argument("--tokens-per-second", type=float, default=200.0)
+    args = parser.parse_args()
+
+    engine = InferenceEngine(
+        retriever=StaticRetriever(),
+        llm=FakeChatGenerator(latency=args.latency, tokens_per_second=args.tokens_per_second),
+        keyword_extractor=LexiconKeywordExtractor(),
+        max_concurrent_generations=args.slots,
+    )
+
+    start = time.perf_counter()
+    if args.mode == "async":
+        async def run_all():
+            return await asyncio.gather(
+                *(_run_async_session(engine, session, args.turns) for session in range(args.sessions))
+            )
+        violations = asyncio.run(run_all())
+    else:
+        with ThreadPoolExecutor(max_workers=args.sessions) as pool:
+            violations = list(pool.map(lambda s: _run_sync_session(engine, s, args.turns), range(args.sessions)))
+    elapsed = time.perf_counter() - start
+
+    requests = args.sessions * args.turns
+    print(f"{requests} requests from {args.sessions} sessions in {elapsed:.2f}s "
+          f"({requests / elapsed:.1f} req/s, {args.slots} generation slots)")
+    print(f"Cross-talk tokens: {sum(violations)}")
+    if sum(violations):
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
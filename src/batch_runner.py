@@ -0,0 +1,255 @@
+"""
+Runs a file of queries through the InferenceEngine with a bounded pool of workers.
+
+Every finished query is appended to a JSONL results file right away, and that file is the checkpoint:
+a rerun with the same input and output skips the rows that already succeeded, so a crash or Ctrl-C
+never repeats the paid LLM calls that were already made. Failed rows are retried on the next run.
+
+Usage: python -m src.batch_runner notebooks/results/test_queries.csv --output notebooks/results/batch.jsonl
+                                  [--workers 8] [--limit 100] [--csv notebooks/results/test_query_results.csv]
+"""
+import argparse
+import csv
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor, Future, wait, FIRST_COMPLETED
+from pathlib import Path
+from typing import List, Dict, Any, Optional, Iterable, Set
+
+from .utils import load_config
+
+logging.basicConfig(
+    format="%(asctime)s - %(levelname)s - %(name)s - %(message)s",
+    datefmt="%Y-%m-%d %H:%M:%S",
+    level=logging.INFO
+)
+logger = logging.getLogger("BatchRunner")
+
+
+def read_queries(path: Path) -> List[Dict[str, Any]]:
+    """
+    Reads queries from a CSV or JSONL file. Every row needs a `query` column; all other columns
+    (e.g. keyword, expected_recipe) are copied to the results. A JSONL row may carry a `messages`
+    list instead, to replay a multi-turn conversation.
+    """
+    if path.suffix.lower() == ".jsonl":
+        with open(path, encoding="utf-8") as file:
+            rows = [json.loads(line) for line in file if line.strip()]
+    else:
+        with open(path, newline="", encoding="utf-8") as file:
+            rows = list(csv.DictReader(file))
+
+    for number, row in enumerate(rows, 1):
+        if not row.get("query") and not row.get("messages"):
+            raise ValueError(f"Row {number} of {path} has neither a 'query' nor a 'messages' field.")
+    return rows
+
+
+def _row_keys(rows: List[Dict[str, Any]]) -> List[str]:
+    """
+    Stable key per row: the `id` column if there is one, otherwise a hash of the row content plus its
+    occurrence number, so reordering the input does not invalidate the checkpoint and duplicates stay distinct.
+    """
+    keys, occurrences = [], Counter()
+    for row in rows:
+        if row.get("id") not in (None, ""):
+            keys.append(str(row["id"]))
+            continue
+        digest = hashlib.sha256(json.dumps(row, sort_keys=True, default=str).encode("utf-8")).hexdigest()[:16]
+        keys.append(f"{digest}-{occurrences[digest]}")
+        occurrences[digest] += 1
+    return keys
+
+
+def load_checkpoint(path: Path) -> Dict[str, Dict[str, Any]]:
+    """Latest result per key from a results file. A line cut off by a crash is ignored."""
+    results = {}
+    if not path.exists():
+        return results
+
+    with open(path, encoding="utf-8") as file:
+        for line in file:
+            try:
+                result = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            results[result["key"]] = result
+    return results
+
+
+class ResultWriter:
+    """Appends results as JSON lines and flushes each one to disk before the next query is counted as done."""
+
+    def __init__(self, path: Path):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        # a crash may leave a partial last line; start on a fresh line so the next result stays parseable
+        needs_newline = path.exists() and path.stat().st_size and not path.read_bytes().endswith(b"\n")
+        self._file = open(path, "a", encoding="utf-8")
+        if needs_newline:
+            self._file.write("\n")
+        self._lock = threading.Lock()
+
+    def write(self, result: Dict[str, Any]):
+        line = json.dumps(result, ensure_ascii=False, default=str)
+        with self._lock:
+            self._file.write(line + "\n")
+            self._file.flush()
+            os.fsync(self._file.fileno())
+
+    def close(self):
+        self._file.close()
+
+
+def _run_query(engine: Any, key: str, row: Dict[str, Any]) -> Dict[str, Any]:
+    """Streams one answer and returns the row with its response, timings and status."""
+    message_history = row.get("messages") or [{"role": "user", "content": row["query"]}]
+    trace = engine.telemetry.trace("batch")
+    start = time.perf_counter()
+    result = {**row, "key": key, "status": "ok", "response": "", "error": None}
+
+    try:
+        # one memory session per row: rows that open with the same message are still separate conversations
+        result["response"] = "".join(engine.stream_response(message_history, trace, session_id=key))
+    except Exception as e:
+        result.update(status="error", error=f"{type(e).__name__}: {e}")
+
+    ttft = next((span["duration_ms"] for span in trace.to_dict()["spans"] if span["name"] == "ttft"), None)
+    result.update(
+        latency_s=round(time.perf_counter() - start, 3),
+        ttft_s=round(ttft / 1000, 3) if ttft is not None else None,
+        trace_id=trace.trace_id,
+    )
+    return result
+
+
+def run_batch(engine: Any, rows: List[Dict[str, Any]], output: Path, workers: int = 8,
+              log_every: int = 25) -> Dict[str, Dict[str, Any]]:
+    """
+    Runs every row that has no successful result in `output` yet and appends the new results to it.
+
+    Args:
+        engine: A ready InferenceEngine (or anything with `stream_response` and `telemetry`).
+        rows: Rows as returned by `read_queries`.
+        output: JSONL results file, also used as the checkpoint.
+        workers: Queries in flight at the same time. Only this many are submitted at once,
+            so an interrupted run leaves at most `workers` queries unfinished.
+        log_every: Log progress after this many finished queries.
+
+    Returns:
+        The latest result per row key, including the ones from earlier runs.
+    """
+    keys = _row_keys(rows)
+    results = load_checkpoint(output)
+    pending = [(key, row) for key, row in zip(keys, rows) if results.get(key, {}).get("status") != "ok"]
+    logger.info(f"{len(rows) - len(pending)} of {len(rows)} queries already done. Running {len(pending)}...")
+    if not pending:
+        return results
+
+    writer = ResultWriter(output)
+    start = time.perf_counter()
+    outcomes = Counter()
+    in_flight: Set[Future] = set()
+    queue = iter(pending)
+
+    def record(future: Future):
+        result = future.result()
+        writer.write(result)
+        results[result["key"]] = result
+        outcomes[result["status"]] += 1
+
+    try:
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="batch-query") as executor:
+            try:
+                while True:
+                    for key, row in queue:
+                        in_flight.add(executor.submit(_run_query, engine, key, row))
+                        if len(in_flight) >= workers:
+                            break
+                    if not in_flight:
+                        break
+
+                    done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        record(future)
+
+                    finished = sum(outcomes.values())
+                    if finished % log_every == 0 or finished == len(pending):
+                        rate = finished / (time.perf_counter() - start)
+                        logger.info(f"{finished}/{len(pending)} queries ({outcomes['error']} failed), "
+                                    f"{rate:.2f} queries/s, ETA {(len(pending) - finished) / rate:.0f}s")
+            except KeyboardInterrupt:
+                # the calls in flight are already paid for: keep their results before exiting
+                logger.warning(f"Interrupted. Waiting for {len(in_flight)} queries in flight...")
+                for future in in_flight:
+                    record(future)
+                raise
+    finally:
+        writer.close()
+
+    return results
+
+
+def export_csv(rows: List[Dict[str, Any]], results: Dict[str, Dict[str, Any]], path: Path):
+    """
+    Writes the results in input order as CSV with the input columns plus `response`, the format of
+    notebooks/results/test_query_results.csv. Failed rows get "ERROR: ..." as response, like the notebook.
+    """
+    columns = [column for column in rows[0] if column != "messages"] + ["response"]
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, "w", newline="", encoding="utf-8") as file:
+        writer = csv.DictWriter(file, fieldnames=columns, extrasaction="ignore")
+        writer.writeheader()
+        for key, row in zip(_row_keys(rows), rows):
+            result = results.get(key)
+            if result is None:
+                continue
+            response = result["response"] if result["status"] == "ok" else f"ERROR: {result['error']}"
+            writer.writerow({**row, "response": response})
+
+
+def _summary(results: Iterable[Dict[str, Any]]) -> str:
+    results = list(results)
+    latencies = sorted(result["latency_s"] for result in results if result["status"] == "ok")
+    failed = sum(1 for result in results if result["status"] != "ok")
+    if not latencies:
+        return f"0 succeeded, {failed} failed"
+    p50 = latencies[len(latencies) // 2]
+    p95 = latencies[min(len(latencies) - 1, int(0.95 * len(latencies)))]
+    return f"{len(latencies)} succeeded, {failed} failed, latency p50 {p50:.2f}s p95 {p95:.2f}s"
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("queries", type=Path, help="CSV or JSONL file with a 'query' column.")
+    parser.add_argument("--output", type=Path, required=True, help="JSONL results file, also the checkpoint.")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="Concurrent queries. Defaults to inference.max_concurrent_generations.")
+    parser.add_argument("--limit", type=int, default=None, help="Only run the first N queries.")
+    parser.add_argument("--csv", type=Path, default=None, help="Also export all results in input order as CSV.")
+    args = parser.parse_args(argv)
+
+    from .inference import InferenceEngine
+
+    rows = read_queries(args.queries)[:args.limit]
+    workers = args.workers or load_config().get("inference", {}).get("max_concurrent_generations", 8)
+
+    engine = InferenceEngine.from_config()
+    # batch results should come from the complete index, not the partial one served during ingestion
+    if not engine.wait_until_ready():
+        raise RuntimeError(f"Inference engine failed to start: {engine.status()['error']}")
+
+    results = run_batch(engine, rows, args.output, workers)
+    logger.info(_summary(results[key] for key in _row_keys(rows) if key in results))
+
+    if args.csv:
+        export_csv(rows, results, args.csv)
+        logger.info(f"Results exported to: {args.csv}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,230 @@
+import json
+import logging
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import List, Optional, Tuple, Any, Dict, Callable
+
+import numpy as np
+
+from .utils import PROJECT_ROOT, read_index_version
+
+logger = logging.getLogger("Cache")
+
+
+def normalize_query(text: str) -> str:
+    """Lowercases and collapses whitespace so trivially different queries share a cache entry."""
+    return " ".join(text.lower().split())
+
+
+class EmbeddingCache:
+    """
+    Two-tier cache for query embeddings keyed by (embeddings_model, normalized query).
+    A bounded in-memory LRU sits in front of an optional SQLite file on disk.
+    """
+
+    def __init__(self, max_entries: int = 1024, persist_path: Optional[Path] = None):
+        """
+        Args:
+            max_entries: Maximum number of embeddings kept in memory.
+            persist_path: SQLite file for the on-disk tier. None keeps the cache in memory only.
+        """
+        self.max_entries = max_entries
+        self.persist_path = persist_path
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+        self._entries: OrderedDict[Tuple[str, str], List[float]] = OrderedDict()
+        self._lock = threading.Lock()
+        self._db = self._open_db(persist_path) if persist_path else None
+
+    @classmethod
+    def from_config(cls, config: Dict[str, Any]) -> Optional["EmbeddingCache"]:
+        """Builds the cache from the `embedding_cache` section of config.yaml, or None if disabled."""
+        cache_config = config.get("embedding_cache", {})
+        if not cache_config.get("enabled", False):
+            return None
+
+        persist_path = None
+        if cache_config.get("persist", False):
+            persist_path = PROJECT_ROOT / cache_config.get("path", "db/embedding_cache.sqlite3")
+
+        return cls(max_entries=cache_config.get("max_entries", 1024), persist_path=persist_path)
+
+    @staticmethod
+    def _open_db(path: Path) -> sqlite3.Connection:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        db = sqlite3.connect(str(path), check_same_thread=False)
+        db.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings ("
+            "model TEXT NOT NULL, query TEXT NOT NULL, embedding TEXT NOT NULL, "
+            "PRIMARY KEY (model, query))"
+        )
+        db.commit()
+        logger.info(f"Embedding cache persisted at: {path}")
+        return db
+
+    def get(self, model: str, text: str) -> Optional[List[float]]:
+        key = (model, normalize_query(text))
+
+        with self._lock:
+            embedding = self._entries.get(key)
+            if embedding is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return embedding
+
+            if self._db is not None:
+                row = self._db.execute(
+                    "SELECT embedding FROM embeddings WHERE model = ? AND query = ?", key
+                ).fetchone()
+                if row is not None:
+                    embedding = json.loads(row[0])
+                    self._remember(key, embedding)
+                    self.hits += 1
+                    self.disk_hits += 1
+                    return embedding
+
+            self.misses += 1
+            return None
+
+    def put(self, model: str, text: str, embedding: List[float]):
+        key = (model, normalize_query(text))
+
+        with self._lock:
+            self._remember(key, embedding)
+            if self._db is not None:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO embeddings (model, query, embedding) VALUES (?, ?, ?)",
+                    (*key, json.dumps(embedding))
+                )
+                self._db.commit()
+
+    def _remember(self, key: Tuple[str, str], embedding: List[float]):
+        self._entries[key] = embedding
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "entries": len(self._entries),
+        }
+
+
+class SemanticResponseCache:
+    """
+    Caches complete answers for first-turn queries.
+    An entry is reused when the extracted keyword set is identical and the query embedding is at least
+    `similarity_threshold` cosine-similar to the cached one. Entries expire after `ttl_seconds`, the least
+    recently used ones are evicted beyond `max_entries`, and everything is dropped when the index version changes.
+    """
+
+    def __init__(self, similarity_threshold: float = 0.95, ttl_seconds: float = 3600.0, max_entries: int = 256,
+                 index_version: Callable[[], Optional[str]] = lambda: None):
+        """
+        Args:
+            similarity_threshold: Minimum cosine similarity between query embeddings for a hit.
+            ttl_seconds: Lifetime of an entry.
+            max_entries: Maximum number of cached answers.
+            index_version: Returns the current version of the document index; a change invalidates the cache.
+        """
+        self.similarity_threshold = similarity_threshold
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.index_version = index_version
+        self.hits = 0
+        self.misses = 0
+        self.latency_saved = 0.0
+
+        self._entries: OrderedDict[int, Dict[str, Any]] = OrderedDict()
+        self._next_id = 0
+        self._version = None
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_config(cls, config: Dict[str, Any]) -> Optional["SemanticResponseCache"]:
+        """Builds the cache from the `response_cache` section of config.yaml, or None if disabled."""
+        cache_config = config.get("response_cache", {})
+        if not cache_config.get("enabled", False):
+            return None
+
+        version_path = PROJECT_ROOT / config["paths"]["index_version"]
+        return cls(
+            similarity_threshold=cache_config.get("similarity_threshold", 0.95),
+            ttl_seconds=cache_config.get("ttl_seconds", 3600.0),
+            max_entries=cache_config.get("max_entries", 256),
+            index_version=lambda: read_index_version(version_path),
+        )
+
+    @staticmethod
+    def _unit(embedding: List[float]) -> np.ndarray:
+        vector = np.asarray(embedding, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def _check_version(self):
+        version = self.index_version()
+        if version != self._version:
+            if self._entries:
+                logger.info("Document index changed. Clearing response cache.")
+            self._entries.clear()
+            self._version = version
+
+    def get(self, embedding: List[float], keywords: List[str]) -> Optional[str]:
+        query = self._unit(embedding)
+        keyword_set = frozenset(keywords)
+
+        with self._lock:
+            self._check_version()
+            now = time.monotonic()
+            for entry_id in [i for i, e in self._entries.items() if now - e["created"] > self.ttl_seconds]:
+                del self._entries[entry_id]
+
+            candidates = [(i, e) for i, e in self._entries.items() if e["keywords"] == keyword_set]
+            if candidates:
+                similarities = np.stack([e["embedding"] for _, e in candidates]) @ query
+                best = int(np.argmax(similarities))
+                if similarities[best] >= self.similarity_threshold:
+                    entry_id, entry = candidates[best]
+                    self._entries.move_to_end(entry_id)
+                    self.hits += 1
+                    self.latency_saved += entry["latency"]
+                    logger.info(f"Response cache hit (similarity {similarities[best]:.3f}). {self.stats()}")
+                    return entry["answer"]
+
+            self.misses += 1
+            return None
+
+    def put(self, embedding: List[float], keywords: List[str], answer: str, latency: float):
+        """Stores an answer together with the time it took to produce it."""
+        with self._lock:
+            self._check_version()
+            self._entries[self._next_id] = {
+                "embedding": self._unit(embedding),
+                "keywords": frozenset(keywords),
+                "answer": answer,
+                "latency": latency,
+                "created": time.monotonic(),
+            }
+            self._next_id += 1
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "latency_saved_seconds": round(self.latency_saved, 3),
+            "entries": len(self._entries),
+        }
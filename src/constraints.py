@@ -0,0 +1,201 @@
+import re
+from typing import List, Dict, Any, Optional, Tuple
+
+from .keywords import keyword_conditions, all_of
+
+# The dataset's nutrition column: calories, then percent daily values of the other nutrients
+NUTRITION_COLUMNS = ("calories", "fat", "sugar", "sodium", "protein", "saturated_fat", "carbs")
+
+# Daily values the percentages refer to, in grams (sodium in milligrams)
+DAILY_VALUES = {"fat": 65.0, "sugar": 50.0, "sodium": 2400.0, "protein": 50.0, "saturated_fat": 20.0, "carbs": 300.0}
+
+NUTRIENT_FIELDS = {
+    "calories": "calories", "fat": "fat_g", "sugar": "sugar_g", "sodium": "sodium_mg", "protein": "protein_g",
+    "saturated_fat": "saturated_fat_g", "carbs": "carbs_g",
+}
+
+# numeric metadata fields that queries can put ranges on
+NUMERIC_FIELDS = ("minutes",) + tuple(NUTRIENT_FIELDS.values())
+
+# A range is (low, high), both inclusive; None means unbounded
+Range = Tuple[Optional[float], Optional[float]]
+
+_NUMBER = r"\d+(?:\.\d+)?|half an|half a|an|one|two|three"
+_NUMBER_WORDS = {"half an": 0.5, "half a": 0.5, "an": 1.0, "one": 1.0, "two": 2.0, "three": 3.0}
+
+_UPPER_BEFORE = ("under", "less than", "fewer than", "below", "lower than", "at most", "no more than",
+                 "not more than", "up to", "max", "maximum", "within", "<=", "<")
+_LOWER_BEFORE = ("over", "more than", "above", "greater than", "higher than", "at least", "no less than",
+                 "not less than", "min", "minimum", ">=", ">")
+_UPPER_AFTER = ("or less", "or fewer", "or under", "or below", "max", "maximum", "tops", "at most")
+_LOWER_AFTER = ("or more", "or over", "or above", "plus", "minimum", "at least")
+
+_UNITS = {
+    "minute": ("minutes", "minute", "mins", "min"),
+    "hour": ("hours", "hour", "hrs", "hr", "h"),
+    "calorie": ("calories", "calorie", "kcal", "cals", "cal"),
+    "gram": ("grams", "gram", "g"),
+    "milligram": ("milligrams", "milligram", "mg"),
+    "percent": ("percent", "%"),
+}
+_NUTRIENTS = {
+    "saturated_fat": ("saturated fat", "sat fat"),
+    "fat": ("fat",),
+    "sugar": ("sugars", "sugar"),
+    "sodium": ("sodium", "salt"),
+    "protein": ("protein",),
+    "carbs": ("carbohydrates", "carbohydrate", "carbs", "carb"),
+}
+
+
+def _alternatives(phrases) -> str:
+    # longest first, so "less than" wins over a shorter phrase it contains
+    return "|".join(re.escape(phrase) for phrase in sorted(phrases, key=len, reverse=True))
+
+
+_UNIT_NAMES = {spelling: unit for unit, spellings in _UNITS.items() for spelling in spellings}
+_NUTRIENT_NAMES = {spelling: nutrient for nutrient, spellings in _NUTRIENTS.items() for spelling in spellings}
+
+_QUANTITY = re.compile(
+    rf"(?:(?<![a-z])(?P<before>{_alternatives(_UPPER_BEFORE + _LOWER_BEFORE)})\s*)?"
+    rf"(?:(?<![a-z])between\s+(?P<between>{_NUMBER})\s+and\s+|(?<![\w.])(?P<low>\d+(?:\.\d+)?)\s*(?:-|to)\s*)?"
+    rf"(?<![\w.])(?P<value>{_NUMBER})\s*-?\s*(?P<unit>{_alternatives(_UNIT_NAMES)})(?![a-z])"
+    rf"(?:\s+of)?(?:\s+(?P<nutrient>{_alternatives(_NUTRIENT_NAMES)})(?![a-z]))?"
+    rf"(?:\s+(?P<after>{_alternatives(_UPPER_AFTER + _LOWER_AFTER)})(?![a-z]))?"
+)
+
+# what may stand between two quantities for the second to share the comparison of the first
+_JOINED = re.compile(r"\s*(?:,\s*(?:and\s+)?|and\s+)")
+# what may stand between the hours and the minutes of one duration ("1 hour 30 minutes", "1 hour and 30 minutes")
+_COMPOUND = re.compile(r"\s*(?:and\s+)?")
+
+
+def parse_nutrition(text: Any) -> Dict[str, float]:
+    """
+    Typed nutrition fields (NUTRIENT_FIELDS) from the dataset's nutrition column, e.g. "[51.5, 0.0, 13.0, ...]".
+    Percent daily values are converted to grams (sodium to milligrams). Malformed values give no fields.
+    """
+    values = re.findall(r"-?\d+(?:\.\d+)?", str(text or ""))
+    if len(values) != len(NUTRITION_COLUMNS):
+        return {}
+
+    fields = {}
+    for column, value in zip(NUTRITION_COLUMNS, map(float, values)):
+        amount = value if column == "calories" else value / 100.0 * DAILY_VALUES[column]
+        fields[NUTRIENT_FIELDS[column]] = round(amount, 1)
+    return fields
+
+
+def _number(text: str) -> float:
+    return _NUMBER_WORDS.get(text, None) or float(text)
+
+
+def _field_and_scale(unit: str, nutrient: Optional[str]) -> Optional[Tuple[str, float]]:
+    """The metadata field a quantity constrains and the factor converting it to the field's unit."""
+    if unit == "minute":
+        return "minutes", 1.0
+    if unit == "hour":
+        return "minutes", 60.0
+    if unit == "calorie":
+        return "calories", 1.0
+    if nutrient is None:
+        return None
+    if unit == "percent":
+        return NUTRIENT_FIELDS[nutrient], DAILY_VALUES[nutrient] / 100.0
+    if nutrient == "sodium":
+        return "sodium_mg", 1.0 if unit == "milligram" else 1000.0
+    return NUTRIENT_FIELDS[nutrient], 0.001 if unit == "milligram" else 1.0
+
+
+def _quantities(query: str) -> List[Dict[str, Any]]:
+    """
+    The quantities in a (lower case) query in order, as the field they constrain, the value in the field's unit
+    and their comparison. Hours directly followed by minutes are one duration: "1 hour 30 minutes" is 90 minutes.
+    """
+    quantities = []
+    for match in _QUANTITY.finditer(query):
+        unit = _UNIT_NAMES[match["unit"]]
+        nutrient = _NUTRIENT_NAMES.get(match["nutrient"]) if match["nutrient"] else None
+        target = _field_and_scale(unit, nutrient)
+        field, scale = target if target is not None else (None, 1.0)
+        low_text = match["between"] or match["low"]
+        quantity = {
+            "field": field, "unit": unit, "value": _number(match["value"]) * scale,
+            "low": _number(low_text) * scale if low_text else None,
+            "before": match["before"], "after": match["after"], "start": match.start(), "end": match.end(),
+        }
+
+        previous = quantities[-1] if quantities else None
+        if (previous is not None and previous["unit"] == "hour" and unit == "minute"
+                and previous["low"] is None and not previous["after"] and quantity["low"] is None
+                and not quantity["before"] and _COMPOUND.fullmatch(query, previous["end"], quantity["start"])):
+            previous.update(value=previous["value"] + quantity["value"], after=quantity["after"],
+                            end=quantity["end"])
+            continue
+        quantities.append(quantity)
+    return quantities
+
+
+def parse_constraints(query: str) -> Dict[str, Range]:
+    """
+    Numeric constraints in a query, e.g. "under 30 minutes", "less than 400 calories", "at least 20g protein",
+    "between 1 and 2 hours", "under 1 hour 30 minutes", as inclusive ranges per field in NUMERIC_FIELDS.
+    Only compared quantities are constraints: "I have 200g of sugar" describes an ingredient, not a limit.
+    A quantity joined to a compared one by "and" or a comma shares its comparison ("under 30 minutes and
+    400 calories"). Several constraints on one field are intersected.
+    """
+    ranges: Dict[str, List[Optional[float]]] = {}
+    query = query.lower()
+    previous_bound, previous_end = None, None
+    for quantity in _quantities(query):
+        if quantity["low"] is not None:
+            bound = "range"
+        elif quantity["before"] in _LOWER_BEFORE or quantity["after"] in _LOWER_AFTER:
+            bound = "low"
+        elif quantity["before"] or quantity["after"]:
+            bound = "high"
+        elif previous_bound in ("low", "high") and _JOINED.fullmatch(query, previous_end, quantity["start"]):
+            bound = previous_bound
+        else:
+            bound = None
+        previous_bound, previous_end = bound, quantity["end"]
+
+        field, value = quantity["field"], quantity["value"]
+        if field is None or bound is None:
+            continue
+        if bound == "range":
+            low, high = quantity["low"], value
+        elif bound == "low":
+            low, high = value, None
+        else:
+            low, high = None, value
+
+        bounds = ranges.setdefault(field, [None, None])
+        if low is not None:
+            bounds[0] = low if bounds[0] is None else max(bounds[0], low)
+        if high is not None:
+            bounds[1] = high if bounds[1] is None else min(bounds[1], high)
+
+    return {field: (low, high) for field, (low, high) in ranges.items()}
+
+
+def range_conditions(ranges: Dict[str, Range]) -> List[Dict[str, Any]]:
+    """Haystack filter conditions for the given ranges."""
+    conditions = []
+    for field, (low, high) in ranges.items():
+        if low is not None:
+            conditions.append({"field": f"meta.{field}", "operator": ">=", "value": low})
+        if high is not None:
+            conditions.append({"field": f"meta.{field}", "operator": "<=", "value": high})
+    return conditions
+
+
+def constraint_labels(ranges: Dict[str, Range]) -> List[str]:
+    """Short labels of the ranges, e.g. for logs and cache keys: ["minutes<=30", "protein_g>=20"]."""
+    return [f"{condition['field'][len('meta.'):]}{condition['operator']}{condition['value']:g}"
+            for condition in range_conditions(ranges)]
+
+
+def constraint_filters(keywords: List[str], ranges: Dict[str, Range]) -> Optional[Dict[str, Any]]:
+    """Haystack metadata filter requiring every keyword and every range, or None if there are neither."""
+    return all_of(keyword_conditions(keywords) + range_conditions(ranges))
@@ -0,0 +1,119 @@
+import logging
+import math
+from typing import List, Optional, Tuple, Dict, Any, Callable
+
+from haystack import Document
+
+logger = logging.getLogger("Context")
+
+CHARS_PER_TOKEN = 4
+
+
+def approximate_token_count(text: str) -> int:
+    """Rough token count (about 4 characters per token for English text)."""
+    return math.ceil(len(text) / CHARS_PER_TOKEN)
+
+
+def load_token_counter(tokenizer_name: Optional[str]) -> Callable[[str], int]:
+    """
+    Returns a token counting function using the model's tokenizer when `transformers` is installed,
+    otherwise the character based approximation.
+    """
+    if not tokenizer_name:
+        return approximate_token_count
+
+    try:
+        from transformers import AutoTokenizer
+
+        tokenizer = AutoTokenizer.from_pretrained(tokenizer_name)
+        return lambda text: len(tokenizer.encode(text, add_special_tokens=False))
+    except Exception as e:
+        logger.warning(f"Could not load tokenizer '{tokenizer_name}' ({e}). Using approximate token counts.")
+        return approximate_token_count
+
+
+def _condense(text: str, max_chars: int) -> str:
+    if len(text) <= max_chars:
+        return text
+    return text[:max_chars].rsplit(" ", 1)[0] + " ..."
+
+
+class ContextPacker:
+    """
+    Packs ranked recipes into the prompt context under a token budget.
+    The best `full_recipes` keep their complete instructions, lower ranked ones get condensed steps,
+    and recipes that do not fit even in condensed form are dropped.
+    """
+
+    def __init__(self, token_budget: int = 3000, full_recipes: int = 3, condensed_steps_chars: int = 240,
+                 count_tokens: Callable[[str], int] = approximate_token_count):
+        """
+        Args:
+            token_budget: Maximum number of context tokens.
+            full_recipes: Number of top ranked recipes sent with their complete steps.
+            condensed_steps_chars: Length the steps of lower ranked recipes are cut to.
+            count_tokens: Token counting function, see `load_token_counter`.
+        """
+        self.token_budget = token_budget
+        self.full_recipes = full_recipes
+        self.condensed_steps_chars = condensed_steps_chars
+        self.count_tokens = count_tokens
+
+    @classmethod
+    def from_config(cls, config: Dict[str, Any]) -> "ContextPacker":
+        context_config = config.get("context", {})
+        return cls(
+            token_budget=context_config.get("token_budget", 3000),
+            full_recipes=context_config.get("full_recipes", 3),
+            condensed_steps_chars=context_config.get("condensed_steps_chars", 240),
+            count_tokens=load_token_counter(context_config.get("tokenizer")),
+        )
+
+    @staticmethod
+    def _format_recipe(doc: Document, steps: str) -> str:
+        return (
+            f"--- Recipe Option ---\n"
+            f"Name: {doc.meta.get('name')}\n"
+            f"{doc.content}\n"
+            f"Instructions: {steps}\n"
+        )
+
+    def pack(self, context_docs: List[Document]) -> Tuple[str, Dict[str, int]]:
+        """Returns the context string and token statistics for the given ranked documents."""
+        parts = []
+        used = dropped = condensed = 0
+        dropped_tokens = 0
+
+        for rank, doc in enumerate(context_docs):
+            steps = str(doc.meta.get('steps', ''))
+            full_part = self._format_recipe(doc, steps)
+            full_tokens = self.count_tokens(full_part)
+
+            candidates = [] if rank >= self.full_recipes else [(full_part, full_tokens)]
+            short_part = self._format_recipe(doc, _condense(steps, self.condensed_steps_chars))
+            candidates.append((short_part, self.count_tokens(short_part)))
+
+            for part, tokens in candidates:
+                if used + tokens <= self.token_budget:
+                    parts.append(part)
+                    used += tokens
+                    dropped_tokens += full_tokens - tokens
+                    if part is short_part and short_part != full_part:
+                        condensed += 1
+                    break
+            else:
+                dropped += 1
+                dropped_tokens += full_tokens
+
+        stats = {
+            "recipes_included": len(parts),
+            "recipes_condensed": condensed,
+            "recipes_dropped": dropped,
+            "tokens_included": used,
+            "tokens_dropped": dropped_tokens,
+        }
+        logger.info(
+            f"Context packed: {stats['recipes_included']} recipes ({condensed} condensed, {dropped} dropped), "
+            f"{used} tokens included, {dropped_tokens} tokens dropped, budget {self.token_budget}."
+        )
+        return "\n".join(parts), stats
@@ -0,0 +1,117 @@
+import logging
+import re
+import zlib
+from collections import defaultdict
+from typing import List, Dict, Optional, Set, Tuple, Iterable
+
+import numpy as np
+
+logger = logging.getLogger("Dedup")
+
+# words that tell versions of a dish apart without changing what it is
+NAME_STOPWORDS = {
+    "a", "an", "and", "the", "of", "with", "in", "my", "our", "mom", "moms", "grandma", "grandmas", "best",
+    "easy", "quick", "simple", "recipe", "style", "homemade", "famous", "favorite", "ever", "s",
+}
+
+MAX_HASH = (1 << 32) - 1
+
+
+def _words(text: str) -> List[str]:
+    return re.findall(r"[a-z0-9]+", text.lower())
+
+
+def recipe_features(name: str, ingredients: Iterable[str]) -> Set[str]:
+    """Normalized name words and ingredient names of a recipe, the set its similarity is measured on."""
+    features = {f"name:{word}" for word in _words(name) if word not in NAME_STOPWORDS}
+    for ingredient in ingredients:
+        normalized = " ".join(_words(ingredient))
+        if normalized:
+            features.add(f"ingredient:{normalized}")
+    return features
+
+
+def lsh_bands(threshold: float, num_perm: int) -> Tuple[int, int]:
+    """
+    Bands and rows per band for LSH over `num_perm` MinHash values, chosen to minimize the sum of the
+    false positive and false negative probability mass around `threshold`.
+    """
+    grid = np.linspace(0.0, 1.0, 201)
+
+    def collision(bands: int, rows: int) -> np.ndarray:
+        return 1.0 - (1.0 - grid ** rows) ** bands
+
+    best, best_error = (1, num_perm), float("inf")
+    for bands in range(1, num_perm + 1):
+        rows = num_perm // bands
+        probability = collision(bands, rows)
+        # the grid is uniform, so the mean is proportional to the integral
+        error = np.mean(np.where(grid < threshold, probability, 1.0 - probability))
+        if error < best_error:
+            best, best_error = (bands, rows), error
+    return best
+
+
+class MinHasher:
+    """MinHash signatures of string sets with `num_perm` seeded multiply-shift hash functions."""
+
+    def __init__(self, num_perm: int = 64, seed: int = 1):
+        rng = np.random.default_rng(seed)
+        self.num_perm = num_perm
+        self._a = rng.integers(1, np.iinfo(np.uint64).max, num_perm, dtype=np.uint64) | np.uint64(1)
+        self._b = rng.integers(0, np.iinfo(np.uint64).max, num_perm, dtype=np.uint64)
+
+    def signature(self, features: Set[str]) -> np.ndarray:
+        hashes = np.fromiter((zlib.crc32(feature.encode("utf-8")) for feature in features), dtype=np.uint64,
+                             count=len(features))
+        if not len(hashes):
+            return np.full(self.num_perm, MAX_HASH, dtype=np.uint32)
+        # (a * x + b) mod 2^64, keeping the high 32 bits
+        with np.errstate(over="ignore"):
+            permuted = (hashes[:, None] * self._a + self._b) >> np.uint64(32)
+        return permuted.min(axis=0).astype(np.uint32)
+
+
+class NearDuplicateIndex:
+    """
+    Streaming near-duplicate detection with MinHash LSH. The first recipe of a cluster becomes its
+    canonical; later recipes whose estimated Jaccard similarity with a canonical reaches `threshold`
+    are reported as its variants. Only canonicals are indexed, so memory grows with distinct recipes.
+    """
+
+    def __init__(self, threshold: float = 0.8, num_perm: int = 64, seed: int = 1):
+        """
+        Args:
+            threshold: Minimum Jaccard similarity of the feature sets for two recipes to be collapsed.
+            num_perm: MinHash values per recipe. More values estimate the similarity more precisely.
+            seed: Seed of the hash functions, fixed so clusters are the same on every run.
+        """
+        self.threshold = threshold
+        self.hasher = MinHasher(num_perm, seed)
+        self.bands, self.rows = lsh_bands(threshold, num_perm)
+        self._buckets: List[Dict[bytes, List[str]]] = [defaultdict(list) for _ in range(self.bands)]
+        self._signatures: Dict[str, np.ndarray] = {}
+
+    def add(self, key: str, features: Set[str]) -> Optional[str]:
+        """Returns the key of the canonical `key` duplicates, or None after indexing `key` as a new canonical."""
+        if not features:
+            return None
+
+        signature = self.hasher.signature(features)
+        bands = [signature[band * self.rows:(band + 1) * self.rows].tobytes() for band in range(self.bands)]
+
+        candidates = dict.fromkeys(
+            candidate for band, value in enumerate(bands) for candidate in self._buckets[band].get(value, ())
+        )
+        best, best_similarity = None, self.threshold
+        for candidate in candidates:
+            similarity = float(np.mean(self._signatures[candidate] == signature))
+            if similarity >= best_similarity:
+                best, best_similarity = candidate, similarity
+        if best is not None:
+            return best
+
+        self._signatures[key] = signature
+        for band, value in enumerate(bands):
+            self._buckets[band][value].append(key)
+        return None
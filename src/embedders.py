@@ -0,0 +1,355 @@
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED, Future
+from dataclasses import replace
+from itertools import islice
+from pathlib import Path
+from typing import Callable, Iterable, Iterator, List, Any, Dict, Set, Optional, Tuple
+
+from haystack import Document, component
+from haystack.components.embedders import HuggingFaceAPIDocumentEmbedder, HuggingFaceAPITextEmbedder
+from haystack.utils import Secret
+
+from .resilience import TokenBucket, retry_with_backoff
+from .telemetry import Telemetry, SIZE_BUCKETS
+from .utils import PROJECT_ROOT
+
+logger = logging.getLogger("Embedders")
+
+EMBEDDING_BACKENDS = ("api", "local")
+
+
+class ConcurrentBatchEmbedder:
+    """
+    Embeds documents with several batch requests in flight at once.
+    Requests are paced by a token bucket, retried with exponential backoff on 429/5xx,
+    and the batch size adapts to the observed response times (additive increase, multiplicative decrease).
+    Embedded batches are yielded as soon as they complete so they can be written while later ones are in flight.
+    """
+
+    def __init__(self, embedder_factory: Callable[[], Any], max_in_flight: int = 4,
+                 requests_per_second: float = 8.0, initial_batch_size: int = 32, min_batch_size: int = 4,
+                 max_batch_size: int = 128, target_batch_latency: float = 2.0, max_retries: int = 5,
+                 retry_base_delay: float = 0.5, telemetry: Optional[Telemetry] = None):
+        """
+        Args:
+            embedder_factory: Creates a Haystack document embedder. Called once per worker thread.
+            max_in_flight: Maximum number of concurrent embedding requests.
+            requests_per_second: Sustained request rate allowed by the token bucket. None disables the limit.
+            initial_batch_size: Documents per request before any adaptation.
+            min_batch_size: Lower bound for the adaptive batch size.
+            max_batch_size: Upper bound for the adaptive batch size.
+            target_batch_latency: Response time (seconds) the batch size is tuned towards.
+            max_retries: Retries per batch for rate limits and server errors.
+            retry_base_delay: Backoff cap (seconds) of the first retry; it doubles with every further one.
+            telemetry: Receives request latencies, retries and batch sizes.
+        """
+        self.embedder_factory = embedder_factory
+        self.max_in_flight = max_in_flight
+        self.min_batch_size = min_batch_size
+        self.max_batch_size = max_batch_size
+        self.target_batch_latency = target_batch_latency
+        self.max_retries = max_retries
+        self.retry_base_delay = retry_base_delay
+        self.batch_size = max(min_batch_size, min(initial_batch_size, max_batch_size))
+        self.telemetry = telemetry or Telemetry()
+
+        self._rate_limiter = TokenBucket(requests_per_second) if requests_per_second else None
+        self._local = threading.local()
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_config(cls, embedder_factory: Callable[[], Any], config: Dict[str, Any],
+                    telemetry: Optional[Telemetry] = None) -> "ConcurrentBatchEmbedder":
+        """
+        Builds the embedder from the `ingestion` section of config.yaml.
+        A local backend is not rate limited and runs one batch at a time, since a batch already uses every thread.
+        """
+        ingestion_config = config.get("ingestion", {})
+        local = config.get("embeddings_backend", "api") == "local"
+        return cls(
+            embedder_factory,
+            max_in_flight=1 if local else ingestion_config.get("max_in_flight", 4),
+            requests_per_second=None if local else ingestion_config.get("requests_per_second", 8.0),
+            initial_batch_size=ingestion_config.get("batch_size", 32),
+            min_batch_size=ingestion_config.get("min_batch_size", 4),
+            max_batch_size=ingestion_config.get("max_batch_size", 128),
+            target_batch_latency=ingestion_config.get("target_batch_latency", 2.0),
+            max_retries=ingestion_config.get("max_retries", 5),
+            retry_base_delay=ingestion_config.get("retry_base_delay", 0.5),
+            telemetry=telemetry,
+        )
+
+    def _embedder(self) -> Any:
+        if not hasattr(self._local, "embedder"):
+            self._local.embedder = self.embedder_factory()
+        return self._local.embedder
+
+    def _embed_once(self, batch: List[Document]) -> List[Document]:
+        if self._rate_limiter is not None:
+            self._rate_limiter.acquire()
+        start = time.perf_counter()
+        try:
+            with self.telemetry.timed_call("embedding"):
+                documents = self._embedder().run(documents=batch)["documents"]
+        except Exception:
+            self._shrink_batch_size()
+            raise
+        self._adapt_batch_size(time.perf_counter() - start)
+        return documents
+
+    def _embed_batch(self, batch: List[Document]) -> List[Document]:
+        self.telemetry.observe("cookcompass_embedding_batch_size", len(batch), buckets=SIZE_BUCKETS)
+        return retry_with_backoff(
+            lambda: self._embed_once(batch),
+            max_retries=self.max_retries,
+            base_delay=self.retry_base_delay,
+            on_retry=lambda attempt, error: self.telemetry.inc("cookcompass_retries_total", api="embedding"),
+        )
+
+    def _adapt_batch_size(self, latency: float):
+        with self._lock:
+            if latency > self.target_batch_latency:
+                self.batch_size = max(self.min_batch_size, self.batch_size // 2)
+            else:
+                self.batch_size = min(self.max_batch_size, self.batch_size + max(1, self.batch_size // 4))
+
+    def _shrink_batch_size(self):
+        with self._lock:
+            self.batch_size = max(self.min_batch_size, self.batch_size // 2)
+
+    def _batches(self, documents: Iterable[Document]) -> Iterator[List[Document]]:
+        """Cuts batches lazily so every new batch uses the current adaptive size."""
+        iterator = iter(documents)
+        while batch := list(islice(iterator, self.batch_size)):
+            yield batch
+
+    def embed_batches(self, documents: Iterable[Document]) -> Iterator[List[Document]]:
+        """Yields embedded batches in completion order."""
+        pool = ThreadPoolExecutor(max_workers=self.max_in_flight, thread_name_prefix="embedder")
+        pending: Set[Future] = set()
+
+        try:
+            for batch in self._batches(documents):
+                while len(pending) >= self.max_in_flight:
+                    done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        yield future.result()
+                pending.add(pool.submit(self._embed_batch, batch))
+
+            while pending:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    yield future.result()
+        finally:
+            pool.shutdown(wait=True, cancel_futures=True)
+
+
+class LocalEmbeddingModel:
+    """
+    In-process SentenceTransformers model shared by the query and the document embedder.
+    Concurrent single-query calls are coalesced into one forward pass (dynamic batching): the first query
+    waits at most `max_batch_wait` seconds for others to join its batch.
+    """
+
+    def __init__(self, encoder: Any, batch_size: int = 64, max_batch_wait: float = 0.005):
+        """
+        Args:
+            encoder: Object with a SentenceTransformers compatible `encode` method.
+            batch_size: Maximum number of texts per forward pass.
+            max_batch_wait: Seconds a query waits for other queries to share its batch.
+        """
+        self.encoder = encoder
+        self.batch_size = batch_size
+        self.max_batch_wait = max_batch_wait
+
+        self._requests: queue.Queue = queue.Queue()
+        self._encode_lock = threading.Lock()
+        self._batcher = threading.Thread(target=self._batch_queries, name="query-batcher", daemon=True)
+        self._batcher.start()
+
+    @classmethod
+    def load(cls, model_path: str, threads: Optional[int] = None, runtime: str = "torch",
+             onnx_file: Optional[str] = None, batch_size: int = 64,
+             max_batch_wait: float = 0.005) -> "LocalEmbeddingModel":
+        """
+        Loads a model directory (or hub id) with `sentence-transformers`, which is an optional dependency.
+
+        Args:
+            model_path: Local model directory. Must hold the same model the collection was embedded with.
+            threads: CPU threads used per forward pass. None keeps the library default.
+            runtime: "torch" or "onnx".
+            onnx_file: ONNX file inside the model directory, e.g. an int8 quantized "onnx/model_qint8_avx512.onnx".
+            batch_size: Maximum number of texts per forward pass.
+            max_batch_wait: Seconds a query waits for other queries to share its batch.
+        """
+        try:
+            from sentence_transformers import SentenceTransformer
+        except ImportError as e:
+            raise ImportError(
+                "The local embeddings backend needs the sentence-transformers package "
+                "(pip install sentence-transformers, plus 'optimum[onnxruntime]' for the ONNX runtime)."
+            ) from e
+
+        model_kwargs = {}
+        if runtime == "onnx":
+            if onnx_file:
+                model_kwargs["file_name"] = onnx_file
+            if threads:
+                import onnxruntime
+
+                session_options = onnxruntime.SessionOptions()
+                session_options.intra_op_num_threads = threads
+                model_kwargs["session_options"] = session_options
+        elif threads:
+            import torch
+
+            torch.set_num_threads(threads)
+
+        start = time.perf_counter()
+        encoder = SentenceTransformer(model_path, device="cpu", backend=runtime, model_kwargs=model_kwargs or None)
+        logger.info(f"Loaded local embeddings model '{model_path}' ({runtime}) in {time.perf_counter() - start:.1f}s.")
+        return cls(encoder, batch_size=batch_size, max_batch_wait=max_batch_wait)
+
+    def encode(self, texts: List[str]) -> List[List[float]]:
+        # normalized like the HF Inference API / TEI output, so vectors stay compatible with the existing collection
+        with self._encode_lock:
+            vectors = self.encoder.encode(texts, batch_size=self.batch_size, normalize_embeddings=True,
+                                          convert_to_numpy=True, show_progress_bar=False)
+        return vectors.tolist()
+
+    def encode_query(self, text: str) -> List[float]:
+        result: Future = Future()
+        self._requests.put((text, result))
+        return result.result()
+
+    def _batch_queries(self):
+        while True:
+            batch: List[Tuple[str, Future]] = [self._requests.get()]
+            deadline = time.monotonic() + self.max_batch_wait
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self._requests.get(timeout=max(0.0, deadline - time.monotonic())))
+                except queue.Empty:
+                    break
+
+            try:
+                vectors = self.encode([text for text, _ in batch])
+            except Exception as e:
+                for _, result in batch:
+                    result.set_exception(e)
+                continue
+            for (_, result), vector in zip(batch, vectors):
+                result.set_result(vector)
+
+
+@component
+class LocalTextEmbedder:
+    """Query embedder backed by a LocalEmbeddingModel."""
+
+    def __init__(self, model: LocalEmbeddingModel):
+        self.model = model
+
+    @component.output_types(embedding=List[float])
+    def run(self, text: str):
+        return {"embedding": self.model.encode_query(text)}
+
+
+@component
+class LocalDocumentEmbedder:
+    """Document embedder backed by a LocalEmbeddingModel. Embeds the document content, like the HF API embedder."""
+
+    def __init__(self, model: LocalEmbeddingModel):
+        self.model = model
+
+    @component.output_types(documents=List[Document])
+    def run(self, documents: List[Document]):
+        vectors = self.model.encode([doc.content or "" for doc in documents])
+        return {"documents": [replace(doc, embedding=vector) for doc, vector in zip(documents, vectors)]}
+
+
+_local_models: Dict[Tuple, LocalEmbeddingModel] = {}
+_local_models_lock = threading.Lock()
+
+
+def _local_model(config: Dict[str, Any]) -> LocalEmbeddingModel:
+    """Loads the configured local model once per process, so ingestion and retrieval share it."""
+    local_config = config.get("local_embeddings", {})
+    model_path = local_config.get("model_path") or config["embeddings_model"]
+    if (PROJECT_ROOT / model_path).exists():
+        model_path = str(PROJECT_ROOT / model_path)
+
+    if Path(model_path).name != config["embeddings_model"].split("/")[-1]:
+        logger.warning(f"Local model '{model_path}' does not look like '{config['embeddings_model']}'. "
+                       f"Its vectors are only compatible with the collection if it is the same model.")
+
+    key = (model_path, local_config.get("threads"), local_config.get("runtime", "torch"),
+           local_config.get("onnx_file"))
+    with _local_models_lock:
+        if key not in _local_models:
+            _local_models[key] = LocalEmbeddingModel.load(
+                model_path,
+                threads=local_config.get("threads"),
+                runtime=local_config.get("runtime", "torch"),
+                onnx_file=local_config.get("onnx_file"),
+                batch_size=local_config.get("batch_size", 64),
+                max_batch_wait=local_config.get("max_batch_wait", 0.005),
+            )
+        return _local_models[key]
+
+
+def _embeddings_backend(config: Dict[str, Any]) -> str:
+    backend = config.get("embeddings_backend", "api")
+    if backend not in EMBEDDING_BACKENDS:
+        raise ValueError(f"Unknown embeddings_backend '{backend}'. Expected one of {EMBEDDING_BACKENDS}.")
+    return backend
+
+
+def create_text_embedder(config: Dict[str, Any], api_token: str) -> Any:
+    """Query embedder for the configured `embeddings_backend`."""
+    if _embeddings_backend(config) == "local":
+        return LocalTextEmbedder(_local_model(config))
+
+    api_url = config.get("embeddings_api_url")
+    if api_url:
+        return HuggingFaceAPITextEmbedder(
+            api_type="text_embeddings_inference",
+            api_params={"url": api_url},
+            token=Secret.from_token(api_token)
+        )
+
+    return HuggingFaceAPITextEmbedder(
+        api_type="serverless_inference_api",
+        api_params={"model": config["embeddings_model"]},
+        token=Secret.from_token(api_token)
+    )
+
+
+def create_document_embedder(config: Dict[str, Any], api_token: str, batch_size: int = 32) -> Any:
+    """
+    Document embedder for the configured `embeddings_backend`.
+    With the API backend, `embeddings_api_url` points it at a Text Embeddings Inference endpoint
+    instead of the serverless API.
+    """
+    if _embeddings_backend(config) == "local":
+        return LocalDocumentEmbedder(_local_model(config))
+
+    api_url = config.get("embeddings_api_url")
+    if api_url:
+        return HuggingFaceAPIDocumentEmbedder(
+            api_type="text_embeddings_inference",
+            api_params={"url": api_url},
+            token=Secret.from_token(api_token),
+            batch_size=batch_size,
+            progress_bar=False
+        )
+
+    return HuggingFaceAPIDocumentEmbedder(
+        api_type="serverless_inference_api",
+        api_params={"model": config["embeddings_model"]},
+        token=Secret.from_token(api_token),
+        batch_size=batch_size,
+        progress_bar=False
+    )
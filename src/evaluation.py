@@ -0,0 +1,346 @@
+"""
+LLM-as-judge evaluation of (query, response) pairs with `evaluation_prompt`.
+
+Judge calls run concurrently under a shared rate limit, and the JSON scores are parsed strictly.
+A malformed reply is asked for again. Every judgment is cached in SQLite under a hash of
+(judge model, prompt version, query, response), so a re-run only pays for new or changed responses.
+Aggregates are updated as judgments arrive.
+
+Usage: python -m src.evaluation notebooks/results/test_query_results.csv --output notebooks/results/results_eval.csv
+"""
+import argparse
+import csv
+import hashlib
+import json
+import logging
+import math
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from pathlib import Path
+from typing import List, Dict, Any, Optional, Callable, Iterable
+
+from .prompts import evaluation_prompt
+from .resilience import TokenBucket, retry_with_backoff
+from .utils import PROJECT_ROOT, load_config
+
+logging.basicConfig(
+    format="%(asctime)s - %(levelname)s - %(name)s - %(message)s",
+    datefmt="%Y-%m-%d %H:%M:%S",
+    level=logging.INFO
+)
+logger = logging.getLogger("Evaluation")
+
+CRITERIA = ("relevance", "healthiness", "taste")
+
+# changes whenever evaluation_prompt is edited, so judgments made with an older prompt are not reused
+PROMPT_VERSION = hashlib.sha256(evaluation_prompt.encode("utf-8")).hexdigest()[:12]
+
+JSON_OBJECT = re.compile(r"\{[^{}]*\}")
+
+# sent after a malformed reply: at temperature 0 the same prompt alone gets the same reply back
+CORRECTION = ("Your reply could not be parsed: {error}. Reply with the JSON object only, for example "
+              '{{"relevance": 7, "healthiness": 5, "taste": 8}}, with an integer from 0 to 10 for each criterion.')
+
+
+class MalformedJudgmentError(ValueError):
+    """Raised when the judge reply is not a JSON object with an integer 0-10 score for every criterion."""
+
+
+def parse_scores(reply: str) -> Dict[str, int]:
+    """
+    Parses the judge reply. Exactly one JSON object is expected (a surrounding code fence or sentence is
+    tolerated) with an integer from 0 to 10 for every entry in CRITERIA.
+    """
+    objects = JSON_OBJECT.findall(reply or "")
+    if len(objects) != 1:
+        raise MalformedJudgmentError(f"Expected one JSON object, found {len(objects)}: {reply!r}")
+
+    try:
+        scores = json.loads(objects[0])
+    except json.JSONDecodeError as e:
+        raise MalformedJudgmentError(f"Invalid JSON ({e}): {objects[0]!r}") from e
+
+    parsed = {}
+    for criterion in CRITERIA:
+        value = scores.get(criterion)
+        # bool is an int subclass; 7.0 is accepted, 7.5 and "7" are not
+        if isinstance(value, bool) or not isinstance(value, (int, float)) or value != int(value):
+            raise MalformedJudgmentError(f"'{criterion}' is not an integer: {objects[0]!r}")
+        if not 0 <= value <= 10:
+            raise MalformedJudgmentError(f"'{criterion}' is outside 0-10: {objects[0]!r}")
+        parsed[criterion] = int(value)
+    return parsed
+
+
+def judgment_key(judge_model: str, prompt_version: str, query: str, response: str) -> str:
+    payload = json.dumps([judge_model, prompt_version, query, response], ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class JudgmentCache:
+    """Judgments stored in SQLite by `judgment_key`. Safe to share between threads."""
+
+    def __init__(self, path: Path):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self.path = path
+        self._db = sqlite3.connect(str(path), check_same_thread=False)
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS judgments ("
+            "key TEXT PRIMARY KEY, judge_model TEXT NOT NULL, prompt_version TEXT NOT NULL, "
+            "scores TEXT NOT NULL, created REAL NOT NULL)"
+        )
+        self._db.commit()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[Dict[str, int]]:
+        with self._lock:
+            row = self._db.execute("SELECT scores FROM judgments WHERE key = ?", (key,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def put(self, key: str, judge_model: str, prompt_version: str, scores: Dict[str, int]):
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO judgments (key, judge_model, prompt_version, scores, created) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (key, judge_model, prompt_version, json.dumps(scores), time.time())
+            )
+            self._db.commit()
+
+
+class ScoreAggregate:
+    """Running count, mean, standard deviation, min and max per criterion (Welford's algorithm)."""
+
+    def __init__(self):
+        self.count = 0
+        self._mean = dict.fromkeys(CRITERIA, 0.0)
+        self._m2 = dict.fromkeys(CRITERIA, 0.0)
+        self._min = dict.fromkeys(CRITERIA, math.inf)
+        self._max = dict.fromkeys(CRITERIA, -math.inf)
+
+    def add(self, scores: Dict[str, int]):
+        self.count += 1
+        for criterion in CRITERIA:
+            value = scores[criterion]
+            delta = value - self._mean[criterion]
+            self._mean[criterion] += delta / self.count
+            self._m2[criterion] += delta * (value - self._mean[criterion])
+            self._min[criterion] = min(self._min[criterion], value)
+            self._max[criterion] = max(self._max[criterion], value)
+
+    def summary(self) -> Dict[str, Dict[str, float]]:
+        if not self.count:
+            return {}
+        return {
+            criterion: {
+                "mean": round(self._mean[criterion], 3),
+                "std": round(math.sqrt(self._m2[criterion] / self.count), 3),
+                "min": self._min[criterion],
+                "max": self._max[criterion],
+            }
+            for criterion in CRITERIA
+        }
+
+
+class LLMJudge:
+    """
+    Scores (query, response) pairs with a chat model, concurrently and rate limited,
+    reusing cached judgments for pairs that were judged before with the same model and prompt.
+    """
+
+    def __init__(self, llm: Any, judge_model: str, cache: Optional[JudgmentCache] = None, max_workers: int = 4,
+                 requests_per_second: Optional[float] = 2.0, max_retries: int = 5, max_parse_retries: int = 2,
+                 prompt_version: str = PROMPT_VERSION):
+        """
+        Args:
+            llm: Haystack chat generator used as the judge.
+            judge_model: Name of the judge model, part of the cache key.
+            cache: Where judgments are stored. None judges every pair on every run.
+            max_workers: Judge calls in flight at the same time.
+            requests_per_second: Shared rate limit of the judge calls. None disables it.
+            max_retries: Retries of rate-limited or failed calls, with exponential backoff.
+            max_parse_retries: Times the judge is asked again when its reply cannot be parsed.
+            prompt_version: Part of the cache key. Defaults to a hash of `evaluation_prompt`.
+        """
+        self.llm = llm
+        self.judge_model = judge_model
+        self.cache = cache
+        self.max_workers = max_workers
+        self.max_retries = max_retries
+        self.max_parse_retries = max_parse_retries
+        self.prompt_version = prompt_version
+        self._rate_limiter = TokenBucket(requests_per_second) if requests_per_second else None
+
+    @classmethod
+    def from_config(cls, config: Dict[str, Any], api_token: str) -> "LLMJudge":
+        """Builds the judge from the `evaluation` section of config.yaml."""
+        from haystack.components.generators.chat import HuggingFaceAPIChatGenerator
+        from haystack.utils import Secret
+
+        evaluation_config = config.get("evaluation", {})
+        judge_model = evaluation_config.get("judge_model", "meta-llama/Llama-3.1-8B-Instruct")
+        llm = HuggingFaceAPIChatGenerator(
+            api_type="serverless_inference_api",
+            api_params={"model": judge_model},
+            token=Secret.from_token(api_token) if api_token else None,
+            generation_kwargs={"temperature": 0.0, "max_tokens": 128},
+        )
+        return cls(
+            llm,
+            judge_model,
+            cache=JudgmentCache(PROJECT_ROOT / evaluation_config.get("cache_path", "db/judgments.sqlite3")),
+            max_workers=evaluation_config.get("max_workers", 4),
+            requests_per_second=evaluation_config.get("requests_per_second", 2.0),
+            max_retries=evaluation_config.get("max_retries", 5),
+            max_parse_retries=evaluation_config.get("max_parse_retries", 2),
+        )
+
+    def _ask(self, messages: List[Any]) -> str:
+        def call():
+            if self._rate_limiter is not None:
+                self._rate_limiter.acquire()
+            return self.llm.run(messages)["replies"][0].text
+
+        return retry_with_backoff(call, max_retries=self.max_retries)
+
+    def judge(self, query: str, response: str) -> Dict[str, int]:
+        """
+        Scores one pair, asking again up to `max_parse_retries` times if the reply is malformed.
+        A retry continues the conversation with the malformed reply and a correction (CORRECTION).
+        """
+        from haystack.dataclasses import ChatMessage
+
+        messages = [ChatMessage.from_user(evaluation_prompt.format(user_query=query, model_response=response))]
+        for attempt in range(self.max_parse_retries + 1):
+            reply = self._ask(messages)
+            try:
+                return parse_scores(reply)
+            except MalformedJudgmentError as e:
+                if attempt == self.max_parse_retries:
+                    raise
+                logger.warning(f"Malformed judgment ({e}). Asking again ({attempt + 1}/{self.max_parse_retries}).")
+                messages = messages + [ChatMessage.from_assistant(reply or ""),
+                                       ChatMessage.from_user(CORRECTION.format(error=e))]
+
+    def evaluate(self, pairs: List[Dict[str, Any]], group_by: Optional[str] = None,
+                 on_result: Optional[Callable[[Dict[str, Any]], None]] = None) -> Dict[str, Any]:
+        """
+        Scores every pair, judging only those without a cached judgment.
+
+        Args:
+            pairs: Rows with `query` and `response`, plus any other columns (copied to the results).
+            group_by: Optional column, e.g. keyword, to aggregate scores per group as well.
+            on_result: Called with every result as it arrives, cached ones first.
+
+        Returns:
+            A dict with the per-pair `results` (in input order), the `aggregate` over all scored pairs,
+            the aggregate per group and counts of cached, judged and failed pairs.
+        """
+        overall, groups = ScoreAggregate(), defaultdict(ScoreAggregate)
+        results: List[Optional[Dict[str, Any]]] = [None] * len(pairs)
+        counts = {"cached": 0, "judged": 0, "failed": 0}
+
+        def collect(index: int, result: Dict[str, Any]):
+            results[index] = result
+            if result.get("error") is None:
+                overall.add(result)
+                if group_by:
+                    groups[str(result.get(group_by))].add(result)
+            if on_result is not None:
+                on_result(result)
+
+        to_judge = []
+        for index, pair in enumerate(pairs):
+            key = judgment_key(self.judge_model, self.prompt_version, pair["query"], pair["response"])
+            scores = self.cache.get(key) if self.cache else None
+            if scores is None:
+                to_judge.append((index, key, pair))
+                continue
+            counts["cached"] += 1
+            collect(index, {**pair, **scores, "error": None})
+
+        logger.info(f"{counts['cached']} of {len(pairs)} pairs already judged. Judging {len(to_judge)}...")
+
+        def run(key: str, pair: Dict[str, Any]) -> Dict[str, Any]:
+            try:
+                scores = self.judge(pair["query"], pair["response"])
+            except Exception as e:
+                return {**pair, **dict.fromkeys(CRITERIA), "error": f"{type(e).__name__}: {e}"}
+            if self.cache:
+                self.cache.put(key, self.judge_model, self.prompt_version, scores)
+            return {**pair, **scores, "error": None}
+
+        with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="judge") as executor:
+            futures = {executor.submit(run, key, pair): index for index, key, pair in to_judge}
+            for done, future in enumerate(as_completed(futures), 1):
+                result = future.result()
+                counts["failed" if result["error"] else "judged"] += 1
+                collect(futures[future], result)
+                if done % 10 == 0 or done == len(to_judge):
+                    means = ", ".join(f"{c} {s['mean']:.2f}" for c, s in overall.summary().items())
+                    logger.info(f"Judged {done}/{len(to_judge)} ({counts['failed']} failed). Running means: {means}")
+
+        return {
+            "results": results,
+            "aggregate": overall.summary(),
+            "groups": {group: aggregate.summary() for group, aggregate in sorted(groups.items())},
+            **counts,
+        }
+
+
+def _read_pairs(path: Path) -> List[Dict[str, Any]]:
+    """
+    Reads (query, response) rows from the notebook CSV or a batch runner JSONL file.
+    Rows without a response or with a failed generation are left out.
+    """
+    from .batch_runner import read_queries
+
+    pairs = []
+    for row in read_queries(path):
+        response = row.get("response") or ""
+        if not response or response.startswith("ERROR:") or row.get("status", "ok") != "ok":
+            continue
+        query = row.get("query") or row["messages"][-1]["content"]
+        pairs.append({**row, "query": query, "response": response})
+    return pairs
+
+
+def _write_results(results: Iterable[Dict[str, Any]], path: Path):
+    """Writes the results in the column layout of notebooks/results/results_eval.csv."""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, "w", newline="", encoding="utf-8") as file:
+        writer = csv.DictWriter(file, fieldnames=["user_query", "model_response", *CRITERIA, "error"])
+        writer.writeheader()
+        for result in results:
+            writer.writerow({"user_query": result["query"], "model_response": result["response"],
+                             **{c: result[c] for c in CRITERIA}, "error": result["error"]})
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("responses", type=Path, help="CSV or JSONL with 'query' and 'response' columns.")
+    parser.add_argument("--output", type=Path, required=True, help="CSV with the scores per pair.")
+    parser.add_argument("--group-by", default="keyword", help="Column to aggregate by as well (empty to disable).")
+    args = parser.parse_args(argv)
+
+    api_token = os.getenv("API_TOKEN")
+    if not api_token:
+        logger.critical("API_TOKEN not found in environment. Cannot proceed.")
+        raise ValueError("Missing API_TOKEN")
+
+    judge = LLMJudge.from_config(load_config(), api_token)
+    pairs = _read_pairs(args.responses)
+    report = judge.evaluate(pairs, group_by=args.group_by or None)
+    _write_results(report["results"], args.output)
+
+    logger.info(f"{report['cached']} cached, {report['judged']} judged, {report['failed']} failed. "
+                f"Scores written to: {args.output}")
+    logger.info(f"Scores: {json.dumps({'aggregate': report['aggregate'], 'groups': report['groups']}, indent=2)}")
+
+
+if __name__ == "__main__":
+    main()
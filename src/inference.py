@@ -1,20 +1,30 @@
+import asyncio
 import logging
 import os
 import queue
+import re
 import threading
-from typing import List, Generator, Tuple, Any
+import time
+from concurrent.futures import ThreadPoolExecutor, Future, TimeoutError as FutureTimeoutError
+from typing import List, Generator, Tuple, Any, Optional, AsyncGenerator, Dict
 
-from haystack.components.generators.chat import HuggingFaceAPIChatGenerator
 from haystack.dataclasses import ChatMessage, StreamingChunk, Document
-from haystack.utils import Secret
-from haystack_integrations.document_stores.chroma import ChromaDocumentStore
 
-from .ingest import ingest_csv_data
+from .cache import EmbeddingCache, SemanticResponseCache
+from .constraints import parse_constraints, constraint_filters, constraint_labels, Range
+from .context import ContextPacker
+from .keyword_extractor import LexiconKeywordExtractor
+from .memory import ConversationMemory
 from .prompts import intro_prompt, rewrrite_query_prompt, keywords_prompt
-from .retrievers import VectorRetrieverPipeline
-from .utils import PROJECT_ROOT, load_config
+from .recipe_store import RecipeStore
+from .resilience import ResilientCaller, CircuitBreaker, CircuitOpenError, DeadlineExceeded, is_retryable
+from .telemetry import Telemetry, Trace, SIZE_BUCKETS
+from .utils import PROJECT_ROOT, load_config, read_index_version
 from .keywords import KEYWORDS
 
+# Chroma, the HF clients, pandas and the ingestion code are imported where they are first needed,
+# mostly on the startup thread, so importing this module (and rendering the UI) stays fast.
+
 logging.basicConfig(
     format="%(asctime)s - %(levelname)s - %(name)s - %(message)s",
     datefmt="%Y-%m-%d %H:%M:%S",
@@ -22,6 +32,8 @@ logging.basicConfig(
 )
 logger = logging.getLogger("Inference")
 
+UNAVAILABLE_MESSAGE = "Sorry, the recipe assistant is not responding right now. Please try again in a moment."
+
 
 def _load_and_validate_config() -> Tuple[Any, str]:
     """Loads config and ensures API token is present."""
@@ -34,83 +46,379 @@ def _load_and_validate_config() -> Tuple[Any, str]:
     return config, api_token
 
 
+def _resilience_counter(telemetry: Telemetry, backend: str):
+    """Counts the hedges, timeouts, errors and rejections of a ResilientCaller."""
+    return lambda event: telemetry.inc("cookcompass_resilience_events_total", backend=backend, event=event)
+
+
+def _replay(answer: str) -> Generator[str, None, None]:
+    """Streams a cached answer word by word, like a live generation."""
+    yield from re.findall(r"\S+\s*|\s+", answer)
+
+
+def _is_first_turn(message_history: List[dict]) -> bool:
+    """Whether the history is a single user message, after any leading assistant messages (e.g. a UI greeting)."""
+    opening = 0
+    while opening < len(message_history) and message_history[opening]["role"] == "assistant":
+        opening += 1
+    return len(message_history) - opening == 1
+
+
+class EngineBusyError(RuntimeError):
+    """Raised when a request waited longer than the generation queue timeout."""
+
+
+class ServiceUnavailable(RuntimeError):
+    """
+    Raised while streaming when the LLM is unavailable: its circuit is open, it missed a token deadline or its
+    retries are used up. Tokens streamed before are an incomplete answer. The message is UNAVAILABLE_MESSAGE,
+    which callers can show to users.
+    """
+
+    def __init__(self, message: str = UNAVAILABLE_MESSAGE):
+        super().__init__(message)
+
+
 class InferenceEngine:
-    def __init__(self, retriever, llm):
+    def __init__(self, retriever: Optional[Any], llm, retrieval_timeout: float = 15.0, keywords_timeout: float = 5.0,
+                 keyword_extractor: Optional[LexiconKeywordExtractor] = None, keywords_llm_fallback: bool = True,
+                 keywords_min_confidence: float = 0.5, max_concurrent_generations: int = 8,
+                 generation_queue_timeout: Optional[float] = None, context_packer: Optional[ContextPacker] = None,
+                 response_cache: Optional[SemanticResponseCache] = None, telemetry: Optional[Telemetry] = None,
+                 recipe_store: Optional[RecipeStore] = None, memory: Optional[ConversationMemory] = None,
+                 llm_caller: Optional[ResilientCaller] = None, first_token_timeout: Optional[float] = None,
+                 token_timeout: Optional[float] = None, generation_breaker: Optional[CircuitBreaker] = None):
+        """
+        Args:
+            retriever: The retriever pipeline used to find context recipes. None until `set_retriever` is called,
+                e.g. while the document store is opened in the background.
+            llm: The chat generator used for query rewriting, keyword extraction and the answer.
+            retrieval_timeout: Seconds to wait for retrieval before answering without context.
+            keywords_timeout: Seconds to wait for keyword extraction before using unfiltered documents.
+            keyword_extractor: Local keyword extractor. None always asks the LLM.
+            keywords_llm_fallback: Ask the LLM when the local extractor is not confident enough.
+            keywords_min_confidence: Confidence below which the LLM fallback is used.
+            max_concurrent_generations: Answers streamed at the same time. Further requests wait in a queue.
+            generation_queue_timeout: Seconds a request may wait for a free slot. None waits indefinitely.
+            context_packer: Fits the retrieved recipes into the prompt token budget. Defaults to ContextPacker().
+            response_cache: Optional semantic cache replaying answers to near-duplicate first-turn queries.
+            telemetry: Receives per-stage traces and metrics. Defaults to Telemetry() without sinks.
+            recipe_store: Holds the steps and other heavy fields that are not stored with the vectors.
+                They are looked up only for the final context recipes. None uses the retrieved metadata as is.
+            memory: Caps the earlier conversation sent with each request and summarizes older turns.
+                None sends the whole history.
+            llm_caller: Guards the non-streaming LLM calls (rewrite, keywords) with deadlines, hedging and a
+                circuit breaker. While it is open, rewriting and LLM keyword extraction are skipped.
+                None calls the LLM directly.
+            first_token_timeout: Seconds to wait for the first streamed token. None waits indefinitely.
+            token_timeout: Seconds to wait for each further token. None waits indefinitely.
+            generation_breaker: Counts only the outcomes of streamed answers, so quick rewrite and keyword calls
+                that succeed do not hide answers that keep timing out. While it is open, answers fail fast.
+                None never fails fast.
+        """
         self.retriever = retriever
         self.llm = llm
+        self.retrieval_timeout = retrieval_timeout
+        self.keywords_timeout = keywords_timeout
+        self.keyword_extractor = keyword_extractor
+        self.keywords_llm_fallback = keywords_llm_fallback
+        self.keywords_min_confidence = keywords_min_confidence
+        self.generation_queue_timeout = generation_queue_timeout
+        self.context_packer = context_packer or ContextPacker()
+        self.response_cache = response_cache
+        self.telemetry = telemetry or Telemetry()
+        self.recipe_store = recipe_store
+        self.memory = memory
+        self.llm_caller = llm_caller
+        self.first_token_timeout = first_token_timeout
+        self.token_timeout = token_timeout
+        self.generation_breaker = generation_breaker
+
+        self._retriever_available = threading.Event()
+        if retriever is not None:
+            self._retriever_available.set()
+        self._state = "ready" if retriever is not None else "starting"
+        # set once startup has finished, successfully or not
+        self._settled = threading.Event()
+        if retriever is not None:
+            self._settled.set()
+        self._startup_error: Optional[str] = None
+        self._embedder_caller: Optional[ResilientCaller] = None
+        self._ingestion_progress = None
+
+        # engine is shared between sessions: requests never mutate shared state, and pools replace per-request threads
+        self._generation_slots = threading.BoundedSemaphore(max_concurrent_generations)
+        self._generation_executor = ThreadPoolExecutor(max_workers=max_concurrent_generations,
+                                                       thread_name_prefix="generation")
+        self._stage_executor = ThreadPoolExecutor(max_workers=max(8, 3 * max_concurrent_generations),
+                                                  thread_name_prefix="rag-stage")
 
     @classmethod
     def from_config(cls):
+        """
+        Builds the engine from config.yaml.
+        With `ingestion.background` (the default) it returns right away: the document store is opened, synced
+        and indexed on a startup thread, and requests are answered from the partial index meanwhile.
+        See `status()` for readiness and ingestion progress.
+        """
+        from haystack.components.generators.chat import HuggingFaceAPIChatGenerator
+        from haystack.utils import Secret
+
         config, api_token = _load_and_validate_config()
-        chroma_path = PROJECT_ROOT / config["paths"]["chroma"]
+        telemetry = Telemetry.from_config(config)
 
-        vector_store = ChromaDocumentStore(persist_path=str(chroma_path))
+        if config.get("llm_api_url"):
+            llm = HuggingFaceAPIChatGenerator(
+                api_type="text_generation_inference",
+                api_params={"url": config["llm_api_url"]},
+                token=Secret.from_token(api_token) if api_token else None
+            )
+        else:
+            llm = HuggingFaceAPIChatGenerator(
+                api_type="serverless_inference_api",
+                api_params={"model": config['llm']},
+                token=Secret.from_token(api_token) if api_token else None
+            )
+        llm_resilience = config.get("resilience", {}).get("llm", {})
+
+        inference_config = config.get("inference", {})
+        stage_timeouts = inference_config.get("stage_timeouts", {})
+        keywords_config = config.get("keywords", {})
+        use_lexicon = keywords_config.get("extractor", "lexicon") == "lexicon"
+        context_packer = ContextPacker.from_config(config)
+
+        engine = cls(
+            None,
+            llm,
+            retrieval_timeout=stage_timeouts.get("retrieval", 15.0),
+            keywords_timeout=stage_timeouts.get("keywords", 5.0),
+            keyword_extractor=LexiconKeywordExtractor() if use_lexicon else None,
+            keywords_llm_fallback=keywords_config.get("llm_fallback", True),
+            keywords_min_confidence=keywords_config.get("min_confidence", 0.5),
+            max_concurrent_generations=inference_config.get("max_concurrent_generations", 8),
+            generation_queue_timeout=inference_config.get("generation_queue_timeout"),
+            context_packer=context_packer,
+            response_cache=SemanticResponseCache.from_config(config),
+            telemetry=telemetry,
+            recipe_store=RecipeStore.from_config(config),
+            memory=ConversationMemory.from_config(config, context_packer.count_tokens),
+            llm_caller=ResilientCaller.from_config("llm", config, on_event=_resilience_counter(telemetry, "llm")),
+            first_token_timeout=llm_resilience.get("first_token_timeout"),
+            token_timeout=llm_resilience.get("token_timeout"),
+            generation_breaker=CircuitBreaker("llm_generation", llm_resilience.get("failure_threshold", 5),
+                                              llm_resilience.get("reset_timeout", 30.0)),
+        )
 
-        if not vector_store.count_documents():
-            logger.info("Document store is empty. Triggering ingestion...")
-            ingest_csv_data()
+        if config.get("ingestion", {}).get("background", True):
+            threading.Thread(target=engine._start, args=(config, api_token), name="engine-startup",
+                             daemon=True).start()
         else:
-            logger.info("Document store found with %d documents.", vector_store.count_documents())
+            engine._start(config, api_token)
+        return engine
+
+    def _start(self, config: Dict[str, Any], api_token: str):
+        """Opens the document store, ingests if needed and installs the retriever."""
+        from haystack_integrations.document_stores.chroma import ChromaDocumentStore
+
+        from .embedders import create_text_embedder
+        from .ingest import ingest_csv_data, IngestionProgress
+
+        try:
+            vector_store = ChromaDocumentStore(persist_path=str(PROJECT_ROOT / config["paths"]["chroma"]))
+            embedding_cache = EmbeddingCache.from_config(config)
+            text_embedder = create_text_embedder(config, api_token)
+            # the local embedder has no remote backend to hedge or break
+            self._embedder_caller = None
+            if config.get("embeddings_backend", "api") == "api":
+                self._embedder_caller = ResilientCaller.from_config(
+                    "embedder", config, on_event=_resilience_counter(self.telemetry, "embedder")
+                )
+
+            document_count = vector_store.count_documents()
+            sync = not document_count or config.get("ingestion", {}).get("sync_on_start", False)
+
+            if not document_count:
+                logger.info("Document store is empty. Triggering ingestion...")
+            elif sync:
+                logger.info(f"Document store found with {document_count} documents. Syncing with dataset...")
+            else:
+                logger.info(f"Document store found with {document_count} documents.")
+
+            # with an empty store only the dense retriever over Chroma is built: it sees every batch as soon as
+            # ingestion writes it, while the lexical and NumPy indexes only exist once ingestion is done
+            self.set_retriever(self._build_retriever(config, api_token, vector_store, embedding_cache,
+                                                     text_embedder, partial=not document_count,
+                                                     embedder_caller=self._embedder_caller))
+
+            if sync:
+                self._ingestion_progress = IngestionProgress()
+                self._state = "ingesting"
+                version_path = PROJECT_ROOT / config["paths"]["index_version"]
+                version = read_index_version(version_path)
+
+                ingest_csv_data(self.telemetry, self._ingestion_progress)
+
+                if not document_count or read_index_version(version_path) != version:
+                    self.set_retriever(self._build_retriever(config, api_token, vector_store, embedding_cache,
+                                                             text_embedder, embedder_caller=self._embedder_caller))
+
+            self._state = "ready"
+            logger.info("Inference engine ready.")
+        except Exception as e:
+            logger.critical(f"Engine startup failed: {e}")
+            self._startup_error = str(e)
+            self._state = "failed"
+            if not config.get("ingestion", {}).get("background", True):
+                raise
+        finally:
+            self._settled.set()
+
+    @staticmethod
+    def _build_retriever(config: Dict[str, Any], api_token: str, vector_store: Any,
+                         embedding_cache: Optional[EmbeddingCache], text_embedder: Any, partial: bool = False,
+                         embedder_caller: Optional[ResilientCaller] = None):
+        """Builds the configured retriever. `partial` skips the indexes that are derived from a complete store."""
+        from .lexical import BM25Index, build_lexical_index
+        from .rerank import MMRReranker
+        from .retrievers import VectorRetrieverPipeline, HybridRetrieverPipeline
+        from .vector_index import NumpyDocumentStore, build_numpy_index
+
+        retriever_config = config.get("retriever", {})
+        hybrid = retriever_config.get("type", "vector") == "hybrid" and not partial
+        # with MMR, retrieval over-fetches candidates and the reranker keeps a diverse top k
+        reranker = MMRReranker.from_config(config)
+        top_k = reranker.fetch_k if reranker is not None else retriever_config.get("top_k", 20)
+
+        dense_store = vector_store
+        if retriever_config.get("dense_index", "chroma") == "numpy" and not partial:
+            index_path = PROJECT_ROOT / config["paths"]["numpy_index"]
+            if (index_path / "manifest.json").exists():
+                dense_store = NumpyDocumentStore(index_path)
+            else:
+                logger.info("NumPy vector index missing. Exporting it from the document store...")
+                dense_store = build_numpy_index(vector_store, index_path,
+                                                config.get("numpy_index", {}).get("dtype", "float16"))
 
         retriever = VectorRetrieverPipeline(
-            document_store=vector_store,
+            document_store=dense_store,
             embeddings_model=config['embeddings_model'],
             api_token=api_token,
-            top_k=20,
+            top_k=top_k,
+            embedding_cache=embedding_cache,
+            text_embedder=text_embedder,
+            reranker=None if hybrid else reranker,
+            embedder_caller=embedder_caller,
         )
 
-        llm = HuggingFaceAPIChatGenerator(
-            api_type="serverless_inference_api",
-            api_params={"model": config['llm']},
-            token=Secret.from_token(api_token) if api_token else None
-        )
+        if hybrid:
+            index_path = PROJECT_ROOT / config["paths"]["lexical_index"]
+            if index_path.exists():
+                lexical_index = BM25Index.load(index_path)
+            else:
+                logger.info("Lexical index missing. Building it from the document store...")
+                lexical_index = build_lexical_index(vector_store, index_path)
+
+            retriever = HybridRetrieverPipeline(
+                dense_retriever=retriever,
+                lexical_index=lexical_index,
+                top_k=top_k,
+                rrf_k=retriever_config.get("rrf_k", 60),
+                dense_timeout=retriever_config.get("dense_timeout", 5.0),
+                reranker=reranker,
+            )
 
-        return cls(retriever, llm)
+        return retriever
+
+    def set_retriever(self, retriever: Any):
+        """Installs a retriever. Requests already running keep the one they started with."""
+        self.retriever = retriever
+        self._retriever_available.set()
+
+    @property
+    def ready(self) -> bool:
+        return self._state == "ready"
+
+    def wait_until_ready(self, timeout: Optional[float] = None) -> bool:
+        """Blocks until startup has finished. Returns whether the engine is ready (False if it failed or timed out)."""
+        self._settled.wait(timeout)
+        return self.ready
+
+    def status(self) -> Dict[str, Any]:
+        """
+        Readiness for the UI: `state` is starting, ingesting, ready or failed; `serving` tells whether
+        requests already get retrieved context (possibly from a partial index).
+        """
+        status = {
+            "state": self._state,
+            "ready": self.ready,
+            "serving": self._retriever_available.is_set(),
+            "error": self._startup_error,
+        }
+        if self._ingestion_progress is not None:
+            status["ingestion"] = self._ingestion_progress.snapshot()
+        callers = {"llm": self.llm_caller, "embedder": self._embedder_caller}
+        status["circuits"] = {name: caller.breaker.state for name, caller in callers.items()
+                              if caller is not None and caller.breaker is not None}
+        if self.generation_breaker is not None:
+            status["circuits"]["llm_generation"] = self.generation_breaker.state
+        return status
 
     def _generate_search_query(self, message_history: List[dict]) -> str:
         last_user_msg = message_history[-1]['content']
 
-        if len(message_history) < 2:
+        if _is_first_turn(message_history):
             return last_user_msg
 
         history_subset = message_history[-5:]
-        conversation_text = ""
-        for msg in history_subset:
-            role = "User" if msg['role'] == 'user' else "Assistant"
-            conversation_text += f"{role}: {msg['content']}\n"
+        if self.memory is not None:
+            # earlier answers as the recipes they suggested, not as full recipes
+            conversation_text = self.memory.transcript(history_subset)
+        else:
+            conversation_text = "\n".join(
+                f"{'User' if msg['role'] == 'user' else 'Assistant'}: {msg['content']}" for msg in history_subset
+            )
 
         rewrite_prompt = rewrrite_query_prompt.format(
             last_user_msg=last_user_msg,
             conversation_text=conversation_text
         )
 
-        original_callback = self.llm.streaming_callback
-        self.llm.streaming_callback = None
-
         try:
-            response = self.llm.run([ChatMessage.from_user(rewrite_prompt)])
+            with self.telemetry.timed_call("llm_rewrite"):
+                response = self._call_llm(lambda: self.llm.run([ChatMessage.from_user(rewrite_prompt)]))
             rewritten_query = response["replies"][0].text.strip()
-            print(f"REWR: {rewritten_query}")
 
             logger.info(f"Original Query: '{last_user_msg}' -> Rewritten: '{rewritten_query}'")
             return rewritten_query
         except Exception as e:
+            # includes an open circuit and a missed deadline: the raw message is the degraded search query
             logger.error(f"Error when rewriting: {e}")
             return last_user_msg
-        finally:
-            self.llm.streaming_callback = original_callback
     
+    def _call_llm(self, fn):
+        """Runs a non-streaming LLM call through the llm caller, if there is one."""
+        return fn() if self.llm_caller is None else self.llm_caller.call(fn)
+
     def _extract_keywords(self, query: str) -> List[str]:
+        if self.keyword_extractor is None:
+            return self._extract_keywords_llm(query)
+
+        keywords, confidence = self.keyword_extractor.extract(query)
+        # "under 400 calories" hints at a constraint the lexicon cannot see, but the range parser handles it
+        if confidence < self.keywords_min_confidence and self.keywords_llm_fallback and not parse_constraints(query):
+            logger.info(f"Low keyword confidence ({confidence:.2f}). Falling back to the LLM.")
+            return self._extract_keywords_llm(query)
+        return keywords
+
+    def _extract_keywords_llm(self, query: str) -> List[str]:
         prompt = keywords_prompt.format(
             query=query,
             available_keywords=', '.join(KEYWORDS)
         )
 
-        original_callback = self.llm.streaming_callback
-        self.llm.streaming_callback = None
-
         try:
-            response = self.llm.run([ChatMessage.from_user(prompt)])
+            with self.telemetry.timed_call("llm_keywords"):
+                response = self._call_llm(lambda: self.llm.run([ChatMessage.from_user(prompt)]))
             content = response["replies"][0].text.strip()
             
             if not content:
@@ -123,61 +431,243 @@ class InferenceEngine:
         except Exception as e:
             logger.error(f"Error extracting keywords: {e}")
             return []
-        finally:
-            self.llm.streaming_callback = original_callback
-
-
-    def _build_messages(self, query: str, context_docs: List[Document], message_history: List[dict]) -> List[
-        ChatMessage]:
-        context_parts = []
-        for doc in context_docs:
-            part = (
-                f"--- Recipe Option ---\n"
-                f"Name: {doc.meta.get('name')}\n"
-                f"{doc.content}\n"
-                f"Instructions: {doc.meta.get('steps')}\n"
-            )
-            context_parts.append(part)
 
-        full_context_string = "\n".join(context_parts)
+
+    def _build_messages(self, query: str, context_docs: List[Document], message_history: List[dict],
+                        trace: Optional[Trace] = None) -> List[ChatMessage]:
+        full_context_string, context_stats = self.context_packer.pack(context_docs)
 
         formatted_system_prompt = intro_prompt.format(context_content=full_context_string, user_message=query)
 
         messages = [ChatMessage.from_system(formatted_system_prompt)]
 
+        roles = {"user": ChatMessage.from_user, "system": ChatMessage.from_system}
         messages += [
-            ChatMessage.from_user(message['content']) if message['role'] == 'user' else
-            ChatMessage.from_assistant(message['content'])
+            roles.get(message['role'], ChatMessage.from_assistant)(message['content'])
             for message in message_history
         ]
+
+        if trace is not None:
+            prompt_tokens = sum(self.context_packer.count_tokens(message.text or "") for message in messages)
+            trace.set(prompt_tokens=prompt_tokens, **context_stats)
+            self.telemetry.observe("cookcompass_prompt_tokens", prompt_tokens, buckets=SIZE_BUCKETS)
         return messages
 
-    def stream_response(self, message_history: List[dict]) -> Generator[str, None, None]:
+    def _await_stage(self, future: Future, stage: str, deadline: float, default: Any) -> Any:
+        """Waits for a concurrent stage until its deadline and falls back to `default` if it is too slow or fails."""
+        try:
+            return future.result(timeout=max(0.0, deadline - time.monotonic()))
+        except FutureTimeoutError:
+            logger.warning(f"Stage '{stage}' timed out. Continuing without its result.")
+            self.telemetry.inc("cookcompass_stage_timeouts_total", stage=stage)
+            return default
+        except (CircuitOpenError, DeadlineExceeded) as e:
+            logger.warning(f"Stage '{stage}' skipped ({e}). Continuing without its result.")
+            self.telemetry.inc("cookcompass_stage_timeouts_total", stage=stage)
+            return default
+        except Exception as e:
+            logger.error(f"Stage '{stage}' failed: {e}. Continuing without its result.")
+            self.telemetry.inc("cookcompass_stage_errors_total", stage=stage)
+            return default
+
+    def _submit_stage(self, trace: Trace, stage: str, fn, *args) -> Future:
+        """Runs `fn` on the stage pool inside a span named after the stage."""
+        def run():
+            with trace.span(stage) as span:
+                result = fn(*args)
+                if isinstance(result, list):
+                    span["results"] = len(result)
+                return result
+
+        return self._stage_executor.submit(run)
+
+    def stream_response(self, message_history: List[dict], trace: Optional[Trace] = None,
+                        session_id: Optional[str] = None) -> Generator[str, None, None]:
+        """
+        Streams the answer to the last user message.
+
+        Args:
+            message_history: The conversation so far, ending with the user message to answer.
+            trace: Receives the timings of every stage. A new trace is created if not given.
+            session_id: Identifies the conversation, so its summary is continued instead of rebuilt.
+
+        Raises:
+            ServiceUnavailable: The LLM is down or too slow. Whatever was streamed before is not an answer.
+            EngineBusyError: No generation slot became free within the generation queue timeout.
+        """
         if not message_history:
             return
 
+        trace = trace or self.telemetry.trace("request")
+        outcome = "error"
+        try:
+            outcome = yield from self._stream_traced(message_history, trace, session_id)
+        except ServiceUnavailable:
+            outcome = "unavailable"
+            raise
+        finally:
+            trace.set(outcome=outcome)
+            self.telemetry.inc("cookcompass_requests_total", outcome=outcome)
+            trace.finish()
+
+    def _stream_traced(self, message_history: List[dict], trace: Trace,
+                       session_id: Optional[str]) -> Generator[str, None, str]:
         last_user_message = message_history[-1]['content']
+        earlier_messages = message_history[:-1]
 
-        search_query = self._generate_search_query(message_history)
+        with trace.span("rewrite", skipped=_is_first_turn(message_history)):
+            search_query = self._generate_search_query(message_history)
         
         logger.info(f"Search Query: {search_query}")
-        context_docs = self.retriever.retrieve_documents(search_query)
 
-        extracted_keywords = self._extract_keywords(search_query)
+        # numeric constraints ("under 30 minutes") are parsed locally and are hard filters
+        constraints = parse_constraints(search_query)
+        if constraints:
+            logger.info(f"Numeric constraints: {constraint_labels(constraints)}")
+
+        # keyword extraction runs concurrently with an unfiltered retrieval, which warms the query
+        # embedding and is the fallback when no recipe satisfies every extracted keyword
+        started = time.monotonic()
+        keywords = self._submit_stage(trace, "keywords", self._extract_keywords, search_query)
+
+        # a request keeps the retriever it started with, even if startup swaps in a more complete one
+        with trace.span("wait_for_index"):
+            retriever = self._await_retriever(started + self.retrieval_timeout)
+
+        cache_key = None
+        if retriever is not None and self.response_cache is not None and _is_first_turn(message_history):
+            with trace.span("cache_lookup") as span:
+                cache_key = self._response_cache_key(retriever, search_query, keywords, constraints, started)
+                cached_answer = self.response_cache.get(*cache_key) if cache_key else None
+                span["hit"] = cached_answer is not None
+            if cached_answer is not None:
+                yield from _replay(cached_answer)
+                return "cached"
+
+        if retriever is None:
+            logger.warning("Document store is not open yet. Answering without context.")
+            context_docs = []
+        else:
+            retrieval = self._submit_stage(trace, "retrieval", retriever.retrieve_documents, search_query)
+            context_docs = self._await_stage(retrieval, "retrieval", started + self.retrieval_timeout, [])
+        extracted_keywords = self._await_stage(keywords, "keyword extraction", started + self.keywords_timeout, [])
         logger.info(f"Extracted keywords: {extracted_keywords}")
+        self.telemetry.observe("cookcompass_documents_retrieved", len(context_docs), buckets=SIZE_BUCKETS,
+                               stage="retrieval")
 
-        if extracted_keywords:
-            filter_docs = [
-                doc for doc in context_docs 
-                if all(k in doc.meta.get('tags', []) for k in extracted_keywords)
-            ]
-            
+        if (extracted_keywords or constraints) and retriever is not None:
+            filter_docs = self._filtered_retrieval(trace, "filtered_retrieval", retriever, search_query,
+                                                   extracted_keywords, constraints, started)
             if filter_docs:
-                logger.info(f"Filtered down to {len(filter_docs)} documents based on keywords.")
+                logger.info(f"Retrieved {len(filter_docs)} documents matching all keywords and constraints.")
+                context_docs = filter_docs
+            elif not constraints:
+                logger.info("No documents match all keywords. Falling back to unfiltered results.")
+            else:
+                # keywords are inferred and may be relaxed, numeric constraints were asked for explicitly
+                if extracted_keywords:
+                    filter_docs = self._filtered_retrieval(trace, "range_retrieval", retriever, search_query,
+                                                           [], constraints, started)
+                if filter_docs:
+                    logger.info(f"No documents match all keywords. Using {len(filter_docs)} documents matching "
+                                f"the numeric constraints.")
+                else:
+                    logger.info("No documents satisfy the numeric constraints.")
                 context_docs = filter_docs
 
+        if self.memory is not None and earlier_messages:
+            with trace.span("memory_recall") as span:
+                context_docs = self._recall(last_user_message, earlier_messages, session_id, context_docs)
+                span["documents"] = len(context_docs)
+
+        trace.set(keywords=extracted_keywords, constraints=constraint_labels(constraints),
+                  documents_kept=len(context_docs))
+        self.telemetry.observe("cookcompass_documents_kept", len(context_docs), buckets=SIZE_BUCKETS)
+
+        if self.recipe_store is not None and context_docs:
+            with trace.span("payload_lookup", documents=len(context_docs)):
+                context_docs = self.recipe_store.attach(context_docs)
+
         logger.info(f'Context: {[doc.meta.get('name', 'unknown') for doc in context_docs]}')
-        prompt = self._build_messages(last_user_message, context_docs, message_history[:-1])
+        with trace.span("build_prompt"):
+            if self.memory is not None:
+                earlier_messages = self.memory.messages(earlier_messages, session_id)
+            prompt = self._build_messages(last_user_message, context_docs, earlier_messages, trace)
+
+        answer_parts = []
+        try:
+            for token in self._stream_generation(prompt, trace):
+                answer_parts.append(token)
+                yield token
+        except Exception as e:
+            # a request the LLM rejected is a bug and raised as is; an unavailable LLM is a typed, expected failure
+            if not isinstance(e, (CircuitOpenError, DeadlineExceeded)) and not is_retryable(e):
+                raise
+            logger.error(f"Generation failed: {e}")
+            raise ServiceUnavailable() from e
+
+        answer = "".join(answer_parts)
+        if self.memory is not None:
+            self.memory.remember_answer(answer, context_docs)
+        if cache_key:
+            self.response_cache.put(*cache_key, answer, time.monotonic() - started)
+        return "answered"
+
+    def _recall(self, query: str, earlier_messages: List[dict], session_id: Optional[str],
+                context_docs: List[Document]) -> List[Document]:
+        """Puts summarized recipes the user refers to back in front of the retrieved ones."""
+        retrieved_ids = {str(doc.meta.get("original_id")) for doc in context_docs}
+        recalled = [doc for doc in self.memory.recall(query, earlier_messages, session_id)
+                    if str(doc.meta.get("original_id")) not in retrieved_ids]
+        if recalled:
+            logger.info(f"Recalled {len(recalled)} recipes from earlier in the conversation.")
+        return recalled + context_docs
+
+    def _await_retriever(self, deadline: float) -> Optional[Any]:
+        """The current retriever, waiting until `deadline` while the document store is still being opened."""
+        if not self._retriever_available.wait(timeout=max(0.0, deadline - time.monotonic())):
+            self.telemetry.inc("cookcompass_stage_timeouts_total", stage="wait_for_index")
+            return None
+        return self.retriever
+
+    def _filtered_retrieval(self, trace: Trace, stage: str, retriever: Any, search_query: str, keywords: List[str],
+                            constraints: Dict[str, Range], started: float) -> List[Document]:
+        """Retrieves the documents matching every keyword and numeric constraint."""
+        retrieval = self._submit_stage(trace, stage, retriever.retrieve_documents, search_query,
+                                       constraint_filters(keywords, constraints))
+        documents = self._await_stage(retrieval, stage.replace("_", " "), started + self.retrieval_timeout, [])
+        self.telemetry.observe("cookcompass_documents_retrieved", len(documents), buckets=SIZE_BUCKETS, stage=stage)
+        return documents
+
+    def _response_cache_key(self, retriever: Any, search_query: str, keywords: Future,
+                            constraints: Dict[str, Range],
+                            started: float) -> Optional[Tuple[List[float], List[str]]]:
+        """Cache key of a first-turn query: its embedding, the extracted keyword set and the numeric constraints."""
+        try:
+            query_embedding = retriever.embed_query(search_query)
+        except Exception as e:
+            logger.error(f"Could not embed query for the response cache: {e}")
+            return None
+
+        if query_embedding is None:
+            return None
+        extracted_keywords = self._await_stage(keywords, "keyword extraction", started + self.keywords_timeout, [])
+        return query_embedding, extracted_keywords + constraint_labels(constraints)
+
+    def _stream_generation(self, prompt: List[ChatMessage], trace: Trace) -> Generator[str, None, None]:
+        """
+        Streams the answer through a per-request callback once a generation slot is free.
+        Raises CircuitOpenError while the LLM is considered down and DeadlineExceeded if the first token
+        or any later one takes too long.
+        """
+        if self.generation_breaker is not None and not self.generation_breaker.allow():
+            self.telemetry.inc("cookcompass_resilience_events_total", backend="llm_generation", event="rejected")
+            raise CircuitOpenError(f"Circuit '{self.generation_breaker.name}' is open.")
+
+        with trace.span("queue_wait"):
+            acquired = self._generation_slots.acquire(timeout=self.generation_queue_timeout)
+        if not acquired:
+            raise EngineBusyError("All generation slots are busy. Try again later.")
 
         # output streaming (should be doable only with a callback but I couldn't find anything in the docs)
         q = queue.Queue()
@@ -185,21 +675,105 @@ class InferenceEngine:
         def callback(chunk: StreamingChunk):
             q.put(chunk.content)
 
-        self.llm.streaming_callback = callback
-
         def run_llm():
             try:
-                self.llm.run(prompt)
+                with self.telemetry.timed_call("llm_generation"):
+                    self.llm.run(prompt, streaming_callback=callback)
             finally:
+                # released when the LLM call ends, even if the consumer stopped reading early
+                self._generation_slots.release()
                 q.put(None)
 
-        thread = threading.Thread(target=run_llm)
-        thread.start()
+        start = time.perf_counter()
+        try:
+            generation = self._generation_executor.submit(run_llm)
+        except Exception:
+            self._generation_slots.release()
+            raise
 
-        while True:
-            token = q.get()
-            if token is None:
-                break
-            yield token
+        tokens = 0
+        try:
+            while True:
+                try:
+                    token = q.get(timeout=self.first_token_timeout if tokens == 0 else self.token_timeout)
+                except queue.Empty:
+                    # the call keeps its slot until it returns, the request stops waiting for it
+                    self._record_generation(False)
+                    raise DeadlineExceeded(f"No token from the LLM for "
+                                           f"{self.first_token_timeout if tokens == 0 else self.token_timeout}s.")
+                if token is None:
+                    break
+                if tokens == 0:
+                    trace.record("ttft", time.perf_counter() - start)
+                tokens += 1
+                yield token
 
-        thread.join()
+            try:
+                generation.result()
+            except Exception as e:
+                self._record_generation(not is_retryable(e))
+                raise
+            self._record_generation(True)
+        finally:
+            trace.record("generation", time.perf_counter() - start, tokens=tokens)
+            trace.set(tokens_streamed=tokens)
+            self.telemetry.inc("cookcompass_streamed_tokens_total", tokens)
+
+    def _record_generation(self, success: bool):
+        if self.generation_breaker is None:
+            return
+        if success:
+            self.generation_breaker.record_success()
+        else:
+            self.generation_breaker.record_failure()
+
+    async def astream_response(self, message_history: List[dict], session_id: Optional[str] = None,
+                               max_buffered_tokens: int = 32) -> AsyncGenerator[str, None]:
+        """
+        Async variant of `stream_response` for event-loop based servers.
+        The blocking pipeline runs on a worker thread and tokens are handed over to the loop,
+        so many sessions can stream concurrently without blocking each other.
+
+        Args:
+            max_buffered_tokens: Tokens handed over but not yet read. Once as many are waiting, the worker
+                thread waits for the reader, so a slow client does not pile up tokens in the loop.
+        """
+        loop = asyncio.get_running_loop()
+        tokens: asyncio.Queue = asyncio.Queue(maxsize=max_buffered_tokens)
+        cancelled = threading.Event()
+        done = object()
+
+        def put(item: Any) -> bool:
+            """Waits until the queue has room for the item. False if the reader stopped meanwhile."""
+            future = asyncio.run_coroutine_threadsafe(tokens.put(item), loop)
+            while not cancelled.is_set():
+                try:
+                    future.result(timeout=0.1)
+                    return True
+                except FutureTimeoutError:
+                    # the queue is full: check again whether the reader is still there
+                    pass
+            future.cancel()
+            return False
+
+        def produce():
+            stream = self.stream_response(message_history, session_id=session_id)
+            try:
+                for token in stream:
+                    if not put(token):
+                        break
+            except Exception as e:
+                put(e)
+            finally:
+                stream.close()
+                put(done)
+
+        producer = loop.run_in_executor(None, produce)
+        try:
+            while (item := await tokens.get()) is not done:
+                if isinstance(item, Exception):
+                    raise item
+                yield item
+        finally:
+            cancelled.set()
+            await asyncio.shield(producer)
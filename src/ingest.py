@@ -1,17 +1,31 @@
 import ast
+import hashlib
+import json
 import logging
 import os
+import threading
+import math
+import time
+from collections import deque, defaultdict
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
-from typing import List, Any, Tuple
+from typing import List, Any, Tuple, Dict, Iterator, Iterable, Optional, Set
 
 import pandas as pd
-from haystack import Pipeline, Document
-from haystack.components.embedders import HuggingFaceAPIDocumentEmbedder
+from haystack import Document
 from haystack.components.writers import DocumentWriter
-from haystack.utils import Secret
+from haystack.document_stores.types import DuplicatePolicy
 from haystack_integrations.document_stores.chroma import ChromaDocumentStore
 
-from .utils import PROJECT_ROOT, load_config
+from .constraints import parse_nutrition
+from .dedup import NearDuplicateIndex, recipe_features
+from .embedders import ConcurrentBatchEmbedder, create_document_embedder
+from .keywords import keyword_flags
+from .lexical import build_lexical_index
+from .recipe_store import RecipeStore, split_payloads
+from .vector_index import build_numpy_index
+from .telemetry import Telemetry, Trace
+from .utils import PROJECT_ROOT, load_config, bump_index_version
 
 logging.basicConfig(
     format="%(asctime)s - %(levelname)s - %(name)s - %(message)s",
@@ -20,14 +34,8 @@ logging.basicConfig(
 )
 logger = logging.getLogger("Ingestion")
 
-
-def _get_embedder(model_name: str, api_token: str) -> HuggingFaceAPIDocumentEmbedder:
-    """Initializes the Hugging Face Embedder component."""
-    return HuggingFaceAPIDocumentEmbedder(
-        api_type="serverless_inference_api",
-        api_params={"model": model_name},
-        token=Secret.from_token(api_token)
-    )
+# "['a', 'b']" with no quotes or backslashes inside the items, which ast.literal_eval would have to unescape
+SIMPLE_LIST_PATTERN = r"\[(?:'[^'\\]*'(?:, '[^'\\]*')*)?\]"
 
 
 def _clean_list_string(text: Any) -> str:
@@ -40,6 +48,17 @@ def _clean_list_string(text: Any) -> str:
     except Exception:
         return str(text)
 
+
+def _content_hash(content: str, original_id: Any) -> str:
+    """
+    Stable hash of the embedded text of a recipe, used as its document id to detect rows that need embedding.
+    The recipe id is part of it, so two recipes with the same name and ingredients stay separate documents.
+    Metadata is not: changed metadata is updated in place (see `_sync_metadata`) instead of re-embedded.
+    """
+    payload = json.dumps({"content": content, "original_id": original_id}, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
 def _load_and_validate_config() -> Tuple[Any, str]:
     """Loads config and ensures API token is present."""
     api_token = os.getenv("API_TOKEN")
@@ -62,8 +81,8 @@ def _initialize_store(chroma_path: Path) -> ChromaDocumentStore:
         raise e
 
 
-def _load_recipe_data(data_dir: Path, filename: str) -> pd.DataFrame:
-    """Loads the CSV file specified in the config."""
+def _iter_recipe_chunks(data_dir: Path, filename: str, chunk_size: int) -> Iterator[pd.DataFrame]:
+    """Streams the CSV file specified in the config in chunks of `chunk_size` rows."""
     file_path = data_dir / filename
 
     if not file_path.exists():
@@ -71,100 +90,447 @@ def _load_recipe_data(data_dir: Path, filename: str) -> pd.DataFrame:
         raise FileNotFoundError(f"File {filename} missing in {data_dir}")
 
     try:
-        df = pd.read_csv(file_path)
-        logger.info(f"Successfully loaded '{filename}' with {len(df)} rows.")
-        return df
+        logger.info(f"Streaming '{filename}' in chunks of {chunk_size} rows.")
+        yield from pd.read_csv(file_path, chunksize=chunk_size)
     except Exception as e:
         logger.critical(f"Error reading CSV: {e}")
         raise e
 
 
-def _transform_data_to_documents(df: pd.DataFrame) -> List[Document]:
+def _clean_list_column(df: pd.DataFrame, column: str) -> pd.Series:
     """
-    Converts DataFrame rows into Haystack Documents.
-    Ingredients -> Content, Steps -> Metadata.
+    `_clean_list_string` for a whole column. Lists of plain single-quoted strings (nearly every row of the
+    Food.com data) are unwrapped with vectorized string operations; only the other rows are parsed one by one.
     """
-    documents = []
-    total_rows = len(df)
-    log_interval = max(1, total_rows // 5)
+    if column not in df.columns:
+        return pd.Series("", index=df.index)
+    values = df[column]
+    simple = values.astype(str).str.fullmatch(SIMPLE_LIST_PATTERN) & values.map(type).eq(str)
+    cleaned = values[simple].str[2:-2].str.replace("', '", ", ", regex=False)
+    rest = values[~simple].map(_clean_list_string)
+    return pd.concat([cleaned, rest]).reindex(values.index)
 
-    logger.info("Starting data transformation...")
 
-    for index, row in df.iterrows():
-        try:
-            clean_ingredients = _clean_list_string(row.get('ingredients', row.get('tags', '')))
-            clean_steps = _clean_list_string(row.get('steps', ''))
-            clean_tags = _clean_list_string(row.get('tags', ''))
+def _text_column(df: pd.DataFrame, column: str) -> List[str]:
+    if column not in df.columns:
+        return [""] * len(df)
+    return df[column].fillna("").astype(str).tolist()
+
 
+def _transform_chunk_to_documents(df: pd.DataFrame) -> List[Document]:
+    """
+    Converts a chunk of DataFrame rows into Haystack Documents.
+    Ingredients -> Content, name, minutes, typed nutrition fields and filter flags -> Metadata.
+    Steps, description, tags and nutrition are added to the metadata as well: `split_payloads` moves them to
+    the RecipeStore before the documents are written. Only the content is hashed into the document id.
+    List columns are parsed column-wise instead of row by row.
+    Every entry in KEYWORDS also gets a boolean `tag_*` field, and the nutrition column is parsed into numeric
+    fields (calories, protein_g, ...), so both can be filtered inside the vector search.
+    """
+    clean_ingredients = _clean_list_column(df, 'ingredients' if 'ingredients' in df.columns else 'tags')
+    clean_steps = _clean_list_column(df, 'steps')
+    clean_tags = _clean_list_column(df, 'tags')
+    descriptions = _text_column(df, 'description')
+    nutrition = _text_column(df, 'nutrition')
+
+    names = df['name'].tolist()
+    minutes = df['minutes'].tolist() if 'minutes' in df.columns else [0] * len(df)
+    original_ids = df['id'].tolist() if 'id' in df.columns else df.index.tolist()
+
+    documents = []
+    rows = zip(df.index, names, clean_ingredients, clean_steps, clean_tags, descriptions, nutrition, minutes,
+               original_ids)
+    for index, name, ingredients, steps, tags, description, recipe_nutrition, recipe_minutes, original_id in rows:
+        try:
             content_for_embedding = (
-                f"Recipe: {row['name']}\n"
-                f"Ingredients: {clean_ingredients}\n"
+                f"Recipe: {name}\n"
+                f"Ingredients: {ingredients}\n"
             )
 
             meta_data = {
-                "name": row['name'],
-                "steps": clean_steps,
-                "minutes": row.get('minutes', 0),
-                "original_id": row.get('id', index),
-                "tags": clean_tags
+                "name": name,
+                "minutes": recipe_minutes,
+                "original_id": original_id,
+                **parse_nutrition(recipe_nutrition),
+                **keyword_flags(set(tags.split(", ")))
             }
 
-            doc = Document(content=content_for_embedding, meta=meta_data)
-            documents.append(doc)
+            # metadata and payload can change without re-embedding: only the embedded text is hashed
+            content_hash = _content_hash(content_for_embedding, original_id)
+            meta_data["content_hash"] = content_hash
+            meta_data.update(steps=steps, description=description, tags=tags, nutrition=recipe_nutrition)
 
-            if (index + 1) % log_interval == 0:
-                logger.info(f"Processed {index + 1}/{total_rows} recipes.")
+            documents.append(Document(id=content_hash, content=content_for_embedding, meta=meta_data))
 
         except Exception as e:
             logger.warning(f"Skipping row {index} due to error: {e}")
             continue
 
+    return documents
+
+
+def _transform_data_to_documents(df: pd.DataFrame) -> List[Document]:
+    """Converts a whole DataFrame into Haystack Documents."""
+    documents = _transform_chunk_to_documents(df)
     logger.info(f"Transformation complete. {len(documents)} documents created.")
     return documents
 
 
-def _run_indexing_pipeline(documents: List[Document], store: ChromaDocumentStore, model_name: str, api_token: str):
-    """Creates and runs the Haystack pipeline to embed and write documents."""
+def _iter_documents(chunks: Iterator[pd.DataFrame], workers: int = 1) -> Iterator[Document]:
+    """
+    Lazily transforms CSV chunks into Documents.
+    With more than one worker, chunks are parsed in a process pool while at most `2 * workers`
+    chunks are in flight, so memory stays bounded regardless of the file size.
+    """
+    processed = 0
+
+    if workers <= 1:
+        for chunk in chunks:
+            documents = _transform_chunk_to_documents(chunk)
+            processed += len(chunk)
+            logger.info(f"Processed {processed} recipes.")
+            yield from documents
+        return
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        pending = deque()
+        for chunk in chunks:
+            pending.append((len(chunk), pool.submit(_transform_chunk_to_documents, chunk)))
+            if len(pending) < 2 * workers:
+                continue
+            rows, future = pending.popleft()
+            processed += rows
+            logger.info(f"Processed {processed} recipes.")
+            yield from future.result()
+
+        while pending:
+            rows, future = pending.popleft()
+            processed += rows
+            logger.info(f"Processed {processed} recipes.")
+            yield from future.result()
+
+
+class IngestionProgress:
+    """Thread-safe progress of a running ingestion, for status displays."""
+
+    def __init__(self):
+        self.state = "pending"
+        self.rows_total = 0
+        self.rows_seen = 0
+        self.documents_embedded = 0
+        self.error: Optional[str] = None
+        self.started: Optional[float] = None
+        self.finished: Optional[float] = None
+        self._lock = threading.Lock()
+
+    def update(self, **fields):
+        with self._lock:
+            for name, value in fields.items():
+                setattr(self, name, value)
+
+    def add(self, rows_seen: int = 0, documents_embedded: int = 0):
+        with self._lock:
+            self.rows_seen += rows_seen
+            self.documents_embedded += documents_embedded
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            elapsed = ((self.finished or time.time()) - self.started) if self.started else 0.0
+            return {
+                "state": self.state,
+                "rows_total": self.rows_total,
+                "rows_seen": self.rows_seen,
+                "documents_embedded": self.documents_embedded,
+                "fraction": min(1.0, self.rows_seen / self.rows_total) if self.rows_total else 0.0,
+                "elapsed_seconds": round(elapsed, 1),
+                "error": self.error,
+            }
+
+
+def _count_rows(file_path: Path) -> int:
+    """Approximate number of recipes (lines minus header), cheap enough to run before streaming."""
     try:
-        logger.info("Building Indexing Pipeline...")
-        pipe = Pipeline()
+        with open(file_path, "rb") as file:
+            return max(0, sum(block.count(b"\n") for block in iter(lambda: file.read(1 << 20), b"")) - 1)
+    except OSError:
+        return 0
 
-        embedder = _get_embedder(model_name, api_token)
-        writer = DocumentWriter(store)
 
-        pipe.add_component("embedder", embedder)
-        pipe.add_component("writer", writer)
-        pipe.connect("embedder", "writer")
+def _recipe_features(doc: Document) -> Set[str]:
+    """Dedup features of a recipe: its name and the ingredients line of the embedded content."""
+    ingredients = doc.content.split("Ingredients:", 1)[1] if "Ingredients:" in doc.content else ""
+    return recipe_features(str(doc.meta.get("name", "")), ingredients.split(","))
 
-        logger.info(f"Running Pipeline with model: {model_name}...")
-        pipe.run({"embedder": {"documents": documents}})
+
+def _collapse_duplicates(documents: Iterable[Document], index: NearDuplicateIndex,
+                         variants: Dict[str, List[Tuple[str, str, str]]], names: Dict[str, str],
+                         progress: Optional[IngestionProgress] = None) -> Iterator[Document]:
+    """
+    Yields only the canonical (first seen) recipe of every near-duplicate cluster.
+    Collapsed recipes are collected in `variants` as (original_id, document id, name) under their
+    canonical's original_id, and `names` maps canonical original_ids to recipe names for the report.
+    """
+    for doc in documents:
+        original_id = str(doc.meta.get("original_id"))
+        canonical = index.add(original_id, _recipe_features(doc))
+        if canonical is None:
+            names[original_id] = str(doc.meta.get("name", ""))
+            yield doc
+            continue
+
+        variants[canonical].append((original_id, doc.id, str(doc.meta.get("name", ""))))
+        if progress is not None:
+            progress.add(rows_seen=1)
+
+
+def _write_dedup_report(path: Path, index: NearDuplicateIndex, canonical_documents: int,
+                        variants: Dict[str, List[Tuple[str, str, str]]], names: Dict[str, str],
+                        embeddings_saved: int, batch_size: int) -> Dict[str, Any]:
+    """Writes what deduplication collapsed and saved as JSON and returns the summary."""
+    duplicates = sum(len(cluster) for cluster in variants.values())
+    largest = sorted(variants.items(), key=lambda item: len(item[1]), reverse=True)[:20]
+    report = {
+        "threshold": index.threshold,
+        "num_perm": index.hasher.num_perm,
+        "lsh_bands": index.bands,
+        "lsh_rows": index.rows,
+        "documents_seen": canonical_documents + duplicates,
+        "canonical_documents": canonical_documents,
+        "duplicates_collapsed": duplicates,
+        "clusters": len(variants),
+        # variants already embedded by an earlier run cost nothing now; they are deleted as stale instead
+        "embedded_documents_saved": embeddings_saved,
+        "embedding_requests_saved": math.ceil(embeddings_saved / batch_size) if batch_size else 0,
+        "largest_clusters": [
+            {"canonical_id": canonical, "name": names.get(canonical),
+             "variants": [{"original_id": original_id, "name": name} for original_id, _, name in cluster]}
+            for canonical, cluster in largest
+        ],
+    }
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(json.dumps(report, indent=2))
+    return report
+
+
+def _collection(store: ChromaDocumentStore) -> Any:
+    """The Chroma collection behind the store, for queries the Haystack store does not offer."""
+    store._ensure_initialized()
+    return store._collection
+
+
+def _existing_document_ids(store: ChromaDocumentStore, page_size: int = 10000) -> set:
+    """Returns the ids (content hashes) of all documents already in the store, read page by page without content."""
+    collection = _collection(store)
+    ids, offset = set(), 0
+    while True:
+        page = collection.get(include=[], limit=page_size, offset=offset)["ids"]
+        ids.update(page)
+        if len(page) < page_size:
+            return ids
+        offset += page_size
+
+
+def _sync_metadata(documents: Iterable[Document], store: ChromaDocumentStore, existing_ids: set,
+                   updated_ids: set, batch_size: int = 1000) -> Iterator[Document]:
+    """
+    Passes every document through. For documents that are already embedded, the stored metadata is compared
+    in batches with the new one and updated in place where it changed (e.g. new tag flags or nutrition fields),
+    so a metadata or schema change does not re-embed the dataset. Updated ids are added to `updated_ids`.
+    """
+    pending: List[Document] = []
+
+    def flush():
+        collection = _collection(store)
+        stored = collection.get(ids=[doc.id for doc in pending], include=["metadatas"])
+        stored_meta = dict(zip(stored["ids"], stored["metadatas"]))
+        changed = []
+        for doc in pending:
+            old = stored_meta.get(doc.id) or {}
+            # compared as JSON, so a NaN (e.g. missing minutes) equals itself
+            if json.dumps(old, sort_keys=True, default=str) != json.dumps(doc.meta, sort_keys=True, default=str):
+                # Chroma merges metadata on update; None removes fields that are no longer written
+                changed.append((doc.id, {**{key: None for key in old if key not in doc.meta}, **doc.meta}))
+        if changed:
+            collection.update(ids=[doc_id for doc_id, _ in changed], metadatas=[meta for _, meta in changed])
+            updated_ids.update(doc_id for doc_id, _ in changed)
+        pending.clear()
+
+    for doc in documents:
+        yield doc
+        if doc.id in existing_ids:
+            pending.append(doc)
+            if len(pending) >= batch_size:
+                flush()
+    if pending:
+        flush()
+
+
+def _skip_existing(documents: Iterable[Document], existing_ids: set, seen_ids: set,
+                   progress: Optional[IngestionProgress] = None) -> Iterator[Document]:
+    """Yields only documents not yet in the store and records every id seen in the dataset."""
+    for doc in documents:
+        seen_ids.add(doc.id)
+        if progress is not None:
+            progress.add(rows_seen=1)
+        if doc.id not in existing_ids:
+            yield doc
+
+
+def _run_indexing_pipeline(documents: Iterable[Document], store: ChromaDocumentStore,
+                           embedder: ConcurrentBatchEmbedder, progress: Optional[IngestionProgress] = None) -> int:
+    """
+    Embeds documents concurrently and writes every batch as soon as it is embedded.
+    Each written batch is a checkpoint: an interrupted run keeps its progress and the
+    next run only embeds what is still missing.
+    Returns the number of documents written.
+    """
+    try:
+        writer = DocumentWriter(store, policy=DuplicatePolicy.OVERWRITE)
+
+        logger.info(f"Running indexing with up to {embedder.max_in_flight} embedding requests in flight...")
+        written = 0
+        for batch in embedder.embed_batches(documents):
+            writer.run(documents=batch)
+            written += len(batch)
+            if progress is not None:
+                progress.add(documents_embedded=len(batch))
+            logger.info(f"Checkpoint: {written} documents embedded and written "
+                        f"(batch size now {embedder.batch_size}).")
 
         logger.info("--- Ingestion Pipeline Finished Successfully ---")
+        return written
 
     except Exception as e:
         logger.critical(f"Pipeline execution failed: {e}")
         raise e
 
 
-def ingest_csv_data():
+def ingest_csv_data(telemetry: Optional[Telemetry] = None, progress: Optional[IngestionProgress] = None):
+    """
+    Synchronizes the vector store with the CSV.
+    The file is streamed in chunks and piped into embedding as a generator, so memory stays flat.
+    Only new or changed recipes are embedded; documents whose source row disappeared are deleted.
+    Every embedded batch is written right away, so the store can already be searched while this runs.
+
+    Args:
+        telemetry: Receives the ingestion trace and metrics. Built from config.yaml if not given.
+        progress: Updated while the ingestion runs, e.g. for a progress bar.
+    """
     config, api_token = _load_and_validate_config()
+    telemetry = telemetry or Telemetry.from_config(config)
+    progress = progress or IngestionProgress()
+    progress.update(state="running", started=time.time())
+    trace = telemetry.trace("ingestion")
+    try:
+        _sync_store(config, api_token, telemetry, trace, progress)
+        # the line count is only an estimate (quoted fields may span lines)
+        progress.update(state="done", rows_total=progress.rows_seen, finished=time.time())
+    except Exception as e:
+        progress.update(state="failed", error=str(e), finished=time.time())
+        raise
+    finally:
+        trace.finish()
 
+
+def _sync_store(config: Dict[str, Any], api_token: str, telemetry: Telemetry, trace: Trace,
+                progress: IngestionProgress):
     paths = config["paths"]
     chroma_path = PROJECT_ROOT / paths["chroma"]
     data_dir = PROJECT_ROOT / paths["data"]
 
     target_filename = paths.get("dataset_file", "small_recipes.csv")
+    ingestion_config = config.get("ingestion", {})
+    chunk_size = ingestion_config.get("chunk_size", 2000)
+    workers = ingestion_config.get("workers", 1)
 
     vector_store = _initialize_store(chroma_path)
+    progress.update(rows_total=_count_rows(data_dir / target_filename))
+
+    with trace.span("load_existing_ids") as span:
+        existing_ids = _existing_document_ids(vector_store)
+        span["documents"] = len(existing_ids)
+    seen_ids = set()
+    recipe_store = RecipeStore.from_config(config)
+    seen_recipe_ids = set()
+
+    chunks = _iter_recipe_chunks(data_dir, target_filename, chunk_size)
+    documents = _iter_documents(chunks, workers)
+
+    dedup_config = config.get("dedup", {})
+    dedup_index, variants, canonical_names = None, defaultdict(list), {}
+    if dedup_config.get("enabled", False):
+        dedup_index = NearDuplicateIndex(dedup_config.get("threshold", 0.8), dedup_config.get("num_perm", 64))
+        documents = _collapse_duplicates(documents, dedup_index, variants, canonical_names, progress)
+
+    documents = split_payloads(documents, recipe_store, seen_recipe_ids)
+    updated_ids = set()
+    documents = _sync_metadata(documents, vector_store, existing_ids, updated_ids)
+    new_documents = _skip_existing(documents, existing_ids, seen_ids, progress)
+
+    embedder = ConcurrentBatchEmbedder.from_config(
+        lambda: create_document_embedder(config, api_token, batch_size=ingestion_config.get("max_batch_size", 128)),
+        config,
+        telemetry=telemetry,
+    )
+    # reading, transforming, embedding and writing are one stream, so they share a span
+    with trace.span("read_embed_write") as span:
+        written = _run_indexing_pipeline(new_documents, vector_store, embedder, progress)
+        span["documents"] = written
+
+    stale_ids = list(existing_ids - seen_ids)
+    updated = len(updated_ids)
+    unchanged = len(seen_ids) - written - updated
+    logger.info(
+        f"{unchanged} documents unchanged, {updated} with updated metadata, "
+        f"{written} embedded, {len(stale_ids)} to delete."
+    )
 
-    df = _load_recipe_data(data_dir, target_filename)
-
-    documents = _transform_data_to_documents(df)
-
-    if documents:
-        _run_indexing_pipeline(documents, vector_store, config['embeddings_model'], api_token)
-    else:
-        logger.warning("No documents to index. Pipeline skipped.")
+    trace.set(embedded=written, updated=updated, unchanged=unchanged, deleted=len(stale_ids))
+    telemetry.inc("cookcompass_ingested_documents_total", written, status="embedded")
+    telemetry.inc("cookcompass_ingested_documents_total", updated, status="updated")
+    telemetry.inc("cookcompass_ingested_documents_total", unchanged, status="unchanged")
+    telemetry.inc("cookcompass_ingested_documents_total", len(stale_ids), status="deleted")
+
+    if stale_ids:
+        with trace.span("delete_stale", documents=len(stale_ids)):
+            vector_store.delete_documents(stale_ids)
+        logger.info(f"Deleted {len(stale_ids)} documents whose source rows are gone or changed.")
+
+    if dedup_index is not None:
+        recipe_store.set_variants({canonical: [original_id for original_id, _, _ in cluster]
+                                   for canonical, cluster in variants.items()})
+        report = _write_dedup_report(
+            PROJECT_ROOT / dedup_config.get("report_path", "logs/dedup_report.json"), dedup_index, len(seen_ids),
+            variants, canonical_names,
+            embeddings_saved=sum(1 for cluster in variants.values() for _, doc_id, _ in cluster
+                                 if doc_id not in existing_ids),
+            batch_size=ingestion_config.get("batch_size", 32),
+        )
+        logger.info(f"Collapsed {report['duplicates_collapsed']} near-duplicate recipes into "
+                    f"{report['clusters']} canonical recipes, saving {report['embedded_documents_saved']} "
+                    f"document embeddings.")
+        trace.set(duplicates=report["duplicates_collapsed"])
+        telemetry.inc("cookcompass_ingested_documents_total", report["duplicates_collapsed"], status="duplicate")
+
+    pruned = recipe_store.prune(seen_recipe_ids)
+    if pruned:
+        logger.info(f"Deleted {pruned} recipe payloads whose source rows are gone.")
+
+    if written or updated or stale_ids:
+        bump_index_version(PROJECT_ROOT / paths["index_version"])
+
+    retriever_config = config.get("retriever", {})
+    if retriever_config.get("type", "vector") == "hybrid":
+        index_path = PROJECT_ROOT / paths["lexical_index"]
+        if written or updated or stale_ids or not index_path.exists():
+            with trace.span("lexical_index"):
+                build_lexical_index(vector_store, index_path)
+
+    if retriever_config.get("dense_index", "chroma") == "numpy":
+        index_path = PROJECT_ROOT / paths["numpy_index"]
+        if written or updated or stale_ids or not (index_path / "manifest.json").exists():
+            with trace.span("numpy_index"):
+                build_numpy_index(vector_store, index_path, config.get("numpy_index", {}).get("dtype", "float16"))
 
 
 if __name__ == "__main__":
@@ -0,0 +1,80 @@
+import re
+from typing import List, Tuple, Dict
+
+from .constraints import parse_constraints
+from .keywords import KEYWORDS, KEYWORD_SYNONYMS
+
+NEGATIONS = {"not", "no", "without", "dont", "doesnt", "isnt", "never", "nothing", "neither", "nor"}
+NEGATION_WINDOW = 3
+
+# words hinting at a dietary or lifestyle constraint; if one appears but no phrase matched,
+# the lexicon probably missed something and the LLM fallback is worth its cost
+CONSTRAINT_HINTS = {
+    "diet", "dietary", "intolerant", "intolerance", "allergy", "allergic", "allergies", "restriction",
+    "restrictions", "condition", "sugar", "carb", "carbs", "protein", "calories", "calorie", "lean", "light",
+    "weight", "fit", "minutes", "mins", "time", "money", "price", "meat", "dairy", "animal", "halal",
+}
+
+MINUTE_WORDS = {"min", "mins", "minute", "minutes"}
+
+
+def _normalize(text: str) -> List[str]:
+    text = text.lower().replace("’", "'").replace("'", "")
+    return re.sub(r"[^a-z0-9]+", " ", text).split()
+
+
+class LexiconKeywordExtractor:
+    """
+    Deterministic keyword extractor built on the synonym table in `keywords.py`.
+    Matches the longest phrase first, drops phrases preceded by a negation ("not vegan")
+    and reports a confidence so callers can decide when an LLM fallback is worth it.
+    """
+
+    def __init__(self, synonyms: Dict[str, List[str]] = None):
+        synonyms = synonyms or KEYWORD_SYNONYMS
+        self._phrases: Dict[Tuple[str, ...], str] = {}
+        for keyword, phrases in synonyms.items():
+            for phrase in phrases + [keyword]:
+                self._phrases[tuple(_normalize(phrase))] = keyword
+        self._max_phrase_length = max(len(phrase) for phrase in self._phrases)
+
+    @staticmethod
+    def _is_negated(tokens: List[str], start: int, previous_end: int) -> bool:
+        window = tokens[max(previous_end, start - NEGATION_WINDOW):start]
+        return any(token in NEGATIONS for token in window)
+
+    def extract(self, query: str) -> Tuple[List[str], float]:
+        """Returns the keywords found in `query` (in KEYWORDS order) and a confidence between 0 and 1."""
+        tokens = _normalize(query)
+        found = set()
+        negated = set()
+        # "at least 10 minutes" asks for longer recipes, not quick ones (see parse_constraints)
+        minutes_low, _ = parse_constraints(query).get("minutes", (None, None))
+
+        position = previous_end = 0
+        while position < len(tokens):
+            match = self._match_at(tokens, position, quick_minutes=minutes_low is None)
+            if match is None:
+                position += 1
+                continue
+
+            keyword, length = match
+            (negated if self._is_negated(tokens, position, previous_end) else found).add(keyword)
+            position = previous_end = position + length
+
+        keywords = [keyword for keyword in KEYWORDS if keyword in found]
+        if keywords or negated or not CONSTRAINT_HINTS.intersection(tokens):
+            return keywords, 1.0
+        return keywords, 0.3
+
+    def _match_at(self, tokens: List[str], position: int, quick_minutes: bool = True):
+        for length in range(min(self._max_phrase_length, len(tokens) - position), 0, -1):
+            keyword = self._phrases.get(tuple(tokens[position:position + length]))
+            if keyword is not None:
+                return keyword, length
+
+        # "10 minutes", "15 mins" and the like, unless the query puts a lower bound on the time
+        if (quick_minutes and tokens[position].isdigit() and int(tokens[position]) <= 15
+                and position + 1 < len(tokens) and tokens[position + 1] in MINUTE_WORDS):
+            return "15-minutes-or-less", 2
+        return None
@@ -11,3 +11,77 @@ KEYWORDS = [
     "15-minutes-or-less",
     "healthy",
 ]
+
+# Phrases that signal each keyword, used by the local keyword extractor.
+# Phrases are matched on normalized text: lowercase, hyphens as spaces, apostrophes removed.
+KEYWORD_SYNONYMS = {
+    "vegan": [
+        "vegan", "plant based", "no animal products", "without animal products", "dont eat animal products",
+        "do not eat animal products", "no animal product",
+    ],
+    "vegetarian": [
+        "vegetarian", "veggie", "meatless", "meat free", "no meat", "without meat", "dont eat meat",
+        "do not eat meat", "cant eat meat", "not eating meat",
+    ],
+    "gluten-free": [
+        "gluten free", "no gluten", "without gluten", "celiac", "coeliac", "gluten intolerant",
+        "gluten intolerance", "cant eat gluten", "cant have gluten", "wheat free", "no wheat", "without wheat",
+        "cant eat wheat", "cant have wheat",
+    ],
+    "kosher": ["kosher"],
+    "lactose-free": [
+        "lactose free", "lactose intolerant", "lactose intolerance", "dairy free", "non dairy", "no dairy",
+        "without dairy", "cant have dairy", "cant eat dairy", "dont eat dairy",
+    ],
+    "low-carb": [
+        "low carb", "low carbs", "keto", "ketogenic", "atkins", "cutting carbs", "cut carbs", "no carbs",
+        "few carbs", "low in carbs", "carb free",
+    ],
+    "inexpensive": [
+        "inexpensive", "cheap", "budget", "affordable", "broke", "save money", "low cost", "economical", "frugal",
+    ],
+    "high-protein": [
+        "high protein", "protein rich", "rich in protein", "lots of protein", "more protein", "building muscle",
+        "build muscle", "muscle gain", "bulking",
+    ],
+    "diabetic": ["diabetic", "diabetes", "blood sugar"],
+    "15-minutes-or-less": [
+        "15 minutes or less", "quick", "quickly", "fast", "in a hurry", "hurry", "short on time", "speedy",
+    ],
+    "healthy": [
+        "healthy", "healthier", "nutritious", "health kick", "wholesome", "eat well", "clean eating",
+    ],
+}
+
+
+def keyword_field(keyword: str) -> str:
+    """Name of the boolean metadata field for a keyword, e.g. "15-minutes-or-less" -> "tag_15_minutes_or_less"."""
+    return "tag_" + keyword.replace("-", "_")
+
+
+def keyword_flags(tags: set) -> dict:
+    """One boolean metadata field per entry in KEYWORDS, so keyword constraints can be filtered inside the store."""
+    return {keyword_field(keyword): keyword in tags for keyword in KEYWORDS}
+
+
+def keyword_conditions(keywords: list) -> list:
+    """Haystack filter conditions requiring every given keyword."""
+    return [
+        {"field": f"meta.{keyword_field(keyword)}", "operator": "==", "value": True}
+        for keyword in keywords
+    ]
+
+
+def all_of(conditions: list):
+    """Haystack metadata filter requiring every condition, or None if there are none."""
+    if not conditions:
+        return None
+    # Chroma rejects an AND with a single condition
+    if len(conditions) == 1:
+        return conditions[0]
+    return {"operator": "AND", "conditions": conditions}
+
+
+def keyword_filters(keywords: list) -> dict:
+    """Haystack metadata filter requiring every given keyword."""
+    return all_of(keyword_conditions(keywords))
@@ -0,0 +1,103 @@
+import json
+import logging
+import math
+import os
+import re
+from collections import Counter, defaultdict
+from pathlib import Path
+from typing import List, Dict, Any, Optional, Iterable
+
+from haystack import Document
+from haystack.utils.filters import document_matches_filter
+
+from .utils import iter_store_documents
+
+logger = logging.getLogger("Lexical")
+
+STOPWORDS = {
+    "a", "an", "and", "are", "can", "for", "i", "in", "is", "it", "me", "my", "of", "on", "or", "recipe",
+    "recipes", "ingredients", "some", "the", "to", "what", "with", "have", "make", "want", "need", "show",
+}
+
+
+def tokenize(text: str) -> List[str]:
+    return [token for token in re.findall(r"[a-z0-9]+", text.lower()) if token not in STOPWORDS]
+
+
+class BM25Index:
+    """
+    In-process BM25 inverted index over the embedded recipe text (name + ingredients).
+    Persisted as JSON next to the Chroma store so the lexical retriever works without any API.
+    """
+
+    def __init__(self, documents: List[Dict[str, Any]], postings: Dict[str, List[List[int]]],
+                 doc_lengths: List[int], k1: float = 1.5, b: float = 0.75):
+        self.documents = documents
+        self.postings = postings
+        self.doc_lengths = doc_lengths
+        self.k1 = k1
+        self.b = b
+        self.avg_doc_length = sum(doc_lengths) / len(doc_lengths) if doc_lengths else 0.0
+
+    @classmethod
+    def build(cls, documents: Iterable[Document]) -> "BM25Index":
+        postings = defaultdict(list)
+        doc_lengths = []
+        stored = []
+
+        for index, doc in enumerate(documents):
+            tokens = tokenize(doc.content or "")
+            doc_lengths.append(len(tokens))
+            for term, frequency in Counter(tokens).items():
+                postings[term].append([index, frequency])
+            stored.append({"id": doc.id, "content": doc.content, "meta": doc.meta})
+
+        logger.info(f"Built BM25 index with {len(stored)} documents and {len(postings)} terms.")
+        return cls(stored, dict(postings), doc_lengths)
+
+    @classmethod
+    def load(cls, path: Path) -> "BM25Index":
+        with open(path, "r", encoding="utf-8") as file:
+            data = json.load(file)
+        return cls(data["documents"], data["postings"], data["doc_lengths"])
+
+    def save(self, path: Path):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        # written next to the index and renamed over it, so a reader never loads a half-written file
+        temp_path = path.with_name(f"{path.name}.tmp-{os.getpid()}")
+        with open(temp_path, "w", encoding="utf-8") as file:
+            json.dump({"documents": self.documents, "postings": self.postings, "doc_lengths": self.doc_lengths}, file)
+        os.replace(temp_path, path)
+        logger.info(f"BM25 index saved at: {path}")
+
+    def _scores(self, query: str) -> Dict[int, float]:
+        total = len(self.documents)
+        scores = defaultdict(float)
+        for term in set(tokenize(query)):
+            term_postings = self.postings.get(term)
+            if not term_postings:
+                continue
+            idf = math.log(1 + (total - len(term_postings) + 0.5) / (len(term_postings) + 0.5))
+            for index, frequency in term_postings:
+                length_norm = 1 - self.b + self.b * self.doc_lengths[index] / self.avg_doc_length
+                scores[index] += idf * frequency * (self.k1 + 1) / (frequency + self.k1 * length_norm)
+        return scores
+
+    def search(self, query: str, top_k: int = 10, filters: Optional[Dict[str, Any]] = None) -> List[Document]:
+        results = []
+        for index, score in sorted(self._scores(query).items(), key=lambda item: item[1], reverse=True):
+            stored = self.documents[index]
+            doc = Document(id=stored["id"], content=stored["content"], meta=stored["meta"], score=score)
+            if filters and not document_matches_filter(filters, doc):
+                continue
+            results.append(doc)
+            if len(results) >= top_k:
+                break
+        return results
+
+
+def build_lexical_index(store: Any, path: Path) -> BM25Index:
+    """Rebuilds the BM25 index from every document in the store (read page by page) and persists it."""
+    index = BM25Index.build(iter_store_documents(store, embeddings=False))
+    index.save(path)
+    return index
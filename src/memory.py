@@ -0,0 +1,267 @@
+import hashlib
+import logging
+import re
+import threading
+from collections import OrderedDict, deque
+from typing import List, Dict, Any, Optional, Callable, Tuple
+
+from haystack import Document
+
+from .context import approximate_token_count
+from .lexical import tokenize
+
+logger = logging.getLogger("Memory")
+
+SUMMARY_HEADER = "Summary of the earlier conversation:"
+OMITTED_NOTE = "({} earlier messages omitted)"
+
+# share of a remembered recipe's name words a query has to mention to bring the recipe back into the context
+RECALL_OVERLAP = 0.6
+
+
+def _fingerprint(message: Dict[str, str]) -> str:
+    return hashlib.sha1(f"{message['role']}\0{message['content']}".encode("utf-8")).hexdigest()
+
+
+def _prefix_fingerprint(messages: List[Dict[str, str]]) -> str:
+    digest = hashlib.sha1()
+    for message in messages:
+        digest.update(_fingerprint(message).encode("ascii"))
+    return digest.hexdigest()
+
+
+def _normalized(text: str) -> str:
+    return " ".join(re.findall(r"[a-z0-9]+", text.lower()))
+
+
+def _shorten(text: str, max_chars: int) -> str:
+    text = " ".join(text.split())
+    if len(text) <= max_chars:
+        return text
+    return text[:max_chars].rsplit(" ", 1)[0] + " ..."
+
+
+class _Session:
+    """Summary of the messages of one conversation that left the verbatim window."""
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.processed = 0
+        self.prefix: Optional[str] = None  # fingerprint of the summarized messages
+        self.lines: deque = deque()
+        self.tokens = 0
+        self.omitted = 0
+        self.references: OrderedDict[str, Dict[str, Any]] = OrderedDict()
+
+
+class ConversationMemory:
+    """
+    Keeps the conversation part of the prompt under a token cap. The most recent messages stay verbatim;
+    older ones are folded, one message per turn, into a rolling summary in which a recipe answer is only
+    a reference (name and recipe id). A referenced recipe the user comes back to is re-expanded into the
+    context by `recall`. Summaries are cached per session, so every turn only compresses the message that
+    just left the verbatim window.
+    """
+
+    def __init__(self, max_tokens: int = 1500, recent_messages: int = 4, max_user_chars: int = 200,
+                 max_answer_chars: int = 160, max_sessions: int = 1000, max_answers: int = 10000,
+                 max_references: int = 50, count_tokens: Callable[[str], int] = approximate_token_count):
+        """
+        Args:
+            max_tokens: Token cap of the earlier conversation in the prompt, summary and verbatim messages together.
+            recent_messages: Messages before the current one that are kept verbatim while they fit the cap.
+            max_user_chars: Length older user messages are cut to in the summary.
+            max_answer_chars: Length of the summary of an older answer that recommended no known recipe.
+            max_sessions: Sessions whose summaries are kept. The least recently used are evicted (and rebuilt
+                from their history if they come back).
+            max_answers: Answers whose recipe references are kept.
+            max_references: Summarized recipe references per session that `recall` can re-expand.
+            count_tokens: Token counting function, see `context.load_token_counter`.
+        """
+        self.max_tokens = max_tokens
+        self.recent_messages = recent_messages
+        self.max_user_chars = max_user_chars
+        self.max_answer_chars = max_answer_chars
+        self.max_sessions = max_sessions
+        self.max_answers = max_answers
+        self.max_references = max_references
+        self.count_tokens = count_tokens
+        # the summary header and the omitted-messages note, reserved from the cap
+        self._header_tokens = count_tokens(f"{SUMMARY_HEADER}\n{OMITTED_NOTE.format(10 ** 6)}\n")
+
+        self._sessions: OrderedDict[str, _Session] = OrderedDict()
+        # keyed by the fingerprint of the answer text, so they are found again in any later history
+        self._answers: OrderedDict[str, List[Dict[str, Any]]] = OrderedDict()
+        # reentrant: summarizing a message looks up its references
+        self._lock = threading.RLock()
+
+    @classmethod
+    def from_config(cls, config: Dict[str, Any],
+                    count_tokens: Callable[[str], int] = approximate_token_count) -> Optional["ConversationMemory"]:
+        """Builds the memory from the `memory` section of config.yaml, or None if disabled."""
+        memory_config = config.get("memory", {})
+        if not memory_config.get("enabled", False):
+            return None
+        return cls(
+            max_tokens=memory_config.get("max_tokens", 1500),
+            recent_messages=memory_config.get("recent_messages", 4),
+            max_user_chars=memory_config.get("max_user_chars", 200),
+            max_answer_chars=memory_config.get("max_answer_chars", 160),
+            max_sessions=memory_config.get("max_sessions", 1000),
+            count_tokens=count_tokens,
+        )
+
+    def remember_answer(self, answer: str, context_docs: List[Document]):
+        """Records which of the context recipes an answer recommends, i.e. mentions by name."""
+        text = f" {_normalized(answer)} "
+        references = []
+        for doc in context_docs:
+            name = _normalized(str(doc.meta.get("name", "")))
+            if name and f" {name} " in text:
+                references.append({"name": " ".join(str(doc.meta["name"]).split()),
+                                   "original_id": doc.meta.get("original_id"), "content": doc.content})
+
+        with self._lock:
+            self._answers[_fingerprint({"role": "assistant", "content": answer})] = references
+            while len(self._answers) > self.max_answers:
+                self._answers.popitem(last=False)
+
+    def _references(self, message: Dict[str, str]) -> List[Dict[str, Any]]:
+        if message["role"] != "assistant":
+            return []
+        with self._lock:
+            return self._answers.get(_fingerprint(message), [])
+
+    def compress(self, message: Dict[str, str]) -> str:
+        """One summary line for a message."""
+        if message["role"] == "user":
+            return f"User: {_shorten(message['content'], self.max_user_chars)}"
+
+        references = self._references(message)
+        if references:
+            return "Assistant suggested: " + "; ".join(
+                f"{reference['name']} (recipe {reference['original_id']})" for reference in references
+            )
+        return f"Assistant: {_shorten(message['content'], self.max_answer_chars)}"
+
+    def transcript(self, messages: List[Dict[str, str]]) -> str:
+        """The messages as summary lines, e.g. for query rewriting, where full recipes are only noise."""
+        return "\n".join(self.compress(message) for message in messages)
+
+    def _session(self, session_id: Optional[str], history: List[Dict[str, str]]) -> _Session:
+        # without an id, conversations are told apart by their first message; `_continues` catches a wrong guess
+        key = session_id or _fingerprint(history[0])
+        with self._lock:
+            session = self._sessions.get(key)
+            if session is None:
+                session = self._sessions[key] = _Session()
+                while len(self._sessions) > self.max_sessions:
+                    self._sessions.popitem(last=False)
+            self._sessions.move_to_end(key)
+        return session
+
+    @staticmethod
+    def _continues(session: _Session, history: List[Dict[str, str]]) -> bool:
+        """Whether the history starts with the messages the session summarized."""
+        if session.processed > len(history):
+            return False
+        return not session.processed or _prefix_fingerprint(history[:session.processed]) == session.prefix
+
+    def _append(self, session: _Session, message: Dict[str, str]):
+        line = self.compress(message)
+        tokens = self.count_tokens(line + "\n")
+        session.lines.append((line, tokens))
+        session.tokens += tokens
+        for reference in self._references(message):
+            session.references[str(reference["original_id"])] = reference
+            session.references.move_to_end(str(reference["original_id"]))
+        while len(session.references) > self.max_references:
+            session.references.popitem(last=False)
+
+    def messages(self, history: List[Dict[str, str]], session_id: Optional[str] = None) -> List[Dict[str, str]]:
+        """
+        The earlier conversation to send with the next request: a system message with the summary
+        (if anything was summarized) followed by the recent messages that fit the token cap verbatim.
+
+        Args:
+            history: The conversation before the current user message.
+            session_id: Identifies the conversation across turns.
+        """
+        if not history:
+            return []
+
+        session = self._session(session_id, history)
+        cutoff = max(0, len(history) - self.recent_messages)
+        with self._lock:
+            # a history that does not continue the summarized one (e.g. a cleared chat) starts a new summary
+            if session.processed > cutoff or not self._continues(session, history):
+                logger.info("Conversation history changed. Rebuilding its summary.")
+                session.reset()
+            for message in history[session.processed:cutoff]:
+                self._append(session, message)
+            session.processed = cutoff
+            session.prefix = _prefix_fingerprint(history[:cutoff]) if cutoff else None
+
+            recent, extra_lines = self._fit_recent(history[cutoff:])
+            budget = self.max_tokens - sum(self.count_tokens(message["content"]) for message in recent)
+            budget -= sum(tokens for _, tokens in extra_lines)
+            budget -= self._header_tokens
+            # lines that could never fit are dropped for good, so the summary stays bounded
+            while session.lines and session.tokens > self.max_tokens - self._header_tokens:
+                _, tokens = session.lines.popleft()
+                session.tokens -= tokens
+                session.omitted += 1
+
+            # the newest lines that fit next to this turn's verbatim messages
+            shown, used = [], 0
+            for line, tokens in reversed(session.lines):
+                if used + tokens > budget:
+                    break
+                shown.append(line)
+                used += tokens
+            lines = shown[::-1] + [line for line, _ in extra_lines]
+            omitted = session.omitted + len(session.lines) - len(shown)
+
+        if not lines and not omitted:
+            return recent
+        if omitted:
+            lines.insert(0, OMITTED_NOTE.format(omitted))
+        return [{"role": "system", "content": "\n".join([SUMMARY_HEADER] + lines)}] + recent
+
+    def _fit_recent(self, recent: List[Dict[str, str]]) -> Tuple[List[Dict[str, str]], List[Tuple[str, int]]]:
+        """Recent messages that fit the cap verbatim; older ones that do not are summarized for this turn only."""
+        tokens = [self.count_tokens(message["content"]) for message in recent]
+        start = 0
+        while start < len(recent) - 1 and sum(tokens[start:]) > self.max_tokens:
+            start += 1
+        lines = [(line, self.count_tokens(line + "\n")) for line in map(self.compress, recent[:start])]
+        return recent[start:], lines
+
+    def recall(self, query: str, history: List[Dict[str, str]], session_id: Optional[str] = None) -> List[Document]:
+        """
+        Summarized recipes the query refers to by name, as documents to put back into the context.
+        Only recipes that are no longer in the verbatim part of the conversation are considered, and of those
+        the ones sharing the most name words with the query ("the souper rice" is not "lemon rice soup").
+        """
+        if not history:
+            return []
+
+        query_words = set(tokenize(query))
+        session = self._session(session_id, history)
+        with self._lock:
+            # the references of another conversation that opened with the same message are not this one's
+            references = list(session.references.values()) if self._continues(session, history) else []
+
+        matches = []
+        for reference in reversed(references):
+            name_words = set(tokenize(reference["name"]))
+            overlap = len(name_words & query_words) / len(name_words) if name_words else 0.0
+            if overlap >= RECALL_OVERLAP:
+                matches.append((overlap, reference))
+
+        best = max((overlap for overlap, _ in matches), default=None)
+        return [Document(content=reference["content"],
+                         meta={"name": reference["name"], "original_id": reference["original_id"]})
+                for overlap, reference in matches if overlap == best]
@@ -0,0 +1,148 @@
+import json
+import logging
+import sqlite3
+import threading
+import zlib
+from pathlib import Path
+from typing import List, Dict, Any, Iterable, Iterator, Optional
+
+from haystack import Document
+
+from .utils import PROJECT_ROOT
+
+logger = logging.getLogger("RecipeStore")
+
+# kept out of the vector store: only needed for the few recipes that end up in the prompt
+# (the payload may also hold `variant_ids`, see `set_variants`)
+PAYLOAD_FIELDS = ("steps", "description", "tags", "nutrition")
+
+# SQLite limits the number of host parameters per statement
+LOOKUP_CHUNK = 500
+
+
+class RecipeStore:
+    """
+    Heavy recipe fields (PAYLOAD_FIELDS) in a SQLite file, keyed by the recipe's `original_id`.
+    Each recipe is one zlib-compressed JSON blob, so the file stays small and a lookup of the
+    final context recipes is a single indexed query.
+    """
+
+    def __init__(self, path: Path):
+        """
+        Args:
+            path: SQLite file, created if missing.
+        """
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self.path = path
+        self._db = sqlite3.connect(str(path), check_same_thread=False)
+        # WAL lets the engine read while a background ingestion writes
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS recipes (original_id TEXT PRIMARY KEY, payload BLOB NOT NULL) WITHOUT ROWID"
+        )
+        self._db.commit()
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_config(cls, config: Dict[str, Any]) -> "RecipeStore":
+        return cls(PROJECT_ROOT / config["paths"].get("recipe_store", "db/recipes.sqlite3"))
+
+    @staticmethod
+    def _encode(payload: Dict[str, Any]) -> bytes:
+        return zlib.compress(json.dumps(payload, ensure_ascii=False, default=str).encode("utf-8"))
+
+    @staticmethod
+    def _decode(blob: bytes) -> Dict[str, Any]:
+        return json.loads(zlib.decompress(blob))
+
+    def put_many(self, payloads: Dict[str, Dict[str, Any]]):
+        """Inserts or replaces the payloads of several recipes in one transaction."""
+        rows = [(str(original_id), self._encode(payload)) for original_id, payload in payloads.items()]
+        with self._lock:
+            self._db.executemany("INSERT OR REPLACE INTO recipes (original_id, payload) VALUES (?, ?)", rows)
+            self._db.commit()
+
+    def get_many(self, original_ids: Iterable[Any]) -> Dict[str, Dict[str, Any]]:
+        """Payloads of the given recipes. Unknown ids are left out."""
+        ids = list(dict.fromkeys(str(original_id) for original_id in original_ids))
+        payloads = {}
+        with self._lock:
+            for start in range(0, len(ids), LOOKUP_CHUNK):
+                chunk = ids[start:start + LOOKUP_CHUNK]
+                placeholders = ",".join("?" * len(chunk))
+                rows = self._db.execute(
+                    f"SELECT original_id, payload FROM recipes WHERE original_id IN ({placeholders})", chunk
+                ).fetchall()
+                payloads.update((original_id, blob) for original_id, blob in rows)
+        return {original_id: self._decode(blob) for original_id, blob in payloads.items()}
+
+    def attach(self, documents: List[Document]) -> List[Document]:
+        """Returns copies of the documents with their payload fields added to the metadata."""
+        payloads = self.get_many(doc.meta.get("original_id") for doc in documents)
+        attached = []
+        for doc in documents:
+            payload = payloads.get(str(doc.meta.get("original_id")))
+            if payload is None:
+                # e.g. documents written before the payload was split out still carry it in their metadata
+                attached.append(doc)
+                continue
+            attached.append(Document(id=doc.id, content=doc.content, meta={**doc.meta, **payload},
+                                     score=doc.score, embedding=doc.embedding))
+        return attached
+
+    def set_variants(self, variants: Dict[str, List[str]]):
+        """Records the original_ids of collapsed near-duplicates as `variant_ids` in the canonicals' payloads."""
+        payloads = self.get_many(variants)
+        for original_id, payload in payloads.items():
+            payload["variant_ids"] = variants[original_id]
+        self.put_many(payloads)
+
+    def prune(self, keep_ids: Iterable[Any]) -> int:
+        """Deletes the payloads of recipes that are no longer in the dataset. Returns the number deleted."""
+        keep = {str(original_id) for original_id in keep_ids}
+        with self._lock:
+            stale = [(original_id,) for (original_id,) in self._db.execute("SELECT original_id FROM recipes")
+                     if original_id not in keep]
+            self._db.executemany("DELETE FROM recipes WHERE original_id = ?", stale)
+            self._db.commit()
+        return len(stale)
+
+    def count(self) -> int:
+        with self._lock:
+            return self._db.execute("SELECT COUNT(*) FROM recipes").fetchone()[0]
+
+
+def split_payloads(documents: Iterable[Document], store: RecipeStore, seen_ids: Optional[set] = None,
+                   batch_size: int = 1000) -> Iterator[Document]:
+    """
+    Moves the payload fields of every document into `store` and yields the document without them.
+    Payloads are written in batches before the documents are yielded, so every document that reaches
+    the vector store already has its payload.
+
+    Args:
+        documents: Documents whose metadata still contains PAYLOAD_FIELDS.
+        store: Receives the payloads.
+        seen_ids: Collects the original_id of every document, e.g. to prune payloads of removed recipes.
+        batch_size: Recipes per write transaction.
+    """
+    pending: List[Document] = []
+    payloads: Dict[str, Dict[str, Any]] = {}
+
+    def flush():
+        store.put_many(payloads)
+        yield from pending
+        pending.clear()
+        payloads.clear()
+
+    for doc in documents:
+        original_id = str(doc.meta.get("original_id"))
+        payloads[original_id] = {field: doc.meta[field] for field in PAYLOAD_FIELDS if field in doc.meta}
+        if seen_ids is not None:
+            seen_ids.add(original_id)
+        pending.append(Document(id=doc.id, content=doc.content, embedding=doc.embedding,
+                                meta={k: v for k, v in doc.meta.items() if k not in PAYLOAD_FIELDS}))
+        if len(pending) >= batch_size:
+            yield from flush()
+
+    if pending:
+        yield from flush()
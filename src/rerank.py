@@ -0,0 +1,119 @@
+import logging
+import threading
+from collections import OrderedDict
+from typing import List, Any, Optional, Dict
+
+import numpy as np
+from haystack import Document
+
+logger = logging.getLogger("Rerank")
+
+
+def _unit_rows(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+
+class MMRReranker:
+    """
+    Maximal Marginal Relevance over an over-fetched candidate pool. Every pick maximizes
+    `lambda_mult * relevance - (1 - lambda_mult) * max similarity to the documents already picked`,
+    so near-identical variants of one dish do not fill the context.
+    Uses the embeddings returned with the candidates; the pairwise similarities are one matrix product.
+    """
+
+    def __init__(self, lambda_mult: float = 0.7, top_k: int = 20, fetch_k: int = 40, cache_size: int = 4096):
+        """
+        Args:
+            lambda_mult: Trade-off between relevance (1.0) and diversity (0.0).
+            top_k: The number of documents returned.
+            fetch_k: The number of candidates retrievers should fetch for re-ranking.
+            cache_size: Unit vectors kept per document id. Converting the embedding lists returned by the store
+                dominates the cost, and popular recipes come back query after query.
+        """
+        self.lambda_mult = lambda_mult
+        self.top_k = top_k
+        self.fetch_k = max(fetch_k, top_k)
+        self.cache_size = cache_size
+        self._vectors: OrderedDict[str, np.ndarray] = OrderedDict()
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_config(cls, config: Dict[str, Any]) -> Optional["MMRReranker"]:
+        """Builds the reranker from the `mmr` section of config.yaml, or None if disabled."""
+        mmr_config = config.get("mmr", {})
+        if not mmr_config.get("enabled", False):
+            return None
+        return cls(
+            lambda_mult=mmr_config.get("lambda_mult", 0.7),
+            top_k=mmr_config.get("top_k", config.get("retriever", {}).get("top_k", 20)),
+            fetch_k=mmr_config.get("fetch_k", 40),
+            cache_size=mmr_config.get("cache_size", 4096),
+        )
+
+    def _unit_vectors(self, documents: List[Document], dim: int) -> np.ndarray:
+        """Unit embeddings of the documents as rows; zero rows for documents without an embedding."""
+        vectors = np.zeros((len(documents), dim), dtype=np.float32)
+        missing = []
+        with self._lock:
+            for row, doc in enumerate(documents):
+                # ids are content hashes, so an id always has the same embedding
+                cached = self._vectors.get(doc.id)
+                if cached is not None:
+                    self._vectors.move_to_end(doc.id)
+                    vectors[row] = cached
+                elif doc.embedding is not None:
+                    missing.append(row)
+
+        if missing:
+            vectors[missing] = _unit_rows(np.asarray([documents[row].embedding for row in missing],
+                                                     dtype=np.float32))
+            with self._lock:
+                for row in missing:
+                    self._vectors[documents[row].id] = vectors[row].copy()
+                while len(self._vectors) > self.cache_size:
+                    self._vectors.popitem(last=False)
+        return vectors
+
+    def rerank(self, documents: List[Document], query_embedding: Optional[List[float]] = None) -> List[Document]:
+        """
+        Returns the `top_k` most relevant yet mutually diverse documents, in pick order.
+
+        Args:
+            documents: Candidates, best first.
+            query_embedding: Relevance is the cosine similarity with the query when it and every candidate
+                embedding are known. Otherwise (e.g. lexical hits in hybrid retrieval) the candidate order is
+                used, with relevance falling linearly from 1 to 0.
+        """
+        n = len(documents)
+        if n <= 1:
+            return documents[:self.top_k]
+
+        with_embedding = [doc.embedding is not None for doc in documents]
+        if not any(with_embedding):
+            return documents[:self.top_k]
+
+        dim = len(next(doc.embedding for doc in documents if doc.embedding is not None))
+        vectors = self._unit_vectors(documents, dim)
+
+        # documents without an embedding have similarity 0 to everything, i.e. count as diverse
+        similarity = vectors @ vectors.T
+
+        if query_embedding is not None and all(with_embedding):
+            relevance = vectors @ _unit_rows(np.asarray([query_embedding], dtype=np.float32))[0]
+        else:
+            relevance = np.linspace(1.0, 0.0, n, dtype=np.float32)
+
+        relevance_term = self.lambda_mult * relevance
+        max_similarity = np.zeros(n, dtype=np.float32)
+        available = np.ones(n, dtype=bool)
+        picked = []
+        for _ in range(min(self.top_k, n)):
+            scores = np.where(available, relevance_term - (1.0 - self.lambda_mult) * max_similarity, -np.inf)
+            best = int(np.argmax(scores))
+            picked.append(best)
+            available[best] = False
+            np.maximum(max_similarity, similarity[best], out=max_similarity)
+
+        return [documents[i] for i in picked]
@@ -0,0 +1,289 @@
+import logging
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import Executor, ThreadPoolExecutor, wait, FIRST_COMPLETED
+from typing import Callable, TypeVar, Optional, Dict, Any
+
+logger = logging.getLogger("Resilience")
+
+T = TypeVar("T")
+
+RETRYABLE_STATUS_CODES = {429, 500, 502, 503, 504}
+
+
+class TokenBucket:
+    """Thread-safe token bucket. `acquire` blocks until a token is available."""
+
+    def __init__(self, rate: float, capacity: Optional[float] = None):
+        """
+        Args:
+            rate: Tokens added per second, i.e. the sustained request rate.
+            capacity: Maximum burst size. Defaults to `rate` (at least 1).
+        """
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(1.0, rate)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self, tokens: float = 1.0):
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+
+                if self._tokens >= tokens:
+                    self._tokens -= tokens
+                    return
+                wait = (tokens - self._tokens) / self.rate
+            time.sleep(wait)
+
+
+def status_code_of(error: Exception) -> Optional[int]:
+    """Extracts the HTTP status code from requests/huggingface_hub style exceptions, if any."""
+    response = getattr(error, "response", None)
+    status_code = getattr(response, "status_code", None) or getattr(error, "status_code", None)
+    return status_code if isinstance(status_code, int) else None
+
+
+def is_retryable(error: Exception) -> bool:
+    """Rate limits, server errors and connection problems are worth retrying; client errors are not."""
+    status_code = status_code_of(error)
+    if status_code is not None:
+        return status_code in RETRYABLE_STATUS_CODES
+    if isinstance(error, (ConnectionError, TimeoutError)):
+        return True
+    # requests/httpx connection and timeout errors do not derive from the builtin ones
+    return any(marker in type(error).__name__ for marker in ("Connect", "Timeout"))
+
+
+def retry_with_backoff(fn: Callable[[], T], max_retries: int = 5, base_delay: float = 0.5, max_delay: float = 30.0,
+                       retry_on: Callable[[Exception], bool] = is_retryable,
+                       on_retry: Optional[Callable[[int, Exception], None]] = None) -> T:
+    """
+    Calls `fn`, retrying retryable errors with exponential backoff and full jitter.
+    `on_retry` is called with the attempt number and the error before every retry.
+    """
+    attempt = 0
+    while True:
+        try:
+            return fn()
+        except Exception as e:
+            if attempt >= max_retries or not retry_on(e):
+                raise
+            delay = random.uniform(0, min(max_delay, base_delay * 2 ** attempt))
+            attempt += 1
+            if on_retry is not None:
+                on_retry(attempt, e)
+            logger.warning(f"Attempt {attempt}/{max_retries} failed ({e}). Retrying in {delay:.2f}s.")
+            time.sleep(delay)
+
+
+class DeadlineExceeded(TimeoutError):
+    """Raised when a guarded call did not finish before its deadline."""
+
+
+class CircuitOpenError(RuntimeError):
+    """Raised instead of calling a backend whose circuit breaker is open."""
+
+
+class LatencyTracker:
+    """Latencies of the most recent calls, for percentile estimates."""
+
+    def __init__(self, window: int = 200, min_samples: int = 20):
+        """
+        Args:
+            window: Number of recent latencies kept.
+            min_samples: Percentiles are unknown (None) until this many latencies were recorded.
+        """
+        self.min_samples = min_samples
+        self._samples: deque = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def record(self, seconds: float):
+        with self._lock:
+            self._samples.append(seconds)
+
+    def percentile(self, fraction: float) -> Optional[float]:
+        with self._lock:
+            if len(self._samples) < self.min_samples:
+                return None
+            samples = sorted(self._samples)
+        return samples[min(len(samples) - 1, int(fraction * len(samples)))]
+
+
+class CircuitBreaker:
+    """
+    Opens after `failure_threshold` consecutive failures, so callers fail fast instead of waiting on a backend
+    that is down. After `reset_timeout` seconds one trial call is let through (half open): its success closes
+    the circuit, its failure opens it again. A trial whose outcome is never reported (e.g. the client went away)
+    expires after another `reset_timeout`.
+    """
+
+    def __init__(self, name: str, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._failures = 0
+        self._opened_at: Optional[float] = None
+        self._trial_started: Optional[float] = None
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            if self._opened_at is None:
+                return "closed"
+            return "half_open" if time.monotonic() - self._opened_at >= self.reset_timeout else "open"
+
+    def allow(self) -> bool:
+        """Whether a call may go ahead. In the half open state only one trial call is allowed at a time."""
+        with self._lock:
+            if self._opened_at is None:
+                return True
+            now = time.monotonic()
+            if now - self._opened_at < self.reset_timeout:
+                return False
+            if self._trial_started is not None and now - self._trial_started < self.reset_timeout:
+                return False
+            self._trial_started = now
+            return True
+
+    def record_success(self):
+        with self._lock:
+            if self._opened_at is not None:
+                logger.info(f"Circuit '{self.name}' closed.")
+            self._failures = 0
+            self._opened_at = None
+            self._trial_started = None
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            reopen = self._trial_started is not None
+            self._trial_started = None
+            if reopen or (self._opened_at is None and self._failures >= self.failure_threshold):
+                self._opened_at = time.monotonic()
+                logger.warning(f"Circuit '{self.name}' opened after {self._failures} consecutive failures.")
+
+
+class ResilientCaller:
+    """
+    Guards calls to one backend: every call gets a deadline, calls are refused while the circuit breaker is
+    open, and a call that is slower than the `hedge_percentile` of recent latencies gets one duplicate
+    (a hedged request); whichever finishes first successfully wins.
+    Python threads cannot be cancelled, so a call that missed its deadline keeps its worker until it returns.
+    """
+
+    def __init__(self, name: str, executor: Executor, timeout: Optional[float] = 10.0,
+                 hedge_percentile: Optional[float] = 0.95, hedge_min_delay: float = 0.05,
+                 breaker: Optional[CircuitBreaker] = None, latencies: Optional[LatencyTracker] = None,
+                 on_event: Optional[Callable[[str], None]] = None):
+        """
+        Args:
+            name: Backend name, used in logs and errors.
+            executor: Runs the calls and their hedges.
+            timeout: Seconds a call may take, hedges included. None waits indefinitely.
+            hedge_percentile: Latency percentile after which a hedge is sent. None disables hedging.
+            hedge_min_delay: Lower bound of the hedge delay, so a fast backend is not flooded with hedges.
+            breaker: Circuit breaker shared by everything calling the backend. None never fails fast.
+            latencies: Latency history of the backend. Defaults to a new LatencyTracker.
+            on_event: Called with "hedge", "hedge_won", "timeout", "error" or "rejected", e.g. to count them.
+        """
+        self.name = name
+        self.executor = executor
+        self.timeout = timeout
+        self.hedge_percentile = hedge_percentile
+        self.hedge_min_delay = hedge_min_delay
+        self.breaker = breaker
+        self.latencies = latencies or LatencyTracker()
+        self.on_event = on_event
+
+    @classmethod
+    def from_config(cls, name: str, config: Dict[str, Any],
+                    on_event: Optional[Callable[[str], None]] = None) -> "ResilientCaller":
+        """Builds the caller from a section of `resilience` in config.yaml, e.g. `resilience.llm`."""
+        section = config.get("resilience", {}).get(name, {})
+        return cls(
+            name,
+            ThreadPoolExecutor(max_workers=section.get("workers", 16), thread_name_prefix=f"{name}-call"),
+            timeout=section.get("timeout", 10.0),
+            hedge_percentile=section.get("hedge_percentile", 0.95),
+            hedge_min_delay=section.get("hedge_min_delay", 0.05),
+            breaker=CircuitBreaker(name, section.get("failure_threshold", 5), section.get("reset_timeout", 30.0)),
+            on_event=on_event,
+        )
+
+    def _event(self, event: str):
+        if self.on_event is not None:
+            self.on_event(event)
+
+    def _hedge_delay(self) -> Optional[float]:
+        if self.hedge_percentile is None:
+            return None
+        percentile = self.latencies.percentile(self.hedge_percentile)
+        return None if percentile is None else max(self.hedge_min_delay, percentile)
+
+    def check(self):
+        """Raises CircuitOpenError if the backend should not be called right now."""
+        if self.breaker is not None and not self.breaker.allow():
+            self._event("rejected")
+            raise CircuitOpenError(f"Circuit '{self.name}' is open.")
+
+    def record(self, success: bool, seconds: Optional[float] = None):
+        """Reports the outcome of a call made outside `call`, e.g. a streamed generation."""
+        if seconds is not None and success:
+            self.latencies.record(seconds)
+        if self.breaker is None:
+            return
+        if success:
+            self.breaker.record_success()
+        else:
+            self.breaker.record_failure()
+
+    def call(self, fn: Callable[[], T]) -> T:
+        """Calls `fn` under the deadline, with a hedge if it is slow. Raises DeadlineExceeded or CircuitOpenError."""
+        self.check()
+        start = time.monotonic()
+        deadline = None if self.timeout is None else start + self.timeout
+        hedge_delay = self._hedge_delay()
+        hedge_at = None if hedge_delay is None else start + hedge_delay
+
+        primary = self.executor.submit(fn)
+        pending = {primary}
+        error: Optional[Exception] = None
+        while pending:
+            wake_ups = [moment for moment in (deadline, hedge_at) if moment is not None]
+            timeout = max(0.0, min(wake_ups) - time.monotonic()) if wake_ups else None
+            done, pending = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+
+            for future in done:
+                try:
+                    result = future.result()
+                except Exception as e:
+                    error = e
+                    continue
+                self.record(True, time.monotonic() - start)
+                if future is not primary:
+                    self._event("hedge_won")
+                return result
+
+            now = time.monotonic()
+            if deadline is not None and now >= deadline:
+                break
+            if hedge_at is not None and now >= hedge_at and pending:
+                hedge_at = None
+                self._event("hedge")
+                pending.add(self.executor.submit(fn))
+
+        if pending:
+            self.record(False)
+            self._event("timeout")
+            raise DeadlineExceeded(f"'{self.name}' did not answer within {self.timeout:.1f}s.")
+        # a rejected request (e.g. 400) still means the backend is up
+        self.record(not is_retryable(error))
+        self._event("error")
+        raise error
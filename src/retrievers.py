@@ -1,46 +1,190 @@
+import logging
 from abc import ABC, abstractmethod
-from typing import List, Any
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from typing import List, Any, Optional, Dict, Tuple
 
-from haystack import Pipeline, Document
+from haystack import Pipeline, Document, component
 from haystack.components.embedders import HuggingFaceAPITextEmbedder
 from haystack.utils import Secret
 from haystack_integrations.components.retrievers.chroma import ChromaEmbeddingRetriever
 
+from .cache import EmbeddingCache
+from .lexical import BM25Index
+from .rerank import MMRReranker
+from .resilience import ResilientCaller
+from .vector_index import NumpyDocumentStore, NumpyEmbeddingRetriever
+
+logger = logging.getLogger("Retriever")
+
 
 class BaseRetrieverPipeline(ABC):
     @abstractmethod
-    def retrieve_documents(self, query: str) -> List[Document]:
+    def retrieve_documents(self, query: str, filters: Optional[Dict[str, Any]] = None) -> List[Document]:
         pass
 
+    def embed_query(self, query: str) -> Optional[List[float]]:
+        """Returns the query embedding, or None if the retriever does not embed queries."""
+        return None
+
+
+@component
+class CachedTextEmbedder:
+    """Wraps a text embedder and serves repeated queries from an EmbeddingCache."""
+
+    def __init__(self, embedder: Any, cache: EmbeddingCache, embeddings_model: str):
+        self.embedder = embedder
+        self.cache = cache
+        self.embeddings_model = embeddings_model
+
+    @component.output_types(embedding=List[float])
+    def run(self, text: str):
+        embedding = self.cache.get(self.embeddings_model, text)
+        if embedding is None:
+            embedding = self.embedder.run(text=text)["embedding"]
+            self.cache.put(self.embeddings_model, text, embedding)
+
+        logger.debug(f"Embedding cache: {self.cache.stats()}")
+        return {"embedding": embedding}
+
+
+@component
+class GuardedTextEmbedder:
+    """Wraps a text embedder so every call goes through a ResilientCaller (deadline, hedging, circuit breaker)."""
+
+    def __init__(self, embedder: Any, caller: ResilientCaller):
+        self.embedder = embedder
+        self.caller = caller
+
+    @component.output_types(embedding=List[float])
+    def run(self, text: str):
+        return self.caller.call(lambda: self.embedder.run(text=text))
+
 
 class VectorRetrieverPipeline(BaseRetrieverPipeline):
-    def __init__(self, document_store: Any, embeddings_model: str, api_token: str, top_k: int = 10):
-        """        
+    def __init__(self, document_store: Any, embeddings_model: str, api_token: str, top_k: int = 10,
+                 embedding_cache: Optional[EmbeddingCache] = None, text_embedder: Optional[Any] = None,
+                 reranker: Optional[MMRReranker] = None, embedder_caller: Optional[ResilientCaller] = None):
+        """
         Args:
-            document_store: The document store to retrieve from.
+            document_store: The document store to retrieve from (Chroma or NumpyDocumentStore).
             embeddings_model: The name of the embeddings model to use.
             api_token: The API token for the embeddings model.
             top_k: The number of documents to retrieve.
+            embedding_cache: Optional cache for query embeddings. None embeds every query.
+            text_embedder: Component producing query embeddings, see `embedders.create_text_embedder`.
+                Defaults to the HF API text embedder.
+            reranker: Optional MMR re-ranking of the `top_k` candidates down to `reranker.top_k`.
+            embedder_caller: Guards the query embedding calls that miss the cache. None calls the embedder directly.
         """
         self.document_store = document_store
         self.embeddings_model = embeddings_model
         self.api_token = api_token
         self.top_k = top_k
+        self.embedding_cache = embedding_cache
+        self.text_embedder = text_embedder
+        self.reranker = reranker
+        self.embedder_caller = embedder_caller
         self.pipeline = self._build_pipeline()
 
     def _build_pipeline(self) -> Pipeline:
-        text_embedder = HuggingFaceAPITextEmbedder(
+        text_embedder = self.text_embedder or HuggingFaceAPITextEmbedder(
             api_type="serverless_inference_api",
             api_params={"model": self.embeddings_model},
             token=Secret.from_token(self.api_token)
         )
 
+        if self.embedder_caller is not None:
+            text_embedder = GuardedTextEmbedder(text_embedder, self.embedder_caller)
+
+        if self.embedding_cache is not None:
+            text_embedder = CachedTextEmbedder(text_embedder, self.embedding_cache, self.embeddings_model)
+
+        if isinstance(self.document_store, NumpyDocumentStore):
+            retriever = NumpyEmbeddingRetriever(self.document_store, top_k=self.top_k)
+        else:
+            retriever = ChromaEmbeddingRetriever(self.document_store, top_k=self.top_k)
+
         pipeline = Pipeline()
         pipeline.add_component("query_embedder", text_embedder)
-        pipeline.add_component("retriever", ChromaEmbeddingRetriever(self.document_store, top_k=self.top_k))
+        pipeline.add_component("retriever", retriever)
         pipeline.connect("query_embedder.embedding", "retriever.query_embedding")
         return pipeline
 
-    def retrieve_documents(self, query: str) -> List[Document]:
-        results = self.pipeline.run({"query_embedder": {"text": query}})
-        return results["retriever"]["documents"]
+    def embed_query(self, query: str) -> Optional[List[float]]:
+        return self.pipeline.get_component("query_embedder").run(text=query)["embedding"]
+
+    def retrieve_with_embedding(self, query: str,
+                                filters: Optional[Dict[str, Any]] = None) -> Tuple[List[Document], List[float]]:
+        """The top_k documents (before re-ranking) together with the query embedding that found them."""
+        results = self.pipeline.run({"query_embedder": {"text": query}, "retriever": {"filters": filters}},
+                                    include_outputs_from={"query_embedder"})
+        return results["retriever"]["documents"], results["query_embedder"]["embedding"]
+
+    def retrieve_documents(self, query: str, filters: Optional[Dict[str, Any]] = None) -> List[Document]:
+        """
+        Args:
+            query: The search query to embed.
+            filters: Optional Haystack metadata filters applied inside the vector search.
+        """
+        documents, query_embedding = self.retrieve_with_embedding(query, filters)
+        if self.reranker is not None:
+            documents = self.reranker.rerank(documents, query_embedding)
+        return documents
+
+
+def reciprocal_rank_fusion(rankings: List[List[Document]], k: int = 60) -> List[Document]:
+    """Merges ranked lists by summing 1 / (k + rank) per document; the first list's document objects win."""
+    scores: Dict[str, float] = {}
+    documents: Dict[str, Document] = {}
+
+    for ranking in rankings:
+        for rank, doc in enumerate(ranking, start=1):
+            scores[doc.id] = scores.get(doc.id, 0.0) + 1.0 / (k + rank)
+            documents.setdefault(doc.id, doc)
+
+    fused = sorted(scores, key=scores.get, reverse=True)
+    return [documents[doc_id] for doc_id in fused]
+
+
+class HybridRetrieverPipeline(BaseRetrieverPipeline):
+    def __init__(self, dense_retriever: VectorRetrieverPipeline, lexical_index: BM25Index, top_k: int = 10,
+                 rrf_k: int = 60, dense_timeout: float = 5.0, reranker: Optional[MMRReranker] = None):
+        """
+        Args:
+            dense_retriever: The embedding based retriever. Its own reranker is not used.
+            lexical_index: BM25 index over recipe names and ingredients.
+            top_k: The number of documents to return after fusion.
+            rrf_k: Rank offset of reciprocal rank fusion; higher values flatten the rank differences.
+            dense_timeout: Seconds to wait for the dense side before returning lexical results only.
+            reranker: Optional MMR re-ranking of the fused `top_k` candidates down to `reranker.top_k`.
+        """
+        self.dense_retriever = dense_retriever
+        self.lexical_index = lexical_index
+        self.top_k = top_k
+        self.rrf_k = rrf_k
+        self.dense_timeout = dense_timeout
+        self.reranker = reranker
+        self.document_store = dense_retriever.document_store
+        self._executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix="dense-retrieval")
+
+    def embed_query(self, query: str) -> Optional[List[float]]:
+        return self.dense_retriever.embed_query(query)
+
+    def retrieve_documents(self, query: str, filters: Optional[Dict[str, Any]] = None) -> List[Document]:
+        dense = self._executor.submit(self.dense_retriever.retrieve_with_embedding, query, filters)
+        lexical_docs = self.lexical_index.search(query, top_k=self.top_k, filters=filters)
+
+        query_embedding = None
+        try:
+            dense_docs, query_embedding = dense.result(timeout=self.dense_timeout)
+        except FutureTimeoutError:
+            logger.warning("Dense retrieval timed out. Using lexical results only.")
+            dense_docs = []
+        except Exception as e:
+            logger.error(f"Dense retrieval failed: {e}. Using lexical results only.")
+            dense_docs = []
+
+        fused = reciprocal_rank_fusion([dense_docs, lexical_docs], k=self.rrf_k)[:self.top_k]
+        if self.reranker is not None:
+            fused = self.reranker.rerank(fused, query_embedding)
+        return fused
@@ -0,0 +1,298 @@
+"""
+Streaming HTTP API around InferenceEngine, for clients other than the Streamlit app.
+
+    POST /chat     {"message": "...", "session_id": "..."}  ->  text/event-stream
+    GET  /healthz  200 once requests get retrieved context, 503 before (or if startup failed)
+    GET  /metrics  Prometheus text format
+
+The conversation is kept server-side per session, so a client only sends its new message; the first
+event of every stream carries the session id to send with the next one. Ids are minted by the server: an
+unknown or expired id starts a new session under a new id. Sessions live in the process, so several
+replicas need sticky routing on the session id.
+
+Run with `python -m src.server`, or `uvicorn --factory src.server:create_app` for more control.
+"""
+import asyncio
+import json
+import logging
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from itertools import islice
+from typing import List, Dict, Any, Optional, AsyncGenerator, Callable, Tuple
+
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import JSONResponse, PlainTextResponse, StreamingResponse, Response
+from starlette.routing import Route
+from starlette.types import Scope, Receive, Send
+
+from .inference import InferenceEngine, EngineBusyError, ServiceUnavailable
+from .utils import load_config
+
+logger = logging.getLogger("Server")
+
+
+class _ChatSession:
+    def __init__(self):
+        self.messages: List[Dict[str, str]] = []
+        self.busy = False
+        self.used = time.monotonic()
+
+
+class SessionStore:
+    """
+    Conversation histories by session id. Idle sessions expire after `ttl` seconds and the least recently
+    used idle ones are evicted beyond `max_sessions`. Only used from the event loop thread, so it needs no locks.
+    """
+
+    def __init__(self, max_sessions: int = 1000, ttl: float = 3600.0, max_messages: int = 100):
+        """
+        Args:
+            max_sessions: Sessions kept at most.
+            ttl: Seconds after its last request a session is forgotten.
+            max_messages: Messages kept per session; the oldest are dropped first. The engine's
+                conversation memory decides how much of them goes into the prompt.
+        """
+        self.max_sessions = max_sessions
+        self.ttl = ttl
+        self.max_messages = max_messages
+        self._sessions: OrderedDict[str, _ChatSession] = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._sessions)
+
+    def get(self, session_id: Optional[str]) -> Tuple[str, _ChatSession]:
+        """
+        The session with this id, or a new one under a new server-side id if none or an unknown (e.g. expired)
+        one was given. Ids chosen by clients are never adopted, so they cannot pick or guess each other's.
+        """
+        self._expire()
+        session = self._sessions.get(session_id) if session_id else None
+        if session is None:
+            self._evict(room=1)
+            session_id = uuid.uuid4().hex
+            session = self._sessions[session_id] = _ChatSession()
+        self._sessions.move_to_end(session_id)
+        session.used = time.monotonic()
+        return session_id, session
+
+    def append(self, session: _ChatSession, *messages: Dict[str, str]):
+        session.messages.extend(messages)
+        del session.messages[:-self.max_messages]
+
+    def _evict(self, room: int = 0):
+        # least recently used first; a session that is streaming an answer is kept, even beyond max_sessions
+        excess = len(self._sessions) + room - self.max_sessions
+        if excess <= 0:
+            return
+        idle = list(islice((session_id for session_id, session in self._sessions.items() if not session.busy), excess))
+        for session_id in idle:
+            del self._sessions[session_id]
+
+    def _expire(self):
+        # sessions are ordered by last use, so the expired ones are at the front
+        now = time.monotonic()
+        while self._sessions:
+            session_id, session = next(iter(self._sessions.items()))
+            if now - session.used < self.ttl or session.busy:
+                break
+            del self._sessions[session_id]
+
+
+class _ChatResponse(StreamingResponse):
+    """Calls `release` once the response is over, also if the client went away before the stream started."""
+
+    def __init__(self, content: AsyncGenerator[str, None], release: Callable[[], None]):
+        super().__init__(content, media_type="text/event-stream",
+                         headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+        self.release = release
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            self.release()
+
+
+def _event(data: Dict[str, Any], event: Optional[str] = None) -> str:
+    # JSON keeps newlines in tokens from ending the event early
+    return (f"event: {event}\n" if event else "") + f"data: {json.dumps(data)}\n\n"
+
+
+async def _with_heartbeats(stream: AsyncGenerator[str, None], interval: float) -> AsyncGenerator[Optional[str], None]:
+    """Items of `stream`, with a None whenever nothing arrived for `interval` seconds."""
+    next_item = asyncio.ensure_future(stream.__anext__())
+    try:
+        while True:
+            done, _ = await asyncio.wait({next_item}, timeout=interval)
+            if not done:
+                yield None
+                continue
+            try:
+                item = next_item.result()
+            except StopAsyncIteration:
+                return
+            yield item
+            next_item = asyncio.ensure_future(stream.__anext__())
+    finally:
+        if next_item.done():
+            await stream.aclose()
+        else:
+            # cancelling the pending step ends the stream (astream_response stops its producer)
+            next_item.cancel()
+
+
+class ChatServer:
+    """
+    The ASGI endpoints. Admission control: at most `max_concurrent_requests` chats stream at once and
+    further ones are refused with 503 and Retry-After instead of queueing without bound; a session
+    handles one message at a time (409 otherwise). Backpressure: tokens are written as the client reads
+    them; a client that reads slowly makes its engine worker wait once a few tokens are buffered
+    (see `astream_response`), and a client that goes away stops its stream.
+    """
+
+    def __init__(self, engine: InferenceEngine, sessions: Optional[SessionStore] = None,
+                 max_concurrent_requests: int = 64, max_message_chars: int = 2000,
+                 heartbeat_interval: float = 15.0, retry_after: int = 5):
+        """
+        Args:
+            engine: The shared inference engine.
+            sessions: Conversation store. Defaults to a new SessionStore.
+            max_concurrent_requests: Chats streamed at once. Should be at least the engine's
+                max_concurrent_generations, the rest wait for a generation slot.
+            max_message_chars: Longer messages are refused with 413.
+            heartbeat_interval: Seconds without a token after which an SSE comment is sent, so proxies
+                keep the connection open while retrieval or the LLM is slow.
+            retry_after: Retry-After seconds sent with a 503.
+        """
+        self.engine = engine
+        self.sessions = sessions if sessions is not None else SessionStore()
+        self.max_concurrent_requests = max_concurrent_requests
+        self.max_message_chars = max_message_chars
+        self.heartbeat_interval = heartbeat_interval
+        self.retry_after = retry_after
+        self.active = 0
+
+    @classmethod
+    def from_config(cls, engine: InferenceEngine, config: Dict[str, Any]) -> "ChatServer":
+        """Builds the server from the `server` section of config.yaml."""
+        server_config = config.get("server", {})
+        return cls(
+            engine,
+            sessions=SessionStore(
+                max_sessions=server_config.get("max_sessions", 1000),
+                ttl=server_config.get("session_ttl", 3600.0),
+                max_messages=server_config.get("max_session_messages", 100),
+            ),
+            max_concurrent_requests=server_config.get("max_concurrent_requests", 64),
+            max_message_chars=server_config.get("max_message_chars", 2000),
+            heartbeat_interval=server_config.get("heartbeat_interval", 15.0),
+        )
+
+    def _refuse(self, status_code: int, reason: str, message: str, **headers) -> Response:
+        self.engine.telemetry.inc("cookcompass_http_rejected_total", reason=reason)
+        return JSONResponse({"error": message}, status_code=status_code, headers=headers)
+
+    async def chat(self, request: Request) -> Response:
+        try:
+            body = await request.json()
+            message = body["message"]
+        except Exception:
+            message = None
+        if not isinstance(message, str) or not message.strip():
+            return self._refuse(400, "bad_request",
+                                'Expected a JSON body like {"message": "...", "session_id": "..."}.')
+        if len(message) > self.max_message_chars:
+            return self._refuse(413, "too_long", f"Messages are limited to {self.max_message_chars} characters.")
+        if self.active >= self.max_concurrent_requests:
+            return self._refuse(503, "overloaded", "Too many requests. Try again later.",
+                                **{"Retry-After": str(self.retry_after)})
+
+        session_id = body.get("session_id")
+        session_id, session = self.sessions.get(session_id if isinstance(session_id, str) else None)
+        if session.busy:
+            return self._refuse(409, "session_busy", "This session is still answering its previous message.")
+
+        session.busy = True
+        self.active += 1
+        return _ChatResponse(self._stream(session_id, session, message), release=lambda: self._release(session))
+
+    def _release(self, session: _ChatSession):
+        session.busy = False
+        session.used = time.monotonic()
+        self.active -= 1
+
+    async def _stream(self, session_id: str, session: _ChatSession, message: str) -> AsyncGenerator[str, None]:
+        user_message = {"role": "user", "content": message}
+        answer_parts = []
+        try:
+            yield _event({"session_id": session_id}, "session")
+            stream = self.engine.astream_response(session.messages + [user_message], session_id=session_id)
+            async for token in _with_heartbeats(stream, self.heartbeat_interval):
+                if token is None:
+                    yield ": keepalive\n\n"
+                    continue
+                answer_parts.append(token)
+                yield _event({"token": token})
+        except (EngineBusyError, ServiceUnavailable) as e:
+            # the turn is not kept: tokens streamed before an outage are not an answer
+            yield _event({"error": str(e)}, "error")
+            return
+        except Exception as e:
+            logger.error(f"Chat stream of session {session_id} failed: {e}")
+            yield _event({"error": "The answer could not be generated."}, "error")
+            return
+
+        # an interrupted answer is not kept, so asking again continues from the same history
+        self.sessions.append(session, user_message, {"role": "assistant", "content": "".join(answer_parts)})
+        yield _event({}, "done")
+
+    async def healthz(self, request: Request) -> Response:
+        status = self.engine.status()
+        status.update(active_requests=self.active, sessions=len(self.sessions))
+        return JSONResponse(status, status_code=200 if status["serving"] else 503)
+
+    async def metrics(self, request: Request) -> Response:
+        return PlainTextResponse(self.engine.telemetry.metrics.render_prometheus(),
+                                 media_type="text/plain; version=0.0.4")
+
+    def app(self) -> Starlette:
+        @asynccontextmanager
+        async def lifespan(app: Starlette):
+            # every streamed chat holds a worker thread of the default executor, see astream_response
+            executor = ThreadPoolExecutor(max_workers=self.max_concurrent_requests + 4, thread_name_prefix="chat")
+            asyncio.get_running_loop().set_default_executor(executor)
+            yield
+            executor.shutdown(wait=False)
+
+        return Starlette(routes=[
+            Route("/chat", self.chat, methods=["POST"]),
+            Route("/healthz", self.healthz, methods=["GET"]),
+            Route("/metrics", self.metrics, methods=["GET"]),
+        ], lifespan=lifespan)
+
+
+def create_app(engine: Optional[InferenceEngine] = None, config: Optional[Dict[str, Any]] = None) -> Starlette:
+    """The ASGI app. Without arguments the engine and the server settings come from config.yaml."""
+    config = config if config is not None else load_config()
+    engine = engine or InferenceEngine.from_config()
+    return ChatServer.from_config(engine, config).app()
+
+
+def main():
+    import uvicorn
+    from dotenv import find_dotenv, load_dotenv
+
+    load_dotenv(find_dotenv())
+    logging.basicConfig(level=logging.INFO)
+    config = load_config()
+    server_config = config.get("server", {})
+    uvicorn.run(create_app(config=config), host=server_config.get("host", "127.0.0.1"),
+                port=server_config.get("port", 8000), timeout_graceful_shutdown=5)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,282 @@
+import json
+import logging
+import threading
+import time
+import uuid
+from collections import defaultdict, deque
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import List, Dict, Any, Optional, Tuple, Iterator
+
+from .utils import PROJECT_ROOT
+
+logger = logging.getLogger("Telemetry")
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+SIZE_BUCKETS = (0, 1, 5, 10, 20, 50, 100, 250, 500, 1000, 2500, 5000)
+
+Labels = Tuple[Tuple[str, str], ...]
+
+
+def _labels(labels: Dict[str, Any]) -> Labels:
+    return tuple(sorted((key, str(value)) for key, value in labels.items()))
+
+
+def _format_labels(labels: Labels, extra: Optional[Tuple[str, str]] = None) -> str:
+    pairs = list(labels) + ([extra] if extra else [])
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{key}="{value}"' for key, value in pairs) + "}"
+
+
+class MetricsRegistry:
+    """Thread-safe counters and histograms, rendered in the Prometheus text format."""
+
+    def __init__(self):
+        self._counters: Dict[str, Dict[Labels, float]] = defaultdict(lambda: defaultdict(float))
+        self._histograms: Dict[str, Dict[Labels, Dict[str, Any]]] = defaultdict(dict)
+        self._buckets: Dict[str, Tuple[float, ...]] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, name: str, value: float = 1.0, **labels):
+        with self._lock:
+            self._counters[name][_labels(labels)] += value
+
+    def observe(self, name: str, value: float, buckets: Tuple[float, ...] = LATENCY_BUCKETS, **labels):
+        with self._lock:
+            buckets = self._buckets.setdefault(name, buckets)
+            series = self._histograms[name].setdefault(
+                _labels(labels), {"counts": [0] * len(buckets), "sum": 0.0, "count": 0}
+            )
+            for i, bound in enumerate(buckets):
+                if value <= bound:
+                    series["counts"][i] += 1
+            series["sum"] += value
+            series["count"] += 1
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Plain dict of all series, e.g. for tests or a UI."""
+        with self._lock:
+            return {
+                "counters": {name: {str(dict(k)): v for k, v in series.items()}
+                             for name, series in self._counters.items()},
+                "histograms": {name: {str(dict(k)): {"sum": v["sum"], "count": v["count"]} for k, v in series.items()}
+                               for name, series in self._histograms.items()},
+            }
+
+    def render_prometheus(self) -> str:
+        lines = []
+        with self._lock:
+            for name, series in sorted(self._counters.items()):
+                lines.append(f"# TYPE {name} counter")
+                for labels, value in series.items():
+                    lines.append(f"{name}{_format_labels(labels)} {value}")
+
+            for name, series in sorted(self._histograms.items()):
+                lines.append(f"# TYPE {name} histogram")
+                for labels, values in series.items():
+                    for bound, count in zip(self._buckets[name], values["counts"]):
+                        lines.append(f"{name}_bucket{_format_labels(labels, ('le', str(bound)))} {count}")
+                    lines.append(f"{name}_bucket{_format_labels(labels, ('le', '+Inf'))} {values['count']}")
+                    lines.append(f"{name}_sum{_format_labels(labels)} {values['sum']}")
+                    lines.append(f"{name}_count{_format_labels(labels)} {values['count']}")
+        return "\n".join(lines) + "\n"
+
+
+class Trace:
+    """Timed spans of a single request or ingestion run. Spans may be recorded from several threads."""
+
+    def __init__(self, name: str, telemetry: "Telemetry"):
+        self.name = name
+        self.trace_id = uuid.uuid4().hex
+        self.telemetry = telemetry
+        self.attributes: Dict[str, Any] = {}
+        self.spans: List[Dict[str, Any]] = []
+        self.started_at = time.time()
+        self._start = time.perf_counter()
+        self._lock = threading.Lock()
+        self._finished = False
+
+    @contextmanager
+    def span(self, name: str, **attributes) -> Iterator[Dict[str, Any]]:
+        """Times the enclosed block. Attributes can be added to the yielded dict while it runs."""
+        start = time.perf_counter()
+        attributes = dict(attributes)
+        try:
+            yield attributes
+        except Exception as e:
+            attributes["error"] = type(e).__name__
+            raise
+        finally:
+            self.record(name, time.perf_counter() - start, offset=start - self._start, **attributes)
+
+    def record(self, name: str, seconds: float, offset: Optional[float] = None, **attributes):
+        """Adds a span that was timed elsewhere, e.g. the time to first token."""
+        if offset is None:
+            offset = time.perf_counter() - self._start - seconds
+        span = {"name": name, "offset_ms": round(offset * 1000, 2), "duration_ms": round(seconds * 1000, 2)}
+        if attributes:
+            span["attributes"] = attributes
+        with self._lock:
+            self.spans.append(span)
+        self.telemetry.metrics.observe("cookcompass_stage_seconds", seconds, trace=self.name, stage=name)
+
+    def set(self, **attributes):
+        self.attributes.update(attributes)
+
+    def duration(self) -> float:
+        return time.perf_counter() - self._start
+
+    def finish(self):
+        """Records the total duration and hands the trace to the sinks. Later calls are ignored."""
+        with self._lock:
+            if self._finished:
+                return
+            self._finished = True
+        self.record("total", self.duration(), offset=0.0)
+        self.telemetry.export(self)
+
+    def to_dict(self) -> Dict[str, Any]:
+        with self._lock:
+            spans = sorted(self.spans, key=lambda span: span["offset_ms"])
+        return {
+            "trace_id": self.trace_id,
+            "name": self.name,
+            "timestamp": self.started_at,
+            "attributes": self.attributes,
+            "spans": spans,
+        }
+
+
+class InMemorySink:
+    """Keeps the most recent traces in memory."""
+
+    def __init__(self, max_traces: int = 100):
+        self.traces: deque = deque(maxlen=max_traces)
+        self._lock = threading.Lock()
+
+    def export(self, trace: Dict[str, Any]):
+        with self._lock:
+            self.traces.append(trace)
+
+    def last(self, name: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            for trace in reversed(self.traces):
+                if name is None or trace["name"] == name:
+                    return trace
+        return None
+
+
+class JsonlSink:
+    """Appends every finished trace as one JSON line."""
+
+    def __init__(self, path: Path):
+        self.path = path
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+
+    def export(self, trace: Dict[str, Any]):
+        line = json.dumps(trace, default=str)
+        with self._lock, open(self.path, "a", encoding="utf-8") as file:
+            file.write(line + "\n")
+
+
+class PrometheusSink:
+    """
+    Serves the metrics registry at http://<host>:<port>/metrics in the Prometheus text format.
+    Only reachable from the local machine by default; bind to "0.0.0.0" for a scraper on another host.
+    """
+
+    def __init__(self, metrics: MetricsRegistry, port: int = 9464, host: str = "127.0.0.1"):
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.rstrip("/") not in ("", "/metrics"):
+                    self.send_error(404)
+                    return
+                body = metrics.render_prometheus().encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer((host, port), Handler)
+        threading.Thread(target=self.server.serve_forever, name="prometheus-metrics", daemon=True).start()
+        logger.info(f"Prometheus metrics served at http://{host}:{self.server.server_port}/metrics")
+
+    def export(self, trace: Dict[str, Any]):
+        # metrics are recorded as spans are timed; the endpoint reads the registry directly
+        pass
+
+
+class Telemetry:
+    """Entry point for tracing and metrics. Finished traces are exported to every configured sink."""
+
+    def __init__(self, sinks: Optional[List[Any]] = None, metrics: Optional[MetricsRegistry] = None):
+        self.metrics = metrics or MetricsRegistry()
+        self.sinks = sinks or []
+
+    @classmethod
+    def from_config(cls, config: Dict[str, Any]) -> "Telemetry":
+        """Builds telemetry from the `telemetry` section of config.yaml."""
+        telemetry_config = config.get("telemetry", {})
+        metrics = MetricsRegistry()
+        sinks = []
+
+        for sink in telemetry_config.get("sinks", ["memory"]):
+            if sink == "memory":
+                sinks.append(InMemorySink(telemetry_config.get("max_traces", 100)))
+            elif sink == "jsonl":
+                sinks.append(JsonlSink(PROJECT_ROOT / telemetry_config.get("jsonl_path", "logs/traces.jsonl")))
+            elif sink == "prometheus":
+                try:
+                    sinks.append(PrometheusSink(metrics, port=telemetry_config.get("prometheus_port", 9464),
+                                                host=telemetry_config.get("prometheus_host", "127.0.0.1")))
+                except OSError as e:
+                    # e.g. a second Streamlit process on the same host
+                    logger.warning(f"Could not start the Prometheus endpoint ({e}).")
+            else:
+                logger.warning(f"Unknown telemetry sink '{sink}'. Ignoring it.")
+
+        return cls(sinks, metrics)
+
+    def trace(self, name: str) -> Trace:
+        return Trace(name, self)
+
+    def inc(self, name: str, value: float = 1.0, **labels):
+        self.metrics.inc(name, value, **labels)
+
+    def observe(self, name: str, value: float, buckets: Tuple[float, ...] = LATENCY_BUCKETS, **labels):
+        self.metrics.observe(name, value, buckets, **labels)
+
+    @contextmanager
+    def timed_call(self, api: str) -> Iterator[None]:
+        """Records the latency of an external API call, split by outcome."""
+        start = time.perf_counter()
+        outcome = "ok"
+        try:
+            yield
+        except Exception:
+            outcome = "error"
+            raise
+        finally:
+            self.observe("cookcompass_api_latency_seconds", time.perf_counter() - start, api=api, outcome=outcome)
+
+    def export(self, trace: Trace):
+        data = trace.to_dict()
+        for sink in self.sinks:
+            try:
+                sink.export(data)
+            except Exception as e:
+                logger.error(f"Telemetry sink {type(sink).__name__} failed: {e}")
+
+    def last_trace(self, name: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """The most recent trace kept by an in-memory sink, if one is configured."""
+        for sink in self.sinks:
+            if isinstance(sink, InMemorySink):
+                return sink.last(name)
+        return None
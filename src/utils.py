@@ -1,5 +1,7 @@
 import os
+import uuid
 from pathlib import Path
+from typing import Any, Iterator
 
 import yaml
 from dotenv import find_dotenv, load_dotenv
@@ -17,3 +19,38 @@ def load_config():
 
     with open(config_path, 'r') as file:
         return yaml.safe_load(file)
+
+
+def read_index_version(path: Path):
+    """Returns the version marker written by the last ingestion that changed the index, or None."""
+    try:
+        return path.read_text().strip()
+    except FileNotFoundError:
+        return None
+
+
+def bump_index_version(path: Path):
+    """Marks the document index as changed so caches built on top of it are invalidated."""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(uuid.uuid4().hex)
+
+
+def iter_store_documents(store: Any, page_size: int = 1000, embeddings: bool = True) -> Iterator[Any]:
+    """
+    Yields every document of `store` page by page, so exports never hold the whole collection at once.
+    Chroma is read through its collection with limit/offset (and without embeddings if they are not needed),
+    other stores fall back to `filter_documents`.
+    """
+    if not hasattr(store, "_ensure_initialized"):
+        yield from store.filter_documents()
+        return
+
+    store._ensure_initialized()
+    include = ["documents", "metadatas"] + (["embeddings"] if embeddings else [])
+    offset = 0
+    while True:
+        page = store._collection.get(include=include, limit=page_size, offset=offset)
+        yield from store._get_result_to_documents(page)
+        if len(page["ids"]) < page_size:
+            return
+        offset += page_size
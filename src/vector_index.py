@@ -0,0 +1,306 @@
+import json
+import logging
+import mmap
+import os
+import shutil
+import time
+from pathlib import Path
+from typing import List, Dict, Any, Optional, Iterable, Tuple
+
+import numpy as np
+from haystack import Document, component
+from haystack.utils.filters import document_matches_filter
+
+from .constraints import NUMERIC_FIELDS
+from .keywords import KEYWORDS, keyword_field
+from .utils import iter_store_documents
+
+logger = logging.getLogger("VectorIndex")
+
+DTYPES = ("float32", "float16", "int8")
+BLOCK_ROWS = 16384
+TAG_FIELDS = {f"meta.{keyword_field(keyword)}": column for column, keyword in enumerate(KEYWORDS)}
+RANGE_OPERATORS = {"<", "<=", ">", ">=", "=="}
+
+
+def _normalize_rows(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+
+def _replace_dir(source: Path, target: Path):
+    """
+    Moves the directory `source` to `target`. A previous `target` is renamed aside and deleted: its files are
+    unlinked rather than rewritten, so memory maps of them stay valid until the stores using them are closed.
+    """
+    previous = target.with_name(f"{target.name}.old-{os.getpid()}")
+    if target.exists():
+        shutil.rmtree(previous, ignore_errors=True)
+        os.replace(target, previous)
+    os.replace(source, target)
+    shutil.rmtree(previous, ignore_errors=True)
+
+
+class NumpyDocumentStore:
+    """
+    Read-only document store kept in a directory of memory-mapped `.npy` files:
+    - embeddings.npy: unit-length vectors as float32, float16, or int8 with a per-vector scale in scales.npy
+    - tags.npy: one boolean column per entry in KEYWORDS, so keyword filters are a vectorized mask
+    - numeric_sorted.npy + numeric_order.npy: per field in NUMERIC_FIELDS, the values in ascending order (missing
+      values last, as NaN) and their rows, so a range filter is two binary searches and a slice
+    - documents.jsonl + offsets.npy: row-aligned id, content and meta, read lazily from the mapped file
+    Search is an exact dot product over all rows followed by `argpartition`, so nothing is loaded up front
+    and the OS page cache is shared between processes.
+    """
+
+    def __init__(self, path: Path):
+        """
+        Args:
+            path: Directory written by `NumpyDocumentStore.build`.
+        """
+        self.path = path
+        manifest = json.loads((path / "manifest.json").read_text())
+        self.dtype = manifest["dtype"]
+        self.keywords = manifest["keywords"]
+        # indexes built before the range index existed filter numeric fields document by document
+        self.numeric_fields = manifest.get("numeric_fields", [])
+
+        # empty files cannot be mapped
+        mmap_mode = "r" if manifest["count"] else None
+        self.embeddings = np.load(path / "embeddings.npy", mmap_mode=mmap_mode)
+        self.scales = np.load(path / "scales.npy", mmap_mode=mmap_mode) if self.dtype == "int8" else None
+        self.tags = np.load(path / "tags.npy", mmap_mode=mmap_mode)
+        self.offsets = np.load(path / "offsets.npy", mmap_mode=mmap_mode)
+        if self.numeric_fields:
+            self.numeric_sorted = np.load(path / "numeric_sorted.npy", mmap_mode=mmap_mode)
+            self.numeric_order = np.load(path / "numeric_order.npy", mmap_mode=mmap_mode)
+
+        self._file = open(path / "documents.jsonl", "rb")
+        self._records = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ) if self.offsets[-1] else b""
+
+        if self.keywords != KEYWORDS:
+            logger.warning("Keyword list changed since the index was built. Rebuild it to filter by the new keywords.")
+        if self.numeric_fields != list(NUMERIC_FIELDS):
+            logger.warning("Numeric fields changed since the index was built. Rebuild it to use the range index.")
+
+    @classmethod
+    def build(cls, documents: Iterable[Document], path: Path, dtype: str = "float16") -> "NumpyDocumentStore":
+        """
+        Writes embedded documents to `path` and opens the result. Documents are consumed in blocks of
+        BLOCK_ROWS and only their compact (quantized) arrays are kept, so `documents` can be a stream.
+        The index is written to a sibling directory and then moved into place (see `_replace_dir`), so stores
+        that still map the previous files keep reading them unchanged.
+        """
+        if dtype not in DTYPES:
+            raise ValueError(f"Unknown vector index dtype '{dtype}'. Expected one of {DTYPES}.")
+
+        target = path
+        path = target.with_name(f"{target.name}.tmp-{os.getpid()}")
+        shutil.rmtree(path, ignore_errors=True)
+        path.mkdir(parents=True)
+        start = time.perf_counter()
+        vector_blocks, scale_blocks, tag_blocks, numeric_blocks = [], [], [], []
+        offsets = [0]
+        block: List[Document] = []
+
+        def flush():
+            vectors = _normalize_rows(np.asarray([doc.embedding for doc in block], dtype=np.float32))
+            if dtype == "int8":
+                scales = np.abs(vectors).max(axis=1) / 127.0
+                scales[scales == 0] = 1.0
+                vector_blocks.append(np.round(vectors / scales[:, None]).astype(np.int8))
+                scale_blocks.append(scales.astype(np.float32))
+            else:
+                vector_blocks.append(vectors.astype(dtype))
+
+            tags = np.zeros((len(block), len(KEYWORDS)), dtype=bool)
+            numeric = np.full((len(NUMERIC_FIELDS), len(block)), np.nan, dtype=np.float32)
+            for row, doc in enumerate(block):
+                for column, keyword in enumerate(KEYWORDS):
+                    tags[row, column] = bool(doc.meta.get(keyword_field(keyword), False))
+                for column, field in enumerate(NUMERIC_FIELDS):
+                    value = doc.meta.get(field)
+                    if isinstance(value, (int, float)) and not isinstance(value, bool):
+                        numeric[column, row] = value
+            tag_blocks.append(tags)
+            numeric_blocks.append(numeric)
+            block.clear()
+
+        with open(path / "documents.jsonl", "wb") as file:
+            for doc in documents:
+                if doc.embedding is None:
+                    continue
+                block.append(doc)
+                file.write(json.dumps({"id": doc.id, "content": doc.content, "meta": doc.meta}).encode("utf-8"))
+                file.write(b"\n")
+                offsets.append(file.tell())
+                if len(block) >= BLOCK_ROWS:
+                    flush()
+            if block:
+                flush()
+
+        count = len(offsets) - 1
+        dim = vector_blocks[0].shape[1] if vector_blocks else 0
+        embedding_dtype = np.int8 if dtype == "int8" else dtype
+        np.save(path / "embeddings.npy",
+                np.concatenate(vector_blocks) if vector_blocks else np.zeros((0, 0), dtype=embedding_dtype))
+        if dtype == "int8":
+            np.save(path / "scales.npy",
+                    np.concatenate(scale_blocks) if scale_blocks else np.zeros(0, dtype=np.float32))
+        np.save(path / "tags.npy",
+                np.concatenate(tag_blocks) if tag_blocks else np.zeros((0, len(KEYWORDS)), dtype=bool))
+        np.save(path / "offsets.npy", np.asarray(offsets, dtype=np.int64))
+        numeric = (np.concatenate(numeric_blocks, axis=1) if numeric_blocks
+                   else np.zeros((len(NUMERIC_FIELDS), 0), dtype=np.float32))
+        # a stable sort keeps rows with equal values in row order; NaN sorts last
+        order = np.argsort(numeric, axis=1, kind="stable").astype(np.int32)
+        np.save(path / "numeric_order.npy", order)
+        np.save(path / "numeric_sorted.npy", np.take_along_axis(numeric, order, axis=1))
+        (path / "manifest.json").write_text(json.dumps({"dtype": dtype, "dim": dim, "count": count,
+                                                        "keywords": KEYWORDS,
+                                                        "numeric_fields": list(NUMERIC_FIELDS)}))
+
+        _replace_dir(path, target)
+        logger.info(f"Built {dtype} vector index with {count} documents in "
+                    f"{time.perf_counter() - start:.1f}s at: {target}")
+        return cls(target)
+
+    def count_documents(self) -> int:
+        return len(self.offsets) - 1
+
+    def document(self, row: int, score: Optional[float] = None, with_embedding: bool = False) -> Document:
+        """The document in `row`. Its embedding is the stored unit vector (dequantized), e.g. for MMR."""
+        record = json.loads(self._records[self.offsets[row]:self.offsets[row + 1]])
+        embedding = None
+        if with_embedding:
+            vector = self.embeddings[row].astype(np.float32)
+            embedding = (vector * self.scales[row] if self.scales is not None else vector).tolist()
+        return Document(id=record["id"], content=record["content"], meta=record["meta"], score=score,
+                        embedding=embedding)
+
+    def filter_documents(self, filters: Optional[Dict[str, Any]] = None) -> List[Document]:
+        documents = (self.document(row) for row in range(self.count_documents()))
+        return [doc for doc in documents if not filters or document_matches_filter(filters, doc)]
+
+    def _range_rows(self, field: str, operator: str, value: float) -> np.ndarray:
+        """Rows whose `field` satisfies `operator value`, from the sorted values of the field."""
+        column = self.numeric_fields.index(field)
+        values = self.numeric_sorted[column]
+        start, stop = 0, int(np.searchsorted(values, np.inf, side="right"))
+        if operator in (">=", "=="):
+            start = int(np.searchsorted(values, value, side="left"))
+        elif operator == ">":
+            start = int(np.searchsorted(values, value, side="right"))
+        if operator in ("<=", "=="):
+            stop = int(np.searchsorted(values, value, side="right"))
+        elif operator == "<":
+            stop = int(np.searchsorted(values, value, side="left"))
+        return self.numeric_order[column, start:max(start, stop)]
+
+    def _mask(self, filters: Dict[str, Any]) -> Optional[np.ndarray]:
+        """
+        Row mask for filters made only of keyword flag and numeric range conditions (joined by AND),
+        or None if the filters use other fields or operators.
+        """
+        conditions = filters["conditions"] if filters.get("operator") == "AND" else [filters]
+        mask = np.ones(self.count_documents(), dtype=bool)
+        for condition in conditions:
+            field, operator, value = condition.get("field"), condition.get("operator"), condition.get("value")
+            column = TAG_FIELDS.get(field)
+            if column is not None and operator == "==" and isinstance(value, bool):
+                mask &= self.tags[:, column] == value
+                continue
+
+            name = field[len("meta."):] if isinstance(field, str) and field.startswith("meta.") else None
+            if (name not in self.numeric_fields or operator not in RANGE_OPERATORS
+                    or not isinstance(value, (int, float)) or isinstance(value, bool)):
+                return None
+            in_range = np.zeros(self.count_documents(), dtype=bool)
+            in_range[self._range_rows(name, operator, value)] = True
+            mask &= in_range
+        return mask
+
+    def _scores(self, queries: np.ndarray, rows: Optional[np.ndarray] = None) -> np.ndarray:
+        """
+        Cosine similarity of the given rows (all rows if None) with every query, shape (rows, queries).
+        Rows are converted to float32 block by block, so the whole matrix is never materialized.
+        """
+        total = self.count_documents() if rows is None else len(rows)
+        scores = np.empty((total, len(queries)), dtype=np.float32)
+        for start in range(0, total, BLOCK_ROWS):
+            block = slice(start, start + BLOCK_ROWS) if rows is None else rows[start:start + BLOCK_ROWS]
+            scores[start:start + BLOCK_ROWS] = self.embeddings[block].astype(np.float32) @ queries.T
+            if self.scales is not None:
+                scores[start:start + BLOCK_ROWS] *= self.scales[block, None]
+        return scores
+
+    def search(self, query_embeddings: List[List[float]], top_k: int = 10,
+               filters: Optional[Dict[str, Any]] = None) -> List[List[Document]]:
+        """
+        Exact top-k search for a batch of queries.
+
+        Args:
+            query_embeddings: One embedding per query.
+            top_k: The number of documents per query.
+            filters: Haystack metadata filters. Keyword flag conditions use the precomputed tag masks and
+                numeric range conditions the sorted range index; anything else is checked document by document
+                in score order.
+        """
+        if not self.count_documents():
+            return [[] for _ in query_embeddings]
+
+        queries = _normalize_rows(np.asarray(query_embeddings, dtype=np.float32))
+
+        # keyword and range filters only score the rows passing the mask
+        mask = self._mask(filters) if filters else None
+        rows = np.flatnonzero(mask) if mask is not None else None
+        scores = self._scores(queries, rows)
+
+        results = []
+        for column in range(len(queries)):
+            if filters and mask is None:
+                results.append(self._filtered_top_k(scores[:, column], top_k, filters))
+                continue
+            top = self._top_k(scores[:, column], top_k)
+            results.append([self.document(int(rows[i]) if rows is not None else i, score, with_embedding=True)
+                            for i, score in top])
+        return results
+
+    @staticmethod
+    def _top_k(scores: np.ndarray, top_k: int) -> List[Tuple[int, float]]:
+        k = min(top_k, len(scores))
+        if k <= 0:
+            return []
+        best = np.argpartition(-scores, k - 1)[:k]
+        best = best[np.argsort(-scores[best])]
+        return [(int(i), float(scores[i])) for i in best]
+
+    def _filtered_top_k(self, scores: np.ndarray, top_k: int, filters: Dict[str, Any]) -> List[Document]:
+        results = []
+        for row in np.argsort(-scores):
+            doc = self.document(int(row), float(scores[row]))
+            if document_matches_filter(filters, doc):
+                results.append(self.document(int(row), float(scores[row]), with_embedding=True))
+                if len(results) >= top_k:
+                    break
+        return results
+
+
+@component
+class NumpyEmbeddingRetriever:
+    """Retrieves documents from a NumpyDocumentStore by query embedding."""
+
+    def __init__(self, document_store: NumpyDocumentStore, top_k: int = 10):
+        self.document_store = document_store
+        self.top_k = top_k
+
+    @component.output_types(documents=List[Document])
+    def run(self, query_embedding: List[float], filters: Optional[Dict[str, Any]] = None,
+            top_k: Optional[int] = None):
+        return {"documents": self.document_store.search([query_embedding], top_k or self.top_k, filters)[0]}
+
+
+def build_numpy_index(store: Any, path: Path, dtype: str = "float16") -> NumpyDocumentStore:
+    """Exports every embedded document of `store` (e.g. Chroma, read page by page) into a memory-mapped vector index."""
+    return NumpyDocumentStore.build(iter_store_documents(store), path, dtype)
@@ -0,0 +1,11 @@
+import pytest
+
+from benchmarks.fake_hf_server import FakeHFServer
+
+
+@pytest.fixture
+def fake_server():
+    """A local TEI/TGI stand-in (benchmarks.fake_hf_server); set `faults` to inject latency and errors."""
+    server = FakeHFServer().start()
+    yield server
+    server.stop()
@@ -0,0 +1,33 @@
+import pytest
+
+from src.constraints import parse_constraints
+
+
+@pytest.mark.parametrize("query", ["less than 1 hour 30 minutes", "under 1 hour and 30 minutes",
+                                   "1 hour 30 minutes or less", "under 1 hr 30 min"])
+def test_hours_and_minutes_are_one_duration(query):
+    assert parse_constraints(query) == {"minutes": (None, 90.0)}
+
+
+def test_compound_duration_as_lower_bound():
+    assert parse_constraints("at least 2 hours 15 minutes") == {"minutes": (135.0, None)}
+
+
+@pytest.mark.parametrize("query", ["under 30 minutes and 400 calories", "under 30 minutes, 400 calories",
+                                   "under 30 minutes, and 400 calories"])
+def test_comparison_carries_over_and_or_comma(query):
+    assert parse_constraints(query) == {"minutes": (None, 30.0), "calories": (None, 400.0)}
+
+
+def test_comparison_does_not_carry_over_whitespace():
+    assert parse_constraints("under 30 minutes 400 calories") == {"minutes": (None, 30.0)}
+
+
+def test_ingredient_amounts_are_not_constraints():
+    assert parse_constraints("I have 200g of sugar and flour") == {}
+    assert parse_constraints("under 30 minutes, I have 200g of sugar") == {"minutes": (None, 30.0)}
+
+
+def test_ranges():
+    assert parse_constraints("between 1 and 2 hours") == {"minutes": (60.0, 120.0)}
+    assert parse_constraints("30-45 minutes") == {"minutes": (30.0, 45.0)}
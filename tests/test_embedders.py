@@ -0,0 +1,79 @@
+import pytest
+from haystack import Document
+from haystack.components.embedders import HuggingFaceAPIDocumentEmbedder
+
+from benchmarks.fake_hf_server import Faults
+from src import resilience
+from src.embedders import ConcurrentBatchEmbedder
+
+
+def _embedder(server, **kwargs) -> ConcurrentBatchEmbedder:
+    def factory():
+        return HuggingFaceAPIDocumentEmbedder(api_type="text_embeddings_inference", api_params={"url": server.url},
+                                              progress_bar=False)
+
+    return ConcurrentBatchEmbedder(factory, max_in_flight=1, requests_per_second=None, initial_batch_size=16,
+                                   retry_base_delay=0.01, **kwargs)
+
+
+def _documents(count: int):
+    return [Document(content=f"recipe {i} with rice and beans") for i in range(count)]
+
+
+def _embed(embedder: ConcurrentBatchEmbedder, documents):
+    return [doc for batch in embedder.embed_batches(documents) for doc in batch]
+
+
+@pytest.fixture
+def backoff_caps(monkeypatch):
+    """Upper bounds of the jittered backoff delays, in the order they were drawn."""
+    caps = []
+    monkeypatch.setattr(resilience.random, "uniform", lambda low, high: caps.append(high) or 0.0)
+    return caps
+
+
+@pytest.mark.parametrize("status", [429, 500, 503])
+def test_retries_rate_limits_and_server_errors_with_exponential_backoff(fake_server, backoff_caps, status):
+    fake_server.faults = Faults(latency=0.0, fail_first=3, error_status=status)
+    embedder = _embedder(fake_server)
+
+    documents = _embed(embedder, _documents(10))
+
+    assert len(documents) == 10 and all(doc.embedding for doc in documents)
+    assert fake_server.requests["/"] == 4
+    assert backoff_caps == pytest.approx([0.01, 0.02, 0.04])
+    retries = embedder.telemetry.metrics.snapshot()["counters"]["cookcompass_retries_total"]
+    assert retries[str({"api": "embedding"})] == 3
+
+
+def test_failed_requests_shrink_the_batch_size(fake_server, backoff_caps):
+    fake_server.faults = Faults(latency=0.0, fail_first=2, error_status=503)
+    embedder = _embedder(fake_server, min_batch_size=4)
+
+    _embed(embedder, _documents(40))
+
+    # halved twice (16 -> 8 -> 4), then grown again by the fast successful batches
+    assert embedder.batch_size < 16
+
+
+def test_gives_up_after_max_retries(fake_server, backoff_caps):
+    fake_server.faults = Faults(latency=0.0, fail_first=100, error_status=503)
+    embedder = _embedder(fake_server, max_retries=2)
+
+    with pytest.raises(Exception) as error:
+        _embed(embedder, _documents(5))
+
+    assert resilience.status_code_of(error.value) == 503
+    assert fake_server.requests["/"] == 3
+
+
+def test_client_errors_are_not_retried(fake_server, backoff_caps):
+    fake_server.faults = Faults(latency=0.0, fail_first=100, error_status=400)
+    embedder = _embedder(fake_server)
+
+    with pytest.raises(Exception) as error:
+        _embed(embedder, _documents(5))
+
+    assert resilience.status_code_of(error.value) == 400
+    assert fake_server.requests["/"] == 1
+    assert backoff_caps == []
@@ -0,0 +1,59 @@
+import asyncio
+
+import pytest
+
+from src.inference import InferenceEngine
+
+HISTORY = [{"role": "user", "content": "I have chicken and rice"}]
+
+
+def _engine(tokens: int, produced: list, error: Exception = None) -> InferenceEngine:
+    engine = InferenceEngine(None, llm=None)
+
+    def stream_response(message_history, trace=None, session_id=None):
+        for i in range(tokens):
+            produced.append(i)
+            yield f"{i} "
+        if error is not None:
+            raise error
+
+    engine.stream_response = stream_response
+    return engine
+
+
+def test_slow_reader_holds_back_the_producer():
+    produced = []
+    engine = _engine(1000, produced)
+
+    async def read_slowly():
+        stream = engine.astream_response(HISTORY, max_buffered_tokens=4)
+        first = await stream.__anext__()
+        await asyncio.sleep(0.3)
+        buffered = len(produced)
+        await stream.aclose()
+        return first, buffered
+
+    first, buffered = asyncio.run(read_slowly())
+    assert first == "0 "
+    # the token read, a full queue and the one the producer waits to hand over
+    assert buffered <= 1 + 4 + 1
+    assert len(produced) == buffered
+
+
+def test_all_tokens_arrive_in_order():
+    engine = _engine(200, [])
+
+    async def read_all():
+        return [token async for token in engine.astream_response(HISTORY, max_buffered_tokens=4)]
+
+    assert asyncio.run(read_all()) == [f"{i} " for i in range(200)]
+
+
+def test_errors_reach_the_reader():
+    engine = _engine(10, [], error=RuntimeError("LLM down"))
+
+    async def read_all():
+        return [token async for token in engine.astream_response(HISTORY, max_buffered_tokens=4)]
+
+    with pytest.raises(RuntimeError, match="LLM down"):
+        asyncio.run(read_all())
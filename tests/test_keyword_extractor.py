@@ -0,0 +1,21 @@
+import pytest
+
+from src.keyword_extractor import LexiconKeywordExtractor
+
+QUICK = "15-minutes-or-less"
+
+
+@pytest.fixture(scope="module")
+def extractor():
+    return LexiconKeywordExtractor()
+
+
+@pytest.mark.parametrize("query", ["a 10 minute vegan dinner", "under 10 minutes", "I'm short on time"])
+def test_quick_recipes(extractor, query):
+    assert QUICK in extractor.extract(query)[0]
+
+
+@pytest.mark.parametrize("query", ["more than 10 minutes", "at least 10 minutes", "takes 10 mins or more",
+                                   "no time constraints"])
+def test_lower_bounds_and_no_time_constraints_are_not_quick(extractor, query):
+    assert QUICK not in extractor.extract(query)[0]
@@ -0,0 +1,39 @@
+from haystack import Document
+
+from src.memory import ConversationMemory
+
+LEMON_RICE = Document(content="Lemon rice: rice, lemon, turmeric.", meta={"name": "lemon rice", "original_id": 1})
+CHICKEN_CURRY = Document(content="Chicken curry: chicken, curry paste.",
+                         meta={"name": "chicken curry", "original_id": 2})
+
+
+def _conversation(answer: str, turns: int = 3) -> list:
+    history = [{"role": "user", "content": "What can I cook tonight?"}, {"role": "assistant", "content": answer}]
+    for turn in range(turns):
+        history += [{"role": "user", "content": f"turn {turn}"}, {"role": "assistant", "content": f"answer {turn}"}]
+    return history
+
+
+def test_conversations_with_the_same_opening_do_not_share_a_summary():
+    memory = ConversationMemory(recent_messages=2)
+    memory.remember_answer("Try the lemon rice.", [LEMON_RICE])
+    memory.remember_answer("Try the chicken curry.", [CHICKEN_CURRY])
+    first, second = _conversation("Try the lemon rice."), _conversation("Try the chicken curry.")
+
+    assert "lemon rice" in memory.messages(first)[0]["content"]
+    assert memory.recall("more about the chicken curry", second) == []
+    summary = memory.messages(second)[0]["content"]
+    assert "chicken curry" in summary and "lemon rice" not in summary
+    assert [doc.meta["original_id"] for doc in memory.recall("more about the chicken curry", second)] == [2]
+
+
+def test_sessions_are_kept_apart_by_id():
+    memory = ConversationMemory(recent_messages=2)
+    memory.remember_answer("Try the lemon rice.", [LEMON_RICE])
+    memory.remember_answer("Try the chicken curry.", [CHICKEN_CURRY])
+    first, second = _conversation("Try the lemon rice."), _conversation("Try the chicken curry.")
+    memory.messages(first, session_id="a")
+    memory.messages(second, session_id="b")
+
+    assert [doc.meta["original_id"] for doc in memory.recall("the lemon rice again", first, session_id="a")] == [1]
+    assert [doc.meta["original_id"] for doc in memory.recall("the chicken curry again", second, session_id="b")] == [2]
@@ -0,0 +1,133 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from haystack.components.embedders import HuggingFaceAPITextEmbedder
+from haystack.components.generators.chat import HuggingFaceAPIChatGenerator
+
+from benchmarks.fake_hf_server import Faults
+from benchmarks.fakes import StaticRetriever
+from src.inference import InferenceEngine, ServiceUnavailable
+from src.keyword_extractor import LexiconKeywordExtractor
+from src.resilience import ResilientCaller, CircuitBreaker, CircuitOpenError
+
+QUERY = "quick chicken and rice dinner"
+
+
+@pytest.fixture
+def executor():
+    executor = ThreadPoolExecutor(max_workers=4)
+    yield executor
+    executor.shutdown(wait=False)
+
+
+def _embed(server):
+    embedder = HuggingFaceAPITextEmbedder(api_type="text_embeddings_inference", api_params={"url": server.url})
+    return lambda: embedder.run(text=QUERY)
+
+
+def _caller(executor, events=None, **kwargs) -> ResilientCaller:
+    on_event = None if events is None else events.append
+    return ResilientCaller("embedder", executor, timeout=2.0, on_event=on_event, **kwargs)
+
+
+def test_circuit_opens_after_consecutive_failures(fake_server, executor):
+    events = []
+    caller = _caller(executor, events, hedge_percentile=None, breaker=CircuitBreaker("embedder", 3, 60.0))
+    fake_server.faults = Faults(latency=0.0, error_rate=1.0)
+
+    for _ in range(3):
+        with pytest.raises(Exception):
+            caller.call(_embed(fake_server))
+    assert caller.breaker.state == "open"
+
+    with pytest.raises(CircuitOpenError):
+        caller.call(_embed(fake_server))
+    assert fake_server.requests["/"] == 3
+    assert events == ["error"] * 3 + ["rejected"]
+
+
+def test_half_open_trial_closes_the_circuit(fake_server, executor):
+    caller = _caller(executor, hedge_percentile=None, breaker=CircuitBreaker("embedder", 2, 0.2))
+    fake_server.faults = Faults(latency=0.0, fail_first=2)
+    for _ in range(2):
+        with pytest.raises(Exception):
+            caller.call(_embed(fake_server))
+
+    time.sleep(0.25)
+    assert caller.breaker.state == "half_open"
+    caller.call(_embed(fake_server))
+    assert caller.breaker.state == "closed"
+    assert fake_server.requests["/"] == 3
+
+
+def test_failed_half_open_trial_opens_the_circuit_again(fake_server, executor):
+    caller = _caller(executor, hedge_percentile=None, breaker=CircuitBreaker("embedder", 2, 0.2))
+    fake_server.faults = Faults(latency=0.0, error_rate=1.0)
+    for _ in range(2):
+        with pytest.raises(Exception):
+            caller.call(_embed(fake_server))
+
+    time.sleep(0.25)
+    with pytest.raises(Exception):
+        caller.call(_embed(fake_server))
+    assert caller.breaker.state == "open"
+    with pytest.raises(CircuitOpenError):
+        caller.call(_embed(fake_server))
+    assert fake_server.requests["/"] == 3
+
+
+def test_half_open_lets_one_trial_through():
+    breaker = CircuitBreaker("embedder", failure_threshold=1, reset_timeout=0.05)
+    breaker.record_failure()
+    assert not breaker.allow()
+    time.sleep(0.06)
+    assert breaker.allow()
+    assert not breaker.allow()
+
+
+def test_slow_call_is_hedged(fake_server, executor):
+    events = []
+    caller = _caller(executor, events, hedge_percentile=0.95, hedge_min_delay=0.05)
+    for _ in range(20):
+        caller.latencies.record(0.01)
+    fake_server.faults = Faults(latency=0.0, slow_first=1, slow_latency=1.0)
+
+    start = time.perf_counter()
+    assert len(caller.call(_embed(fake_server))["embedding"]) > 0
+    assert time.perf_counter() - start < 0.5
+    assert events == ["hedge", "hedge_won"]
+    assert fake_server.requests["/"] == 2
+
+
+def test_fast_call_is_not_hedged(fake_server, executor):
+    events = []
+    caller = _caller(executor, events, hedge_percentile=0.95, hedge_min_delay=0.2)
+    for _ in range(20):
+        caller.latencies.record(0.01)
+    fake_server.faults = Faults(latency=0.0)
+
+    caller.call(_embed(fake_server))
+    assert events == []
+    assert fake_server.requests["/"] == 1
+
+
+def test_generation_circuit_opens_while_rewrites_succeed(fake_server, executor):
+    # every request takes longer than the first token may, but well within the rewrite deadline
+    fake_server.faults = Faults(latency=0.3)
+    llm = HuggingFaceAPIChatGenerator(api_type="text_generation_inference", api_params={"url": fake_server.url})
+    llm_caller = ResilientCaller("llm", executor, timeout=2.0, hedge_percentile=None,
+                                 breaker=CircuitBreaker("llm", 2, 60.0))
+    engine = InferenceEngine(StaticRetriever(), llm, keyword_extractor=LexiconKeywordExtractor(),
+                             keywords_llm_fallback=False, llm_caller=llm_caller, first_token_timeout=0.1,
+                             generation_breaker=CircuitBreaker("llm_generation", 2, 60.0))
+    history = [{"role": "user", "content": "I have chicken and rice"},
+               {"role": "assistant", "content": "Try a chicken and rice casserole."},
+               {"role": "user", "content": "make it quicker"}]
+
+    for _ in range(3):
+        with pytest.raises(ServiceUnavailable):
+            "".join(engine.stream_response(history))
+    assert engine.status()["circuits"] == {"llm": "closed", "llm_generation": "open"}
+    # two rewrites and two answers, then the third rewrite and no answer
+    assert fake_server.requests["/v1/chat/completions"] == 5